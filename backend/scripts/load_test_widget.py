@@ -0,0 +1,148 @@
+"""
+backend/scripts/load_test_widget.py
+
+Load test for the public widget path — finds its concurrency ceiling.
+
+Simulates embedded widgets at increasing concurrency. Each virtual visitor
+loops over what a page view does: load the bootstrap config, submit a chat
+turn and long-poll its status until it finishes. For every step it reports
+throughput, latency percentiles and the error rate, and names the first step
+where throughput stops growing or errors/timeouts appear — the ceiling.
+
+  # against the async gateway (docker compose up gateway)
+  python backend/scripts/load_test_widget.py --base-url http://localhost:8000 \\
+      --tenant <tenant uuid> --steps 10,50,100,250,500,1000
+
+  # the same against Flask, for comparison
+  python backend/scripts/load_test_widget.py --base-url http://localhost:5000 --tenant <uuid>
+
+  # long-polls only: no turns are queued and nothing is billed; unknown task
+  # ids stay PENDING, so every request holds a connection for --poll-timeout
+  python backend/scripts/load_test_widget.py --base-url http://localhost:8000 --mode status
+
+Chat submits are rate limited per IP (30/min); for --mode full from a single
+machine either raise the limit in a test environment or use --mode status,
+which isolates the part that pins connections.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+class Step:
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.latencies = []
+        self.errors = 0
+        self.requests = 0
+
+    def record(self, started, ok):
+        self.requests += 1
+        self.latencies.append(time.monotonic() - started)
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, p):
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[p - 1]
+
+
+async def _request(client, step, method, url, **kwargs):
+    started = time.monotonic()
+    try:
+        response = await client.request(method, url, **kwargs)
+        step.record(started, response.status_code < 500 and response.status_code != 429)
+        return response
+    except httpx.HTTPError:
+        step.record(started, False)
+        return None
+
+
+async def _visitor_full(client, step, args, stop_at):
+    while time.monotonic() < stop_at:
+        await _request(client, step, "GET", f"/api/tenants/{args.tenant}/bootstrap")
+        response = await _request(
+            client, step, "POST", f"/api/chat/{args.tenant}",
+            json={"query": args.query, "chat_history": [], "conversation_id": str(uuid.uuid4())},
+        )
+        if response is None or response.status_code != 202:
+            continue
+        task_id = response.json()["task_id"]
+        while time.monotonic() < stop_at:
+            response = await _request(
+                client, step, "GET", f"/api/chat/task/{task_id}/status",
+                params={"timeout": args.poll_timeout},
+            )
+            if response is None or response.json().get("state") in ("SUCCESS", "FAILURE"):
+                break
+
+
+async def _visitor_status(client, step, args, stop_at):
+    while time.monotonic() < stop_at:
+        await _request(
+            client, step, "GET", f"/api/chat/task/{uuid.uuid4()}/status",
+            params={"timeout": args.poll_timeout},
+        )
+
+
+async def run_step(args, concurrency):
+    step = Step(concurrency)
+    visitor = _visitor_full if args.mode == "full" else _visitor_status
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(args.poll_timeout + args.request_timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(visitor(client, step, args, stop_at) for _ in range(concurrency)))
+        step.elapsed = time.monotonic() - started
+    return step
+
+
+def report(steps):
+    print(f"{'conc':>6} {'req':>7} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'err %':>6}")
+    ceiling = None
+    best = 0.0
+    for step in steps:
+        throughput = step.requests / step.elapsed if step.elapsed else 0.0
+        error_rate = 100.0 * step.errors / step.requests if step.requests else 100.0
+        print(f"{step.concurrency:>6} {step.requests:>7} {throughput:>8.1f} "
+              f"{step.percentile(50):>7.2f} {step.percentile(95):>7.2f} {error_rate:>6.1f}")
+        # Ceiling: errors appear, or more visitors stop buying more throughput
+        if ceiling is None and (error_rate > 1.0 or (best and throughput < best * 1.1)):
+            ceiling = step.concurrency
+        best = max(best, throughput)
+    if ceiling:
+        print(f"\nCeiling reached at ~{ceiling} concurrent widgets.")
+    else:
+        print("\nNo ceiling within the tested steps.")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--tenant", help="tenant uuid (required for --mode full)")
+    parser.add_argument("--mode", choices=("full", "status"), default="full")
+    parser.add_argument("--steps", default="10,50,100,250,500", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per step")
+    parser.add_argument("--poll-timeout", type=int, default=25, help="long-poll timeout sent to the server")
+    parser.add_argument("--request-timeout", type=float, default=10.0, help="client slack on top of the long-poll")
+    parser.add_argument("--query", default="What are your opening hours?")
+    args = parser.parse_args()
+    if args.mode == "full" and not args.tenant:
+        parser.error("--tenant is required for --mode full")
+
+    steps = []
+    for concurrency in (int(s) for s in args.steps.split(",")):
+        print(f"→ {concurrency} concurrent widgets for {args.duration:.0f}s ...", flush=True)
+        steps.append(await run_step(args, concurrency))
+    print()
+    report(steps)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,6 +15,7 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 from app.logging_config import error_logger
+from app.database.supabase_client import query_count, start_query_count
 from uuid import UUID
 
 load_dotenv()
@@ -32,6 +33,21 @@ class CustomJSONEncoder(json.JSONEncoder):
             return str(obj)
         return super().default(obj)
 
+def configure_celery():
+    """Celery config (API and gateway only dispatch tasks, they never run them)."""
+    broker_url     = os.environ.get('CELERY_BROKER_URL',     'redis://redis:6379/0')
+    result_backend = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
+    celery.conf.update(
+        broker_url=broker_url,
+        result_backend=result_backend,
+        broker_connection_retry_on_startup=True,
+        task_default_queue='fast',
+        task_routes={
+            'app.data_processing.tasks.crawl_tasks.process_single_url_task': {'queue': 'heavy'},
+            'app.chat.tasks.chat_task': {'queue': 'chat'},
+        },
+    )
+
 def create_app():
     app = Flask(__name__)
     app.json_encoder = CustomJSONEncoder
@@ -68,25 +84,14 @@ def create_app():
     except PermissionError as e:
         error_logger.warning("Could not create data directories: %s", e)
 
-    # Celery config (API only needs to dispatch tasks, not run them)
-    broker_url     = os.environ.get('CELERY_BROKER_URL',     'redis://redis:6379/0')
-    result_backend = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
-    celery.conf.update(
-        broker_url=broker_url,
-        result_backend=result_backend,
-        broker_connection_retry_on_startup=True,
-        task_default_queue='fast',
-        task_routes={
-            'app.data_processing.tasks.crawl_tasks.process_single_url_task': {'queue': 'heavy'},
-            'app.chat.tasks.chat_task': {'queue': 'chat'},
-        },
-    )
+    configure_celery()
 
     # Request/Response logging
     @app.before_request
     def _before():
         g.req_id    = str(uuid.uuid4())[:8]
         g.req_start = time.monotonic()
+        start_query_count()
         error_logger.info("→ %s %s  ip=%s  req_id=%s",
                           request.method, request.path, request.remote_addr, g.req_id)
 
@@ -98,8 +103,9 @@ def create_app():
             error_logger.warning if response.status_code >= 400 else
             error_logger.info
         )
-        level("← %s %s %s  %dms  req_id=%s",
-              response.status_code, request.method, request.path, elapsed_ms, g.req_id)
+        # db = Supabase HTTP calls made while serving the request
+        level("← %s %s %s  %dms  db=%s  req_id=%s",
+              response.status_code, request.method, request.path, elapsed_ms, query_count(), g.req_id)
         response.headers["X-Request-ID"] = g.req_id
         return response
 
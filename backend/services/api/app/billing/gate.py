@@ -0,0 +1,192 @@
+"""
+api/app/billing/gate.py
+
+Balance gate for chat turns — API side.
+
+handle_chat used to look up the tenant's owner and read user_billing on every
+message, retrying with sleeps when Supabase was slow. The gate answers both
+from Redis and takes an estimated reservation against the owner's balance in
+one atomic script, so the common case makes no database round trip:
+
+  billing:owner:{tenant_id}          → owner user_id, BILLING_OWNER_CACHE_SECONDS
+  billing:balance:{user_id}          → balance_chf as last read from user_billing,
+                                       minus the turns charged since (worker
+                                       side), BILLING_BALANCE_CACHE_SECONDS
+  billing:reservations:{user_id}     → zset: turn id → expiry (epoch seconds)
+  billing:reservation_amounts:{user_id}
+                                     → hash: turn id → reserved estimate
+
+A turn is admitted while balance minus the unexpired reservations is > 0,
+and reserves CHAT_RESERVATION_CHF under its own turn id. Once its real cost
+is known, worker_chat charges the cost to the cached balance and releases the
+turn's reservation (see worker_chat/app/billing/gate.py). user_billing itself
+is debited by the write-behind drainer. A reservation that is never released
+(dispatch failed, worker killed) expires on its own after
+_RESERVATION_TTL_SECONDS, however busy the owner is.
+
+On a cache miss the value is read from Supabase once — never retried inside
+the request. If neither Redis nor Supabase answer, the turn is let through
+(fail open), as before.
+"""
+import os
+import time
+
+from app.database.redis_client import get_redis
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+BILLING_OWNER_CACHE_SECONDS = int(os.getenv("BILLING_OWNER_CACHE_SECONDS", "600"))
+BILLING_BALANCE_CACHE_SECONDS = int(os.getenv("BILLING_BALANCE_CACHE_SECONDS", "30"))
+CHAT_RESERVATION_CHF = float(os.getenv("CHAT_RESERVATION_CHF", "0.05"))
+# Reservations leaked by turns that never settle expire individually
+_RESERVATION_TTL_SECONDS = 300
+
+# Drops expired reservations, then reserves ARGV[1] for turn ARGV[4] until
+# ARGV[3] + ARGV[2]. Returns -1 when the balance is not cached, 0 when it is
+# used up, 1 when reserved.
+_RESERVE_SCRIPT = """
+local balance = redis.call('get', KEYS[1])
+if not balance then
+    return -1
+end
+local expired = redis.call('zrangebyscore', KEYS[2], '-inf', ARGV[3])
+if #expired > 0 then
+    redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[3])
+    redis.call('hdel', KEYS[3], unpack(expired))
+end
+local reserved = 0
+for _, amount in ipairs(redis.call('hvals', KEYS[3])) do
+    reserved = reserved + tonumber(amount)
+end
+if tonumber(balance) - reserved <= 0 then
+    return 0
+end
+redis.call('zadd', KEYS[2], tonumber(ARGV[3]) + tonumber(ARGV[2]), ARGV[4])
+redis.call('hset', KEYS[3], ARGV[4], ARGV[1])
+redis.call('expire', KEYS[2], ARGV[2])
+redis.call('expire', KEYS[3], ARGV[2])
+return 1
+"""
+
+# Same as worker_chat's release: removing a turn twice is a no-op
+_RELEASE_SCRIPT = """
+redis.call('zrem', KEYS[1], ARGV[1])
+return redis.call('hdel', KEYS[2], ARGV[1])
+"""
+
+
+class TenantNotFound(Exception):
+    """The chat turn names a tenant that does not exist."""
+
+
+class InsufficientBalance(Exception):
+    """The tenant owner's balance is used up."""
+
+
+def _owner_key(tenant_id: str) -> str:
+    return f"billing:owner:{tenant_id}"
+
+
+def _balance_key(user_id: str) -> str:
+    return f"billing:balance:{user_id}"
+
+
+def _reservations_keys(user_id: str) -> list[str]:
+    return [f"billing:reservations:{user_id}", f"billing:reservation_amounts:{user_id}"]
+
+
+def _load_owner(tenant_id: str) -> str | None:
+    response = supabase.table("tenants").select("user_id").eq("id", tenant_id).limit(1).execute()
+    return response.data[0]["user_id"] if response.data else None
+
+
+def _load_balance(user_id: str) -> float:
+    response = supabase.table("user_billing").select("balance_chf").eq("user_id", user_id).limit(1).execute()
+    return float(response.data[0].get("balance_chf") or 0.0) if response.data else 0.0
+
+
+def tenant_owner(tenant_id: str) -> str | None:
+    """The tenant's owner user_id, or None if the tenant does not exist."""
+    r = get_redis()
+    user_id = r.get(_owner_key(tenant_id))
+    if user_id is None:
+        user_id = _load_owner(tenant_id)
+        if user_id:
+            r.set(_owner_key(tenant_id), user_id, ex=BILLING_OWNER_CACHE_SECONDS)
+    return user_id
+
+
+def _reserve(user_id: str, turn_id: str, amount: float) -> bool:
+    r = get_redis()
+    keys = [_balance_key(user_id), *_reservations_keys(user_id)]
+
+    def attempt():
+        return r.eval(_RESERVE_SCRIPT, 3, *keys, amount, _RESERVATION_TTL_SECONDS, time.time(), turn_id)
+
+    status = attempt()
+    if status == -1:
+        # NX: a worker may have charged a fresher value in the meantime
+        r.set(keys[0], _load_balance(user_id), ex=BILLING_BALANCE_CACHE_SECONDS, nx=True)
+        status = attempt()
+    return status == 1
+
+
+def reserve_turn(tenant_id: str, turn_id: str) -> tuple[str | None, float]:
+    """
+    Admits one chat turn. Returns (owner user_id, reserved amount); pass both
+    to chat_task, whose task id must be turn_id, so the reservation is
+    settled once the real cost is known.
+
+    Raises TenantNotFound or InsufficientBalance. The reserved amount is 0.0
+    when Redis is unavailable and the turn was checked against Supabase only.
+    """
+    try:
+        user_id = tenant_owner(tenant_id)
+        if not user_id:
+            raise TenantNotFound(tenant_id)
+        if not _reserve(user_id, turn_id, CHAT_RESERVATION_CHF):
+            raise InsufficientBalance(user_id)
+        return user_id, CHAT_RESERVATION_CHF
+    except (TenantNotFound, InsufficientBalance):
+        raise
+    except Exception as e:
+        error_logger.warning("billing gate: Redis unavailable for tenant %s, checking Supabase: %s", tenant_id, e)
+
+    try:
+        user_id = _load_owner(tenant_id)
+        if not user_id:
+            raise TenantNotFound(tenant_id)
+        if _load_balance(user_id) <= 0:
+            raise InsufficientBalance(user_id)
+        return user_id, 0.0
+    except (TenantNotFound, InsufficientBalance):
+        raise
+    except Exception as e:
+        error_logger.error("billing gate: balance check failed for tenant %s, allowing turn: %s", tenant_id, e, exc_info=True)
+        return None, 0.0
+
+
+def release_turn(user_id: str | None, turn_id: str) -> None:
+    """Drops a turn's reservation when it could not be dispatched. Never raises."""
+    if not user_id:
+        return
+    try:
+        get_redis().eval(_RELEASE_SCRIPT, 2, *_reservations_keys(user_id), turn_id)
+    except Exception as e:
+        error_logger.warning("billing gate: release failed for user %s: %s", user_id, e)
+
+
+def invalidate_balance(user_id: str) -> None:
+    """Drops the cached balance after a credit so the next turn re-reads it."""
+    try:
+        get_redis().delete(_balance_key(user_id))
+    except Exception as e:
+        error_logger.warning("billing gate: invalidation failed for user %s: %s", user_id, e)
+
+
+def invalidate_owner(tenant_id: str) -> None:
+    """Drops the cached owner of a deleted tenant."""
+    try:
+        get_redis().delete(_owner_key(tenant_id))
+    except Exception as e:
+        error_logger.warning("billing gate: owner invalidation failed for tenant %s: %s", tenant_id, e)
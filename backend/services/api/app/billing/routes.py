@@ -1,13 +1,13 @@
 from flask import request, jsonify, redirect
 from app.billing import billing_bp
 from app.billing.services import BillingService
-from app.auth.decorators import token_required
+from app.auth.decorators import fresh_token_required, token_required
 from app.logging_config import error_logger
 import stripe
 import os
 
 @billing_bp.route('/create-checkout-session', methods=['POST'])
-@token_required
+@fresh_token_required
 def create_checkout_session(current_user):
     try:
         user_id = current_user.id
@@ -40,7 +40,7 @@ def get_history(current_user):
         return jsonify({'error': str(e)}), 500
 
 @billing_bp.route('/portal', methods=['POST'])
-@token_required
+@fresh_token_required
 def customer_portal(current_user):
     try:
         # We need the customer ID to create a portal session
@@ -90,9 +90,8 @@ def get_usage(current_user):
             
         tenant_ids = [t['id'] for t in tenants_response.data]
         
-        # Query chat_logs for these tenants
-        # Note: For production, use an RPC or View for aggregation to avoid fetching all rows.
-        logs_response = supabase.table("chat_logs").select("cost_chf, input_tokens, output_tokens").in_("tenant_id", tenant_ids).execute()
+        # Daily chat rollups for these tenants — they also cover archived chat_logs months
+        logs_response = supabase.table("chat_stats_rollups").select("cost_chf, input_tokens, output_tokens").in_("tenant_id", tenant_ids).eq("granularity", "day").execute()
         
         chat_cost = sum(float(item.get('cost_chf', 0) or 0) for item in logs_response.data)
         chat_input = sum(int(item.get('input_tokens', 0) or 0) for item in logs_response.data)
@@ -117,7 +116,7 @@ def get_usage(current_user):
         return jsonify({'error': str(e)}), 500
 
 @billing_bp.route('/verify-session', methods=['POST'])
-@token_required
+@fresh_token_required
 def verify_session(current_user):
     try:
         data = request.get_json()
@@ -2,6 +2,7 @@ import os
 import stripe
 from app.database.supabase_client import supabase
 from app.database.supabase_retry import retrying_execute
+from app.billing.gate import invalidate_balance
 from app.logging_config import error_logger
 
 stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
@@ -118,6 +119,7 @@ class BillingService:
             if session.get("mode") == "payment" and payment_status == "paid":
                 amount_chf = amount_total / 100.0
                 supabase.rpc("credit_balance", {"p_user_id": user_id, "p_amount": amount_chf}).execute()
+                invalidate_balance(user_id)
                 
         except Exception as e:
             error_logger.error(f"Error handling checkout completed: {e}")
@@ -154,6 +156,7 @@ class BillingService:
             amount_chf = amount_paid_cents / 100.0
             
             supabase.rpc("credit_balance", {"p_user_id": user_id, "p_amount": amount_chf}).execute()
+            invalidate_balance(user_id)
             
         except Exception as e:
             error_logger.error(f"Error handling invoice paid: {e}")
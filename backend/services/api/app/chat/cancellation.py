@@ -0,0 +1,42 @@
+"""
+api/app/chat/cancellation.py
+
+Cancellation of abandoned chat turns — API side.
+
+handle_chat starts a heartbeat for each queued turn and get_task_status
+keeps it alive while the widget long-polls. When the widget cancels
+explicitly, or stops polling long enough for the heartbeat to expire,
+worker_chat drops the turn (see worker_chat/app/chat/cancellation.py for
+the worker side and the key layout).
+"""
+import os
+
+from app import celery
+from app.database.redis_client import get_redis
+from app.logging_config import error_logger
+
+# Longer than one long-poll (25 s) plus the widget's reconnect gap
+CHAT_HEARTBEAT_SECONDS = int(os.getenv("CHAT_HEARTBEAT_SECONDS", "40"))
+_CANCEL_TTL_SECONDS = 600
+
+
+def touch_heartbeat(task_id: str) -> bool:
+    """Marks the turn as still awaited by a client. Returns False if Redis failed."""
+    try:
+        get_redis().set(f"chat_turn:{task_id}:heartbeat", 1, ex=CHAT_HEARTBEAT_SECONDS)
+        return True
+    except Exception as e:
+        error_logger.warning("cancellation: heartbeat failed for task %s: %s", task_id, e)
+        return False
+
+
+def request_cancel(task_id: str) -> None:
+    """Flags the turn as cancelled and revokes it if it has not started yet."""
+    try:
+        r = get_redis()
+        r.set(f"chat_turn:{task_id}:cancel", 1, ex=_CANCEL_TTL_SECONDS)
+        r.delete(f"chat_turn:{task_id}:heartbeat")
+    except Exception as e:
+        error_logger.warning("cancellation: flag failed for task %s: %s", task_id, e)
+    # Revoke drops the message if it is still queued; a running turn sees the flag
+    celery.control.revoke(task_id)
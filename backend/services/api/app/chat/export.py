@@ -0,0 +1,136 @@
+"""
+api/app/chat/export.py
+
+Streaming export of a tenant's chat logs as NDJSON or CSV.
+
+Rows are read in (created_at, id) order, one keyset page at a time —
+archived months from their files (database/chat_archive.py), then the table
+through chat_logs_page() — and encoded as they arrive, optionally through an
+incremental gzip stream. Memory use is one page, whatever the history.
+
+Every row carries a `cursor`. A client whose download broke off passes the
+last cursor it received as ?resume= and gets the rows after it:
+
+  GET /api/chat/<tenant_id>/export?format=ndjson&from=2026-01-01&to=2026-04-01
+  GET /api/chat/<tenant_id>/export?format=ndjson&from=2026-01-01&to=2026-04-01&resume=<cursor>
+
+Served by the gateway (app/gateway), where a long download does not pin a
+sync worker.
+"""
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timezone
+
+from app.chat.service import archived_month_set
+from app.database import chat_archive
+
+EXPORT_COLUMNS = [
+    'cursor', 'id', 'conversation_id', 'created_at', 'user_message', 'ai_message', 'route',
+    'model_used', 'input_tokens', 'output_tokens', 'cost_chf', 'latency_ms',
+]
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+_CHUNK_BYTES = 256 * 1024
+
+
+def _timestamp(value) -> datetime:
+    ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def parse_bound(value: str | None) -> datetime | None:
+    """?from= / ?to= — an ISO date or timestamp (UTC unless it says otherwise)."""
+    return _timestamp(value) if value else None
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['created_at']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    created_at, row_id = raw.rsplit('|', 1)
+    return _timestamp(created_at), int(row_id)
+
+
+def _archived_rows(tenant_id, months, start, end, after):
+    """Rows of archived months in the range, after the cursor, in order."""
+    for month in months:
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        month_start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        month_end = datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+        if (start and month_end <= start) or (end and month_start >= end) or (after and month_end <= after[0]):
+            continue
+        for row in chat_archive.read_tenant_month(month, tenant_id):
+            key = (_timestamp(row['created_at']), row['id'])
+            if start and key[0] < start:
+                continue
+            if end and key[0] >= end:
+                break
+            if after and key <= after:
+                continue
+            yield row
+
+
+def iter_rows(tenant_id: str, start=None, end=None, after=None):
+    """All of the tenant's rows in [start, end) after the cursor, oldest first."""
+    tenant_id = str(tenant_id)
+    months = sorted(archived_month_set())
+    yield from _archived_rows(tenant_id, months, start, end, after)
+    # A month being restored is in both places; the archive copy was sent
+    for row in chat_archive.iter_tenant_rows(
+        tenant_id,
+        start.isoformat() if start else None,
+        end.isoformat() if end else None,
+        (after[0].isoformat(), after[1]) if after else None,
+    ):
+        if _timestamp(row['created_at']).date().replace(day=1) not in months:
+            yield row
+
+
+def _records(rows):
+    for row in rows:
+        record = {c: row.get(c) for c in EXPORT_COLUMNS}
+        record['cursor'] = encode_cursor(row)
+        yield record
+
+
+def _ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def _csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_export(tenant_id: str, fmt: str, start=None, end=None, after=None, compress=False):
+    """Yields the encoded export in chunks of about _CHUNK_BYTES."""
+    encode = _ndjson if fmt == 'ndjson' else _csv
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending, size = [], 0
+    for text in encode(_records(iter_rows(tenant_id, start, end, after))):
+        data = text.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= _CHUNK_BYTES:
+            chunk = b''.join(pending)
+            # Sync flush: the client can decompress everything sent so far
+            yield gzip.compress(chunk) + gzip.flush(zlib.Z_SYNC_FLUSH) if gzip else chunk
+            pending, size = [], 0
+    chunk = b''.join(pending)
+    yield gzip.compress(chunk) + gzip.flush() if gzip else chunk
@@ -0,0 +1,126 @@
+"""
+api/app/chat/faq.py
+
+Curated FAQ fast-path for handle_chat.
+
+Tenants can store canonical question/answer pairs in tenant_faqs. Before a
+chat turn is queued for Gemini, the query is matched locally against the
+tenant's FAQ questions; above FAQ_MATCH_THRESHOLD the stored answer is
+returned word for word without touching the LLM.
+
+Matching is two-fold and entirely in-process:
+  - token F1 between the normalized query and question (word overlap)
+  - difflib sequence ratio on the normalized strings (typos, word order noise)
+
+The per-tenant index is cached for FAQ_CACHE_TTL_SECONDS and invalidated
+locally when the tenant's FAQs are replaced through the API.
+"""
+import os
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.82"))
+FAQ_CACHE_TTL_SECONDS = int(os.getenv("FAQ_CACHE_TTL_SECONDS", "60"))
+
+_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# tenant_id -> (loaded_at, FaqIndex)
+_INDEX_CACHE: dict[str, tuple[float, "FaqIndex"]] = {}
+
+
+def normalize_question(text: str) -> str:
+    """Lowercases, strips accents and collapses punctuation to single spaces."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD_RE.sub(" ", text).strip()
+
+
+class FaqIndex:
+    """Normalized lexical + fuzzy matcher over one tenant's FAQ questions."""
+
+    def __init__(self, faqs: list[dict]):
+        self._entries = []
+        for faq in faqs:
+            normalized = normalize_question(faq.get("question", ""))
+            if normalized:
+                self._entries.append((faq, normalized, set(normalized.split())))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def match(self, query: str, threshold: float = FAQ_MATCH_THRESHOLD) -> tuple[dict | None, float]:
+        """Returns (faq, score) for the best match above threshold, else (None, best_score)."""
+        normalized = normalize_question(query)
+        if not normalized or not self._entries:
+            return None, 0.0
+        q_tokens = set(normalized.split())
+
+        best, best_score = None, 0.0
+        for faq, question, tokens in self._entries:
+            if normalized == question:
+                return faq, 1.0
+            common = len(q_tokens & tokens)
+            token_f1 = 2 * common / (len(q_tokens) + len(tokens)) if common else 0.0
+            ratio = SequenceMatcher(None, normalized, question).ratio()
+            score = 0.5 * token_f1 + 0.5 * ratio
+            if score > best_score:
+                best, best_score = faq, score
+
+        if best_score >= threshold:
+            return best, best_score
+        return None, best_score
+
+
+def get_faq_index(tenant_id: str) -> FaqIndex:
+    """Returns the tenant's FAQ index, reloading it from the DB once the TTL lapses."""
+    cached = _INDEX_CACHE.get(tenant_id)
+    if cached and time.monotonic() - cached[0] < FAQ_CACHE_TTL_SECONDS:
+        return cached[1]
+    response = (
+        supabase.table("tenant_faqs")
+        .select("id, question, answer")
+        .eq("tenant_id", tenant_id)
+        .execute()
+    )
+    index = FaqIndex(response.data or [])
+    _INDEX_CACHE[tenant_id] = (time.monotonic(), index)
+    return index
+
+
+def invalidate_faq_index(tenant_id: str) -> None:
+    """Drops this process's cached index so the next lookup reloads it."""
+    _INDEX_CACHE.pop(tenant_id, None)
+
+
+def match_faq(tenant_id: str, query: str) -> tuple[dict | None, float]:
+    """Looks the query up in the tenant's FAQs. Never raises — a failure is a miss."""
+    try:
+        return get_faq_index(tenant_id).match(query)
+    except Exception as e:
+        error_logger.warning("faq: lookup failed for tenant %s: %s", tenant_id, e)
+        return None, 0.0
+
+
+def log_faq_turn(tenant_id: str, conversation_id: str, query: str, faq: dict, latency_ms: int) -> None:
+    """Records a FAQ-served turn in chat_logs at zero cost."""
+    try:
+        supabase.table("chat_logs").insert({
+            "tenant_id": tenant_id,
+            "conversation_id": conversation_id,
+            "user_message": query,
+            "ai_message": faq["answer"],
+            "model_used": "faq",
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cost_chf": 0.0,
+            "latency_ms": latency_ms,
+            "faq_id": faq["id"],
+            "route": "faq",
+        }).execute()
+    except Exception as e:
+        error_logger.error("faq: chat_logs insert failed for tenant %s: %s", tenant_id, e, exc_info=True)
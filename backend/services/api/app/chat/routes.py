@@ -1,71 +1,41 @@
 from flask import Blueprint, request, jsonify
 from app.database.supabase_client import supabase
 from app.logging_config import error_logger
-from app.chat.tasks import chat_task
-from app.billing.services import BillingService
+from app.chat.cancellation import CHAT_HEARTBEAT_SECONDS, request_cancel, touch_heartbeat
+from app.chat.service import (
+    conversation_logs, create_share, get_shared_conversation as load_shared_conversation, submit_turn,
+)
+from app.tenants.bootstrap import get_public_config
+from app.auth.decorators import token_required
+from app.tenants.context import owned_tenant
 from app import limiter
 from celery.result import AsyncResult
-import uuid
 
 chat_bp = Blueprint('chat', __name__)
 
 @chat_bp.route('/<uuid:tenant_id>', methods=['POST'])
 @limiter.limit("30 per minute")
 def handle_chat(tenant_id):
-    try:
-        data = request.get_json()
-        query = data.get('query')
-        chat_history_json = data.get('chat_history', [])
-        conversation_id_str = data.get('conversation_id')
-
-        if not query:
-            return jsonify({"error": "No query provided"}), 400
-
-        if not conversation_id_str:
-            return jsonify({"error": "No conversation_id provided"}), 400
-
-        try:
-            conversation_id = uuid.UUID(conversation_id_str)
-        except ValueError:
-            return jsonify({"error": "Invalid conversation_id format"}), 400
-
-        # Check tenant owner's balance — retry up to 2 times on transient Supabase timeouts
-        import time as _time
-        user_id = None
-        for attempt in range(3):
-            try:
-                tenant_response = supabase.table('tenants').select('user_id').eq('id', str(tenant_id)).single().execute()
-                if not tenant_response.data:
-                    return jsonify({"error": "Tenant not found"}), 404
-                user_id = tenant_response.data['user_id']
-                balance = BillingService.check_balance(user_id)
-                if balance <= 0:
-                    return jsonify({"error": "Insufficient balance. Please recharge."}), 402
-                break  # success
-            except Exception as e:
-                if attempt < 2:
-                    error_logger.warning(f"Billing check attempt {attempt+1} failed for tenant {tenant_id}: {e} — retrying")
-                    _time.sleep(0.5)
-                else:
-                    # All retries exhausted — log and allow through rather than blocking on a transient error
-                    error_logger.error(f"Billing check failed after 3 attempts for tenant {tenant_id}: {e}", exc_info=True)
-
-        task = chat_task.delay(str(tenant_id), query, chat_history_json, str(conversation_id), str(user_id))
-
-        return jsonify({"task_id": task.id}), 202
-    except Exception as e:
-        error_logger.error(f"Error in chat handler for tenant {tenant_id}: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
+    payload, status, after_response = submit_turn(str(tenant_id), request.get_json(silent=True))
+    response = jsonify(payload)
+    if after_response:
+        response.call_on_close(after_response)
+    return response, status
 
 @chat_bp.route('/task/<string:task_id>/status', methods=['GET'])
 def get_task_status(task_id):
     task = AsyncResult(task_id)
     timeout = min(int(request.args.get('timeout', 25)), 30)  # cap at 30s
 
-    # Long poll: hold the connection until the task finishes or we time out
+    # Long poll: hold the connection until the task finishes or we time out.
+    # The heartbeat tells worker_chat someone is still waiting for the answer.
     import time
     deadline = time.time() + timeout
+    last_beat = 0.0
     while not task.ready() and time.time() < deadline:
+        if time.time() - last_beat >= CHAT_HEARTBEAT_SECONDS / 4:
+            touch_heartbeat(task_id)
+            last_beat = time.time()
         time.sleep(0.5)
 
     response = {
@@ -80,10 +50,21 @@ def get_task_status(task_id):
         response['result'] = str(task.info)
     return jsonify(response)
 
+@chat_bp.route('/task/<string:task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """Cancels a chat turn the visitor no longer waits for (widget closed or reset)."""
+    request_cancel(task_id)
+    return jsonify({"task_id": task_id, "state": "CANCELLED"}), 202
+
+import base64
+import uuid
 from datetime import datetime, timedelta, timezone
 
 @chat_bp.route('/<uuid:tenant_id>/analytics', methods=['GET'])
-def get_chat_analytics(tenant_id):
+@token_required
+@owned_tenant()
+def get_chat_analytics(current_user, tenant_id):
+    """Turns, tokens, cost and latency per bucket, read from chat_stats_rollups."""
     try:
         timeframe_hours = request.args.get('timeframe', 24, type=int)
         interval = request.args.get('interval', 'hour')  # 'minute', '5-minute', 'hour', or 'day'
@@ -111,50 +92,77 @@ def get_chat_analytics(tenant_id):
         error_logger.error(f"Error in chat analytics for tenant {tenant_id}: {e}", exc_info=True)
         return jsonify({"error": "An internal error occurred"}), 500
 
-@chat_bp.route('/<uuid:tenant_id>/conversations', methods=['GET'])
-def get_conversations(tenant_id):
+@chat_bp.route('/<uuid:tenant_id>/latency', methods=['GET'])
+@token_required
+@owned_tenant()
+def get_chat_latency(current_user, tenant_id):
+    """p50/p95 latency and token usage per latency profile and route."""
     try:
-        response = supabase.table('chat_logs').select('conversation_id, created_at, user_message, cost_chf').eq('tenant_id', str(tenant_id)).order('created_at', desc=True).execute()
+        timeframe_hours = request.args.get('timeframe', 24 * 7, type=int)
+        start_time = datetime.now(timezone.utc) - timedelta(hours=timeframe_hours)
+
+        response = supabase.rpc('chat_latency_stats', {
+            'p_tenant_id': str(tenant_id),
+            'p_start_time': start_time.isoformat(),
+        }).execute()
+
+        return jsonify(response.data or [])
+
+    except Exception as e:
+        error_logger.error(f"Error in chat latency stats for tenant {tenant_id}: {e}", exc_info=True)
+        return jsonify({"error": "An internal error occurred"}), 500
+
+CONVERSATIONS_PAGE_SIZE = 50
+CONVERSATIONS_PAGE_MAX = 200
 
-        if not hasattr(response, 'data'):
-            error_logger.error(f"Supabase response for tenant {tenant_id} is missing 'data' attribute: {response}")
-            return jsonify({"error": "Invalid response from database"}), 500
+def _encode_cursor(row):
+    raw = f"{row['last_active']}|{row['conversation_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
 
-        # Aggregate conversation data
-        conversations = {}
-        for log in response.data:
-            c_id = log['conversation_id']
-            if c_id not in conversations:
-                conversations[c_id] = {
-                    'conversation_id': c_id,
-                    'last_active': log['created_at'],
-                    'message_count': 0,
-                    'total_cost': 0.0,
-                    'first_message': log['user_message']
-                }
-            
-            conversations[c_id]['message_count'] += 1
-            conversations[c_id]['total_cost'] += (log.get('cost_chf') or 0)
-            # Since we iterate in descending order, the last assignment will be the first message
-            if log['user_message']:
-                conversations[c_id]['first_message'] = log['user_message']
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    last_active, conversation_id = raw.split('|')
+    datetime.fromisoformat(last_active.replace('Z', '+00:00'))
+    return last_active, str(uuid.UUID(conversation_id))
 
-        return jsonify(list(conversations.values()))
+@chat_bp.route('/<uuid:tenant_id>/conversations', methods=['GET'])
+@token_required
+@owned_tenant()
+def get_conversations(current_user, tenant_id):
+    """
+    One page of conversation summaries, newest first. The summaries are kept
+    up to date by a trigger on chat_logs (see the conversations migration),
+    so the cost of a page does not depend on the tenant's history.
+    Pass next_cursor back as ?cursor= for the following page.
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', CONVERSATIONS_PAGE_SIZE, type=int), CONVERSATIONS_PAGE_MAX))
+        params = {'p_tenant_id': str(tenant_id), 'p_limit': limit + 1}
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                params['p_before_active'], params['p_before_id'] = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+        response = supabase.rpc('list_conversations', params).execute()
+        rows = response.data or []
+
+        # One extra row tells whether another page exists
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return jsonify({"conversations": rows[:limit], "next_cursor": next_cursor})
 
     except Exception as e:
         error_logger.error(f"Error in get_conversations for tenant {tenant_id}: {e}", exc_info=True)
         return jsonify({"error": "An internal error occurred"}), 500
 
 @chat_bp.route('/<uuid:tenant_id>/conversation/<uuid:conversation_id>', methods=['GET'])
-def get_conversation_logs(tenant_id, conversation_id):
+@token_required
+@owned_tenant()
+def get_conversation_logs(current_user, tenant_id, conversation_id):
     try:
-        response = supabase.table('chat_logs').select('*').eq('tenant_id', str(tenant_id)).eq('conversation_id', str(conversation_id)).order('created_at').execute()
-
-        if not hasattr(response, 'data'):
-            error_logger.error(f"Supabase response for tenant {tenant_id} is missing 'data' attribute: {response}")
-            return jsonify({"error": "Invalid response from database"}), 500
-
-        return jsonify(response.data)
+        # Months past the retention window are read from the archive files
+        return jsonify(conversation_logs(tenant_id, conversation_id))
 
     except Exception as e:
         error_logger.error(f"Error in get_conversation_logs for tenant {tenant_id}: {e}", exc_info=True)
@@ -163,10 +171,10 @@ def get_conversation_logs(tenant_id, conversation_id):
 @chat_bp.route('/<uuid:tenant_id>/intro', methods=['GET'])
 def get_intro_message(tenant_id):
     try:
-        tenant = supabase.table('tenants').select("intro_message").eq('id', str(tenant_id)).single().execute()
-        if not tenant.data:
+        config, _ = get_public_config(str(tenant_id))
+        if config is None:
             return jsonify({"error": f"Tenant '{tenant_id}' not found"}), 404
-        return jsonify({"intro_message": tenant.data['intro_message']})
+        return jsonify({"intro_message": config['intro_message']})
     except Exception as e:
         error_logger.error(f"Error getting intro message for tenant {tenant_id}: {e}", exc_info=True)
         return jsonify({"error": "An internal error occurred"}), 500
@@ -182,43 +190,8 @@ def create_share_link(tenant_id, conversation_id):
     Validates the conversation exists for this tenant, then upserts a share row.
     Idempotent: sharing the same conversation twice returns the same link.
     """
-    try:
-        tenant_id_str = str(tenant_id)
-        conversation_id_str = str(conversation_id)
-
-        # Validate conversation belongs to this tenant (prevents UUID guessing)
-        check = (
-            supabase.table('chat_logs')
-            .select('conversation_id')
-            .eq('tenant_id', tenant_id_str)
-            .eq('conversation_id', conversation_id_str)
-            .limit(1)
-            .execute()
-        )
-        if not check.data:
-            return jsonify({"error": "Conversation not found"}), 404
-
-        # Upsert — if already shared, refresh the expiry and return the existing row
-        result = (
-            supabase.table('shared_conversations')
-            .upsert(
-                {
-                    "conversation_id": conversation_id_str,
-                    "tenant_id": tenant_id_str,
-                    # expires_at: DB default is now() + 24h, but on conflict we want to
-                    # reset the expiry so re-sharing extends the link lifetime.
-                },
-                on_conflict="conversation_id",
-                returning="representation",
-            )
-            .execute()
-        )
-        row = result.data[0]
-        return jsonify({"share_id": row["id"], "expires_at": row["expires_at"]}), 200
-
-    except Exception as e:
-        error_logger.error(f"Error creating share link for conversation {conversation_id}: {e}", exc_info=True)
-        return jsonify({"error": "Failed to create share link"}), 500
+    payload, status = create_share(str(tenant_id), str(conversation_id))
+    return jsonify(payload), status
 
 
 @chat_bp.route('/shared/<uuid:share_id>', methods=['GET'])
@@ -227,57 +200,5 @@ def get_shared_conversation(share_id):
     Public endpoint — fetches a shared conversation by its share UUID.
     Returns 410 Gone if the link has expired.
     """
-    try:
-        from datetime import datetime, timezone
-        share_id_str = str(share_id)
-
-        # Look up the share row
-        share_resp = (
-            supabase.table('shared_conversations')
-            .select('*')
-            .eq('id', share_id_str)
-            .maybe_single()
-            .execute()
-        )
-        if not share_resp.data:
-            return jsonify({"error": "Share link not found"}), 404
-
-        share = share_resp.data
-        # Check expiry
-        expires_at = datetime.fromisoformat(share['expires_at'].replace('Z', '+00:00'))
-        if datetime.now(timezone.utc) > expires_at:
-            return jsonify({"error": "This share link has expired"}), 410
-
-        conversation_id = share['conversation_id']
-        tenant_id = share['tenant_id']
-
-        # Fetch the conversation messages
-        logs_resp = (
-            supabase.table('chat_logs')
-            .select('user_message, ai_message, created_at')
-            .eq('tenant_id', tenant_id)
-            .eq('conversation_id', conversation_id)
-            .order('created_at')
-            .execute()
-        )
-
-        # Fetch tenant public config for branding
-        tenant_resp = (
-            supabase.table('tenants')
-            .select('widget_config')
-            .eq('id', tenant_id)
-            .single()
-            .execute()
-        )
-        widget_config = (tenant_resp.data or {}).get('widget_config', {})
-
-        return jsonify({
-            "messages":      logs_resp.data or [],
-            "widget_config": widget_config,
-            "tenant_id":     tenant_id,
-            "expires_at":    share['expires_at'],
-        }), 200
-
-    except Exception as e:
-        error_logger.error(f"Error fetching shared conversation {share_id}: {e}", exc_info=True)
-        return jsonify({"error": "Failed to fetch shared conversation"}), 500
+    payload, status = load_shared_conversation(str(share_id))
+    return jsonify(payload), status
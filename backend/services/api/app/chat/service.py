@@ -0,0 +1,256 @@
+"""
+api/app/chat/service.py
+
+The public chat endpoints, independent of the web framework.
+
+Shared by the Flask blueprint (chat/routes.py) and the async gateway
+(app/gateway), which serves the same endpoints to embedded widgets. Every
+function returns (payload, status) — plus, for submit_turn, an optional
+callable to run once the response has been sent — and never raises.
+"""
+import os
+import time
+import uuid
+from datetime import date, datetime, timezone
+
+from app.database import chat_archive
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+from app.chat.tasks import chat_task
+from app.chat.faq import match_faq, log_faq_turn
+from app.chat.cancellation import touch_heartbeat
+from app.billing.gate import InsufficientBalance, TenantNotFound, release_turn, reserve_turn
+from app.tenants.bootstrap import get_public_config
+
+CHAT_TURN_DEADLINE_SECONDS = float(os.getenv('CHAT_TURN_DEADLINE_SECONDS', '60'))
+ARCHIVED_MONTHS_CACHE_SECONDS = 300
+
+# (expires_at monotonic, months whose chat_logs live only in the archive files)
+_archived_months: tuple[float, frozenset] = (0.0, frozenset())
+
+
+def submit_turn(tenant_id: str, data: dict | None):
+    """
+    Answers a turn from the FAQ or queues it for worker_chat.
+    Returns (payload, status, after_response).
+    """
+    started = time.monotonic()
+    try:
+        data = data or {}
+        query = data.get('query')
+        chat_history_json = data.get('chat_history', [])
+        conversation_id_str = data.get('conversation_id')
+
+        if not query:
+            return {"error": "No query provided"}, 400, None
+
+        if not conversation_id_str:
+            return {"error": "No conversation_id provided"}, 400, None
+
+        try:
+            conversation_id = uuid.UUID(conversation_id_str)
+        except ValueError:
+            return {"error": "Invalid conversation_id format"}, 400, None
+
+        # Curated FAQ fast-path — answered locally, no LLM, no queue, no cost.
+        # The response carries the result inline instead of a task_id.
+        faq, score = match_faq(tenant_id, query)
+        if faq:
+            latency_ms = int((time.monotonic() - started) * 1000)
+            error_logger.info(
+                "FAQ match for tenant %s (faq=%s score=%.2f, %dms)", tenant_id, faq['id'], score, latency_ms
+            )
+            payload = {
+                "state": "SUCCESS",
+                "result": {
+                    "answer": faq['answer'],
+                    "chat_history": list(chat_history_json) + [
+                        {"type": "human", "content": query},
+                        {"type": "ai", "content": faq['answer']},
+                    ],
+                    "citations": [],
+                    "source": "faq",
+                },
+            }
+            # Logged after the response has been sent so the write stays off the critical path
+            return payload, 200, lambda: log_faq_turn(tenant_id, str(conversation_id), query, faq, latency_ms)
+
+        # Balance gate — cached owner and balance plus an estimated reservation,
+        # settled by the worker once the real cost is known (see billing/gate.py)
+        # The reservation is held under the chat task's id
+        task_id = str(uuid.uuid4())
+        try:
+            user_id, reserved = reserve_turn(tenant_id, task_id)
+        except TenantNotFound:
+            return {"error": "Tenant not found"}, 404, None
+        except InsufficientBalance:
+            return {"error": "Insufficient balance. Please recharge."}, 402, None
+
+        # The widget gives up after its long-polls run out; the worker drops or
+        # cuts short any turn still running past this point.
+        now = time.time()
+        try:
+            # The heartbeat must exist before a worker can pick the turn up
+            heartbeat = touch_heartbeat(task_id)
+            task = chat_task.apply_async(
+                args=(tenant_id, query, chat_history_json, str(conversation_id), user_id),
+                kwargs={
+                    "deadline": now + CHAT_TURN_DEADLINE_SECONDS,
+                    "enqueued_at": now,
+                    "heartbeat": heartbeat,
+                    "reserved": reserved,
+                },
+                task_id=task_id,
+            )
+        except Exception:
+            # No worker will ever settle this turn
+            release_turn(user_id, task_id)
+            raise
+
+        return {"task_id": task.id}, 202, None
+    except Exception as e:
+        error_logger.error(f"Error in chat handler for tenant {tenant_id}: {e}", exc_info=True)
+        return {"error": str(e)}, 500, None
+
+
+def create_share(tenant_id: str, conversation_id: str):
+    """
+    Validates the conversation exists for this tenant, then upserts a share row.
+    Idempotent: sharing the same conversation twice returns the same link.
+    """
+    try:
+        # Validate conversation belongs to this tenant (prevents UUID guessing)
+        check = (
+            supabase.table('conversations')
+            .select('conversation_id')
+            .eq('tenant_id', tenant_id)
+            .eq('conversation_id', conversation_id)
+            .limit(1)
+            .execute()
+        )
+        if not check.data:
+            return {"error": "Conversation not found"}, 404
+
+        # Upsert — if already shared, refresh the expiry and return the existing row
+        result = (
+            supabase.table('shared_conversations')
+            .upsert(
+                {
+                    "conversation_id": conversation_id,
+                    "tenant_id": tenant_id,
+                    # expires_at: DB default is now() + 24h, but on conflict we want to
+                    # reset the expiry so re-sharing extends the link lifetime.
+                },
+                on_conflict="conversation_id",
+                returning="representation",
+            )
+            .execute()
+        )
+        row = result.data[0]
+        return {"share_id": row["id"], "expires_at": row["expires_at"]}, 200
+
+    except Exception as e:
+        error_logger.error(f"Error creating share link for conversation {conversation_id}: {e}", exc_info=True)
+        return {"error": "Failed to create share link"}, 500
+
+
+def get_shared_conversation(share_id: str):
+    """Fetches a shared conversation by its share UUID; 410 once the link expired."""
+    try:
+        # Look up the share row
+        share_resp = (
+            supabase.table('shared_conversations')
+            .select('*')
+            .eq('id', share_id)
+            .maybe_single()
+            .execute()
+        )
+        if not share_resp or not share_resp.data:
+            return {"error": "Share link not found"}, 404
+
+        share = share_resp.data
+        # Check expiry
+        expires_at = datetime.fromisoformat(share['expires_at'].replace('Z', '+00:00'))
+        if datetime.now(timezone.utc) > expires_at:
+            return {"error": "This share link has expired"}, 410
+
+        conversation_id = share['conversation_id']
+        tenant_id = share['tenant_id']
+
+        # Fetch the conversation messages
+        messages = conversation_logs(tenant_id, conversation_id, 'user_message, ai_message, created_at')
+
+        # Tenant public config for branding (cached, see tenants/bootstrap.py)
+        config, _ = get_public_config(tenant_id)
+        widget_config = (config or {}).get('widget_config', {})
+
+        return {
+            "messages":      messages,
+            "widget_config": widget_config,
+            "tenant_id":     tenant_id,
+            "expires_at":    share['expires_at'],
+        }, 200
+
+    except Exception as e:
+        error_logger.error(f"Error fetching shared conversation {share_id}: {e}", exc_info=True)
+        return {"error": "Failed to fetch shared conversation"}, 500
+
+
+def archived_month_set() -> frozenset:
+    """Months currently archived and not restored (cached per process)."""
+    global _archived_months
+    expires_at, months = _archived_months
+    if expires_at > time.monotonic():
+        return months
+    response = supabase.table('chat_logs_archives').select('month').is_('restored_at', 'null').execute()
+    months = frozenset(date.fromisoformat(r['month']) for r in response.data or [])
+    _archived_months = (time.monotonic() + ARCHIVED_MONTHS_CACHE_SECONDS, months)
+    return months
+
+
+def _conversation_months(tenant_id: str, conversation_id: str, archived: frozenset) -> list[date]:
+    """Archived months the conversation has turns in, from its summary row."""
+    response = (
+        supabase.table('conversations')
+        .select('started_at, last_active')
+        .eq('tenant_id', tenant_id)
+        .eq('conversation_id', conversation_id)
+        .limit(1)
+        .execute()
+    )
+    if not response.data:
+        return []
+    first = datetime.fromisoformat(response.data[0]['started_at'].replace('Z', '+00:00')).date().replace(day=1)
+    last = datetime.fromisoformat(response.data[0]['last_active'].replace('Z', '+00:00')).date().replace(day=1)
+    return sorted(m for m in archived if first <= m <= last)
+
+
+def conversation_logs(tenant_id: str, conversation_id: str, columns: str = '*') -> list[dict]:
+    """
+    A conversation's chat_logs rows in order — from the table and, for months
+    moved to cold storage, from the archive files (see chat_archive.py).
+    """
+    tenant_id, conversation_id = str(tenant_id), str(conversation_id)
+    select = columns if columns == '*' else f"id, {columns}"
+    rows = (
+        supabase.table('chat_logs')
+        .select(select)
+        .eq('tenant_id', tenant_id)
+        .eq('conversation_id', conversation_id)
+        .order('created_at')
+        .execute()
+    ).data or []
+
+    archived = archived_month_set()
+    months = _conversation_months(tenant_id, conversation_id, archived) if archived else []
+    if months:
+        # A month being restored can be in both places; ids are unique
+        seen = {row['id'] for row in rows}
+        for month in months:
+            rows.extend(r for r in chat_archive.read_conversation(month, tenant_id, conversation_id) if r['id'] not in seen)
+        rows.sort(key=lambda r: datetime.fromisoformat(str(r['created_at']).replace('Z', '+00:00')))
+
+    if columns == '*':
+        return rows
+    keys = [c.strip() for c in columns.split(',')]
+    return [{k: row.get(k) for k in keys} for row in rows]
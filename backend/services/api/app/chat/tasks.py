@@ -14,5 +14,8 @@ class _TaskProxy:
     def delay(self, *args, **kwargs):
         return celery.send_task(self._name, args=args, kwargs=kwargs, queue=self._queue)
 
+    def apply_async(self, args=(), kwargs=None, **options):
+        return celery.send_task(self._name, args=args, kwargs=kwargs or {}, queue=self._queue, **options)
+
 
 chat_task = _TaskProxy('app.chat.tasks.chat_task', queue='chat')
@@ -0,0 +1,91 @@
+"""
+services/api/app/gateway/__init__.py
+
+Async gateway for the public, high fan-out widget endpoints.
+
+Every embedded widget submits chat turns, long-polls their status for up to
+30 s and loads its public config. Under gunicorn's sync workers each of those
+long-polls pins a worker for its whole duration, so the number of visitors
+waiting for an answer was capped at the worker count. The gateway serves the
+same routes (see gateway/routes.py) on an ASGI server, where a waiting
+request is a future on the event loop:
+
+  uvicorn asgi:app --workers 4 --limit-concurrency 2000 --backlog 4096
+
+The authenticated dashboard API stays on Flask (create_app); nginx routes the
+public paths here. Both share chat/service.py, tenants/bootstrap.py and
+Celery configuration.
+"""
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+
+from app import configure_celery
+from app.database.supabase_client import query_count, start_query_count
+from app.logging_config import error_logger
+
+load_dotenv()
+
+
+class RequestLogMiddleware(BaseHTTPMiddleware):
+    """The request/response log lines of create_app, for the gateway."""
+
+    async def dispatch(self, request, call_next):
+        req_id = str(uuid.uuid4())[:8]
+        started = time.monotonic()
+        start_query_count()
+        client = request.client.host if request.client else "-"
+        error_logger.info("→ %s %s  ip=%s  req_id=%s", request.method, request.url.path, client, req_id)
+
+        response = await call_next(request)
+
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        level = (
+            error_logger.error   if response.status_code >= 500 else
+            error_logger.warning if response.status_code >= 400 else
+            error_logger.info
+        )
+        level("← %s %s %s  %dms  db=%s  req_id=%s",
+              response.status_code, request.method, request.url.path, elapsed_ms, query_count(), req_id)
+        response.headers["X-Request-ID"] = req_id
+        return response
+
+
+def create_gateway():
+    from app.gateway.progress import CrawlProgressHub
+    from app.gateway.results import TaskResults
+    from app.gateway.routes import routes
+
+    configure_celery()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.results = TaskResults(os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0'))
+        await app.state.results.start()
+        app.state.crawl_progress = CrawlProgressHub()
+        error_logger.info("Gateway ready")
+        try:
+            yield
+        finally:
+            await app.state.crawl_progress.stop()
+            await app.state.results.stop()
+
+    cors_origins = os.environ.get('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000').split(',')
+    cors_origins = [o.strip() for o in cors_origins if o.strip()]
+
+    return Starlette(
+        routes=routes,
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=cors_origins, allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"]),
+            Middleware(RequestLogMiddleware),
+        ],
+        lifespan=lifespan,
+    )
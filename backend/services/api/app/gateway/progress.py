@@ -0,0 +1,124 @@
+"""
+api/app/gateway/progress.py
+
+Throttled crawl progress for open dashboards, pushed over SSE.
+
+Instead of every dashboard receiving every crawling_tasks row change through
+Supabase Realtime, each gateway process polls crawl_progress_snapshot() once
+per tenant that has a dashboard open — at most every
+CRAWL_PROGRESS_INTERVAL seconds while a crawl runs, every
+CRAWL_PROGRESS_IDLE_INTERVAL otherwise — and hands the jobs whose snapshot
+changed to that tenant's subscribers. A subscriber keeps only the latest
+snapshot per job, so a slow client skips intermediate states instead of
+queueing them.
+
+  hub = CrawlProgressHub()
+  subscriber = hub.subscribe(tenant_id)         # current snapshots queued at once
+  snapshots = await subscriber.next(15)         # [] after 15 s without change
+  hub.unsubscribe(tenant_id, subscriber)
+  await hub.stop()                              # on shutdown
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+CRAWL_PROGRESS_INTERVAL = float(os.getenv('CRAWL_PROGRESS_INTERVAL', '0.5'))
+CRAWL_PROGRESS_IDLE_INTERVAL = float(os.getenv('CRAWL_PROGRESS_IDLE_INTERVAL', '5'))
+# Finished jobs stay in the snapshot this long, so their last state is delivered
+_SINCE_SLACK = timedelta(seconds=30)
+_ACTIVE = frozenset({'PENDING', 'IN_PROGRESS'})
+
+
+def _snapshot(row: dict) -> dict:
+    counts = {k: row[k] for k in ('pending', 'in_progress', 'completed', 'failed')}
+    return {
+        "job_id": row['job_id'],
+        "status": row['status'],
+        "progress": {"total": sum(counts.values()), **counts},
+        "source_counts": {"COMPLETED": row['sources_completed'], "ERROR": row['sources_error']},
+    }
+
+
+def _fetch(tenant_id: str) -> list[dict]:
+    since = datetime.now(timezone.utc) - _SINCE_SLACK
+    return supabase.rpc('crawl_progress_snapshot', {
+        'p_tenant_id': tenant_id, 'p_since': since.isoformat(),
+    }).execute().data or []
+
+
+class Subscriber:
+    def __init__(self):
+        self._pending: dict[int, dict] = {}
+        self._changed = asyncio.Event()
+
+    def push(self, snapshot: dict) -> None:
+        self._pending[snapshot['job_id']] = snapshot
+        self._changed.set()
+
+    async def next(self, timeout: float) -> list[dict]:
+        """The snapshots changed since the last call, waiting up to timeout seconds."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._changed.clear()
+        snapshots, self._pending = list(self._pending.values()), {}
+        return snapshots
+
+
+class CrawlProgressHub:
+    def __init__(self):
+        self._subscribers: dict[str, set[Subscriber]] = {}
+        self._latest: dict[str, dict[int, dict]] = {}
+        self._pollers: dict[str, asyncio.Task] = {}
+
+    def subscribe(self, tenant_id: str) -> Subscriber:
+        subscriber = Subscriber()
+        for snapshot in self._latest.get(tenant_id, {}).values():
+            subscriber.push(snapshot)
+        self._subscribers.setdefault(tenant_id, set()).add(subscriber)
+        if tenant_id not in self._pollers:
+            self._pollers[tenant_id] = asyncio.create_task(self._poll(tenant_id))
+        return subscriber
+
+    def unsubscribe(self, tenant_id: str, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(tenant_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            # The poller notices and stops
+
+    async def stop(self) -> None:
+        for task in self._pollers.values():
+            task.cancel()
+        await asyncio.gather(*self._pollers.values(), return_exceptions=True)
+        self._pollers.clear()
+
+    async def _poll(self, tenant_id: str) -> None:
+        latest = self._latest.setdefault(tenant_id, {})
+        try:
+            while self._subscribers.get(tenant_id):
+                active = False
+                try:
+                    rows = await run_in_threadpool(_fetch, tenant_id)
+                    for row in rows:
+                        snapshot = _snapshot(row)
+                        active = active or snapshot['status'] in _ACTIVE
+                        if latest.get(row['job_id']) != snapshot:
+                            latest[row['job_id']] = snapshot
+                            for subscriber in self._subscribers.get(tenant_id, ()):
+                                subscriber.push(snapshot)
+                    current = {row['job_id'] for row in rows}
+                    for job_id in [j for j in latest if j not in current]:
+                        del latest[job_id]
+                except Exception as e:
+                    error_logger.warning("gateway: crawl progress poll failed for tenant %s: %s", tenant_id, e)
+                await asyncio.sleep(CRAWL_PROGRESS_INTERVAL if active else CRAWL_PROGRESS_IDLE_INTERVAL)
+        finally:
+            self._pollers.pop(tenant_id, None)
+            self._subscribers.pop(tenant_id, None)
+            self._latest.pop(tenant_id, None)
@@ -0,0 +1,98 @@
+"""
+api/app/gateway/results.py
+
+Async long-poll on Celery chat results.
+
+The Redis result backend stores every task state under celery-task-meta-<id>
+and publishes the same JSON on a channel of that name. Each gateway process
+holds ONE pattern subscription to those channels and wakes the waiting
+requests directly, so a long-poll costs a future on the event loop instead
+of a thread polling AsyncResult every 500 ms.
+
+  results = TaskResults(result_backend_url)
+  await results.start()                        # on startup
+  meta = await results.wait(task_id, 25)       # dict, or None while pending
+  await results.stop()                         # on shutdown
+"""
+import asyncio
+import json
+
+import redis.asyncio as aioredis
+
+from app.logging_config import error_logger
+
+KEY_PREFIX = "celery-task-meta-"
+READY_STATES = frozenset({"SUCCESS", "FAILURE", "REVOKED"})
+_RECONNECT_SECONDS = 1.0
+
+
+class TaskResults:
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url, decode_responses=True, health_check_interval=30)
+        self._waiters: dict[str, set[asyncio.Future]] = {}
+        self._listener: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self._redis.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{KEY_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            self._dispatch(message["channel"][len(KEY_PREFIX):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Waiters fall back to reading the key when their timeout ends
+                error_logger.warning("gateway: result subscription lost, reconnecting: %s", e)
+                await asyncio.sleep(_RECONNECT_SECONDS)
+
+    def _dispatch(self, task_id: str, data: str) -> None:
+        waiters = self._waiters.get(task_id)
+        if not waiters:
+            return
+        try:
+            meta = json.loads(data)
+        except ValueError:
+            return
+        if meta.get("status") not in READY_STATES:
+            return
+        for future in self._waiters.pop(task_id, ()):
+            if not future.done():
+                future.set_result(meta)
+
+    async def get(self, task_id: str) -> dict | None:
+        data = await self._redis.get(f"{KEY_PREFIX}{task_id}")
+        return json.loads(data) if data else None
+
+    async def wait(self, task_id: str, timeout: float) -> dict | None:
+        """Returns the task meta once ready, or the latest (or None) after timeout seconds."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, set()).add(future)
+        try:
+            # Subscribed before reading, so a result stored in between is not missed
+            meta = await self.get(task_id)
+            if meta and meta.get("status") in READY_STATES:
+                return meta
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return await self.get(task_id)
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    self._waiters.pop(task_id, None)
@@ -0,0 +1,312 @@
+"""
+api/app/gateway/routes.py
+
+The public widget endpoints, served by the async gateway.
+
+Same paths and payloads as the Flask routes in chat/routes.py and
+tenants/routes.py + tenants/widget.py — nginx decides which service answers.
+Blocking work (Supabase, Celery dispatch) runs in the threadpool through the
+framework-independent functions of chat/service.py and tenants/bootstrap.py;
+only the long-poll is native async (see gateway/results.py).
+
+Two long-lived dashboard streams live here too, which a sync gunicorn worker
+cannot afford: the chat log export (chat/export.py) and the crawl progress
+events (gateway/progress.py).
+"""
+import asyncio
+import json
+import os
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.auth.tokens import authenticate
+from app.chat import export, service
+from app.chat.cancellation import CHAT_HEARTBEAT_SECONDS, request_cancel, touch_heartbeat
+from app.logging_config import error_logger
+from app.tenants.bootstrap import PUBLIC_CONFIG_CACHE_SECONDS, get_public_config
+from app.tenants.context import is_tenant_owner
+
+LONG_POLL_MAX_SECONDS = 30
+SSE_PING_SECONDS = 15
+
+# Same storage and limits as the Flask routes (Flask-Limiter, fixed window)
+_rate_limiter = FixedWindowRateLimiter(
+    storage_from_string(os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0'))
+)
+CHAT_LIMIT = parse("30 per minute")
+SHARE_LIMIT = parse("10 per minute")
+
+
+def _allowed(request, limit, scope: str) -> bool:
+    """Runs in the threadpool. Fails open — a Redis outage must not stop the widget."""
+    try:
+        return _rate_limiter.hit(limit, "gateway", scope, request.client.host if request.client else "-")
+    except Exception as e:
+        error_logger.warning("gateway: rate limiter unavailable: %s", e)
+        return True
+
+
+def _too_many():
+    return JSONResponse({"error": "Too many requests"}, status_code=429)
+
+
+async def handle_chat(request):
+    data = None
+    try:
+        data = await request.json()
+    except ValueError:
+        pass
+
+    def submit():
+        if not _allowed(request, CHAT_LIMIT, "chat"):
+            return None
+        return service.submit_turn(str(request.path_params['tenant_id']), data)
+
+    result = await run_in_threadpool(submit)
+    if result is None:
+        return _too_many()
+    payload, status, after_response = result
+    background = BackgroundTask(after_response) if after_response else None
+    return JSONResponse(payload, status_code=status, background=background)
+
+
+def _status_response(task_id: str, meta: dict | None) -> dict:
+    """The body chat/routes.py get_task_status builds from AsyncResult."""
+    if meta is None:
+        return {"task_id": task_id, "state": "PENDING", "result": "None"}
+    state = meta.get("status", "PENDING")
+    result = meta.get("result")
+    if state == "SUCCESS":
+        return {"task_id": task_id, "state": state, "result": result}
+    if state == "FAILURE" and isinstance(result, dict) and "exc_type" in result:
+        # str() of the re-raised exception, as AsyncResult.info would give
+        args = result.get("exc_message") or []
+        if not isinstance(args, (list, tuple)):
+            args = [args]
+        result = str(args[0]) if len(args) == 1 else str(tuple(args)) if args else ""
+    return {"task_id": task_id, "state": state, "result": str(result)}
+
+
+async def _keep_heartbeat(task_id: str) -> None:
+    # The heartbeat tells worker_chat someone is still waiting for the answer
+    while True:
+        await run_in_threadpool(touch_heartbeat, task_id)
+        await asyncio.sleep(CHAT_HEARTBEAT_SECONDS / 4)
+
+
+async def get_task_status(request):
+    task_id = request.path_params['task_id']
+    try:
+        timeout = min(int(request.query_params.get('timeout', 25)), LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        timeout = 25
+
+    heartbeat = asyncio.create_task(_keep_heartbeat(task_id))
+    try:
+        meta = await request.app.state.results.wait(task_id, max(timeout, 0))
+    except Exception as e:
+        error_logger.error(f"Error waiting for task {task_id}: {e}", exc_info=True)
+        return JSONResponse({"error": "An internal error occurred"}, status_code=500)
+    finally:
+        heartbeat.cancel()
+    return JSONResponse(_status_response(task_id, meta))
+
+
+async def cancel_task(request):
+    """Cancels a chat turn the visitor no longer waits for (widget closed or reset)."""
+    task_id = request.path_params['task_id']
+    await run_in_threadpool(request_cancel, task_id)
+    return JSONResponse({"task_id": task_id, "state": "CANCELLED"}, status_code=202)
+
+
+async def _public_config(tenant_id):
+    return await run_in_threadpool(get_public_config, str(tenant_id))
+
+
+async def get_public_tenant(request):
+    tenant_id = request.path_params['tenant_id']
+    try:
+        config, _ = await _public_config(tenant_id)
+        if config is None:
+            return JSONResponse({"error": "Tenant not found"}, status_code=404)
+        return JSONResponse(config)
+    except Exception as e:
+        error_logger.error(f"Error fetching public tenant info for {tenant_id}: {e}", exc_info=True)
+        return JSONResponse({"error": "Failed to fetch tenant info"}, status_code=500)
+
+
+async def get_widget_bootstrap(request):
+    """Public — everything the widget needs to start, in one cached response."""
+    tenant_id = request.path_params['tenant_id']
+    try:
+        config, etag = await _public_config(tenant_id)
+        if config is None:
+            return JSONResponse({"error": "Tenant not found"}, status_code=404)
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": f"public, max-age={PUBLIC_CONFIG_CACHE_SECONDS}, stale-while-revalidate=300",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match and etag in {t.strip().removeprefix("W/").strip('"') for t in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+        return Response(json.dumps(config), media_type="application/json", headers=headers)
+    except Exception as e:
+        error_logger.error(f"Error fetching widget bootstrap for {tenant_id}: {e}", exc_info=True)
+        return JSONResponse({"error": "Failed to fetch tenant info"}, status_code=500)
+
+
+async def get_intro_message(request):
+    tenant_id = request.path_params['tenant_id']
+    try:
+        config, _ = await _public_config(tenant_id)
+        if config is None:
+            return JSONResponse({"error": f"Tenant '{tenant_id}' not found"}, status_code=404)
+        return JSONResponse({"intro_message": config['intro_message']})
+    except Exception as e:
+        error_logger.error(f"Error getting intro message for tenant {tenant_id}: {e}", exc_info=True)
+        return JSONResponse({"error": "An internal error occurred"}, status_code=500)
+
+
+async def create_share_link(request):
+    tenant_id = str(request.path_params['tenant_id'])
+    conversation_id = str(request.path_params['conversation_id'])
+
+    def share():
+        if not _allowed(request, SHARE_LIMIT, "share"):
+            return None
+        return service.create_share(tenant_id, conversation_id)
+
+    result = await run_in_threadpool(share)
+    if result is None:
+        return _too_many()
+    payload, status = result
+    return JSONResponse(payload, status_code=status)
+
+
+async def get_shared_conversation(request):
+    payload, status = await run_in_threadpool(
+        service.get_shared_conversation, str(request.path_params['share_id'])
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def _owner_error(request, tenant_id: str):
+    """token_required + owned_tenant for the gateway: an error response, or None."""
+    parts = request.headers.get('Authorization', '').split(" ")
+    if len(parts) != 2:
+        return JSONResponse({'message': 'Token is missing!'}, status_code=401)
+    try:
+        user = await run_in_threadpool(authenticate, parts[1])
+        if not user:
+            return JSONResponse({'message': 'Token is invalid!'}, status_code=401)
+    except Exception as e:
+        return JSONResponse({'message': 'Token is invalid!', 'error': str(e)}, status_code=401)
+    try:
+        if not await run_in_threadpool(is_tenant_owner, user.id, tenant_id):
+            return JSONResponse({"error": "Tenant not found or access denied"}, status_code=404)
+    except Exception as e:
+        error_logger.error(f"Error checking tenant {tenant_id} for user {user.id}: {e}", exc_info=True)
+        return JSONResponse({"error": "Failed to load tenant", "details": str(e)}, status_code=500)
+    return None
+
+
+async def export_chat_logs(request):
+    """Dashboard — the tenant's chat logs as a streamed NDJSON or CSV download (see chat/export.py)."""
+    tenant_id = str(request.path_params['tenant_id'])
+    error = await _owner_error(request, tenant_id)
+    if error:
+        return error
+
+    params = request.query_params
+    fmt = params.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return JSONResponse({"error": "format must be ndjson or csv"}, status_code=400)
+    try:
+        start = export.parse_bound(params.get('from'))
+        end = export.parse_bound(params.get('to'))
+        after = export.decode_cursor(params['resume']) if params.get('resume') else None
+    except ValueError:
+        return JSONResponse({"error": "Invalid from, to or resume"}, status_code=400)
+
+    compress = 'gzip' in request.headers.get('accept-encoding', '')
+    headers = {
+        "Content-Disposition": f'attachment; filename="chat-logs-{tenant_id}.{fmt}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    def chunks():
+        # A sync generator — Starlette pulls it in the threadpool
+        try:
+            yield from export.iter_export(tenant_id, fmt, start, end, after, compress)
+        except Exception as e:
+            # Headers are gone; the client resumes from the last cursor it got
+            error_logger.error(f"Chat log export for tenant {tenant_id} aborted: {e}", exc_info=True)
+            raise
+
+    return StreamingResponse(chunks(), media_type=export.FORMATS[fmt], headers=headers)
+
+
+async def crawl_progress_events(request):
+    """
+    Dashboard — progress snapshots of the tenant's crawl jobs as server-sent
+    events (see gateway/progress.py): one `progress` event per changed job,
+    a comment line every SSE_PING_SECONDS to keep the connection open.
+    """
+    tenant_id = str(request.path_params['tenant_id'])
+    error = await _owner_error(request, tenant_id)
+    if error:
+        return error
+
+    hub = request.app.state.crawl_progress
+
+    async def events():
+        subscriber = hub.subscribe(tenant_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                snapshots = await subscriber.next(SSE_PING_SECONDS)
+                if not snapshots:
+                    yield ": ping\n\n"
+                for snapshot in snapshots:
+                    yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+        finally:
+            hub.unsubscribe(tenant_id, subscriber)
+
+    headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+async def health_check(request):
+    status = {"status": "ok", "service": "swiftanswer-gateway"}
+    try:
+        await request.app.state.results.get("health")
+        status["redis"] = "ok"
+    except Exception:
+        status["redis"] = "error"
+        status["status"] = "degraded"
+    return JSONResponse(status, status_code=200 if status["status"] == "ok" else 503)
+
+
+routes = [
+    Route('/api/gateway/health', health_check, methods=['GET']),
+    Route('/api/chat/{tenant_id:uuid}', handle_chat, methods=['POST']),
+    Route('/api/chat/task/{task_id}/status', get_task_status, methods=['GET']),
+    Route('/api/chat/task/{task_id}/cancel', cancel_task, methods=['POST']),
+    Route('/api/chat/{tenant_id:uuid}/intro', get_intro_message, methods=['GET']),
+    Route('/api/chat/{tenant_id:uuid}/conversation/{conversation_id:uuid}/share', create_share_link, methods=['POST']),
+    Route('/api/chat/shared/{share_id:uuid}', get_shared_conversation, methods=['GET']),
+    Route('/api/chat/{tenant_id:uuid}/export', export_chat_logs, methods=['GET']),
+    Route('/api/tenants/{tenant_id:uuid}/public', get_public_tenant, methods=['GET']),
+    Route('/api/tenants/{tenant_id:uuid}/bootstrap', get_widget_bootstrap, methods=['GET']),
+    Route('/api/tenants/{tenant_id:uuid}/crawling_jobs/events', crawl_progress_events, methods=['GET']),
+]
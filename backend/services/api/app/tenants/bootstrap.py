@@ -0,0 +1,87 @@
+"""
+api/app/tenants/bootstrap.py
+
+Cached public tenant config for the embedded widget.
+
+Every page view of a customer site loads widget.js, which needs the tenant's
+name, intro_message and widget_config. Those used to be two Supabase queries
+per page view (/public and /intro). They are now read once per tenant and
+kept in a per-process cache for PUBLIC_CONFIG_CACHE_SECONDS:
+
+  - concurrent misses for the same tenant are coalesced — one thread queries,
+    the others wait for its result
+  - each entry carries an ETag, so browsers and CDNs revalidate with a 304
+  - update_tenant drops the entry in its own process; other processes
+    serve the old config until it expires (the same window browsers cache it)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from app.database.supabase_client import supabase
+
+PUBLIC_CONFIG_CACHE_SECONDS = int(os.getenv("PUBLIC_CONFIG_CACHE_SECONDS", "60"))
+PUBLIC_COLUMNS = "name, intro_message, widget_config"
+_CACHE_MAX = 10_000
+
+# tenant_id -> (expires_at monotonic, config or None when the tenant does not exist, etag)
+_cache: dict[str, tuple[float, dict | None, str | None]] = {}
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(tenant_id: str) -> threading.Lock:
+    with _locks_guard:
+        lock = _locks.get(tenant_id)
+        if lock is None:
+            if len(_locks) >= _CACHE_MAX:
+                _locks.clear()
+            lock = _locks[tenant_id] = threading.Lock()
+        return lock
+
+
+def _fresh(tenant_id: str):
+    entry = _cache.get(tenant_id)
+    if entry and entry[0] > time.monotonic():
+        return entry
+    return None
+
+
+def _load(tenant_id: str) -> tuple[dict | None, str | None]:
+    response = supabase.table('tenants').select(PUBLIC_COLUMNS).eq('id', tenant_id).limit(1).execute()
+    if not response.data:
+        return None, None
+    row = response.data[0]
+    config = {
+        "name": row.get("name"),
+        "intro_message": row.get("intro_message"),
+        "widget_config": row.get("widget_config") or {},
+    }
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+    return config, digest[:16]
+
+
+def get_public_config(tenant_id: str) -> tuple[dict | None, str | None]:
+    """Returns (config, etag) for the tenant, or (None, None) if it does not exist."""
+    tenant_id = str(tenant_id)
+    entry = _fresh(tenant_id)
+    if entry:
+        return entry[1], entry[2]
+
+    with _lock_for(tenant_id):
+        # Another thread may have loaded it while this one waited
+        entry = _fresh(tenant_id)
+        if entry:
+            return entry[1], entry[2]
+        config, etag = _load(tenant_id)
+        if len(_cache) >= _CACHE_MAX:
+            _cache.clear()
+        _cache[tenant_id] = (time.monotonic() + PUBLIC_CONFIG_CACHE_SECONDS, config, etag)
+        return config, etag
+
+
+def invalidate_public_config(tenant_id: str) -> None:
+    """Drops the cached config after the tenant was updated or deleted."""
+    _cache.pop(str(tenant_id), None)
@@ -0,0 +1,126 @@
+"""
+api/app/tenants/context.py
+
+Tenant ownership checks for dashboard routes.
+
+Almost every /api/tenants/<tenant_id>/... route used to start with the same
+tenants query (id + user_id) before doing its real work, and the dashboard
+polls several of them. owned_tenant does that check once per request and
+puts the tenant into flask.g:
+
+  @token_required
+  @owned_tenant()                                   # ownership only
+  def get_sources(current_user, tenant_id): ...
+
+  @token_required
+  @owned_tenant("id, gemini_file_store_name")       # plus the row, in g.tenant
+  def delete_all_sources(current_user, tenant_id): ...
+
+Ownership is kept in a per-process cache for TENANT_OWNER_CACHE_SECONDS, so
+ownership-only routes usually make no tenants query at all. Rows are always
+read fresh — columns such as gemini_file_store_name are changed by workers.
+Only positive answers are cached; create_tenant and delete_tenant drop the
+entry (other API processes keep theirs until it expires).
+"""
+import os
+import time
+from functools import wraps
+
+from flask import g, jsonify
+
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+TENANT_OWNER_CACHE_SECONDS = int(os.getenv("TENANT_OWNER_CACHE_SECONDS", "30"))
+_OWNER_CACHE_MAX = 10_000
+
+# (user_id, tenant_id) -> expires_at (monotonic)
+_owner_cache: dict[tuple[str, str], float] = {}
+
+
+def _is_cached(user_id: str, tenant_id: str) -> bool:
+    expires_at = _owner_cache.get((user_id, tenant_id))
+    return expires_at is not None and expires_at > time.monotonic()
+
+
+def _remember(user_id: str, tenant_id: str) -> None:
+    if len(_owner_cache) >= _OWNER_CACHE_MAX:
+        _owner_cache.clear()
+    _owner_cache[(user_id, tenant_id)] = time.monotonic() + TENANT_OWNER_CACHE_SECONDS
+
+
+def forget_tenant(user_id: str, tenant_id: str) -> None:
+    """Drops a cached ownership (tenant created or deleted)."""
+    _owner_cache.pop((str(user_id), str(tenant_id)), None)
+
+
+def is_tenant_owner(user_id: str, tenant_id: str) -> bool:
+    """Ownership check without a request context (cached, like load_owned_tenant)."""
+    user_id, tenant_id = str(user_id), str(tenant_id)
+    if _is_cached(user_id, tenant_id):
+        return True
+    response = (
+        supabase.table('tenants').select('id').eq('id', tenant_id).eq('user_id', user_id)
+        .limit(1).execute()
+    )
+    if not response.data:
+        forget_tenant(user_id, tenant_id)
+        return False
+    _remember(user_id, tenant_id)
+    return True
+
+
+def load_owned_tenant(user_id: str, tenant_id: str, columns: str | None = None) -> dict | None:
+    """
+    Returns the tenant if user_id owns it, else None. Without columns only
+    ownership is checked (cached); with columns the row is read fresh.
+    The result is kept in g for the rest of the request.
+    """
+    user_id, tenant_id = str(user_id), str(tenant_id)
+    tenant = g.get("tenant")
+    if tenant is not None and tenant.get("id") == tenant_id and (
+        columns is None or all(c.strip() in tenant for c in columns.split(","))
+    ):
+        return tenant
+
+    if columns is None:
+        if not is_tenant_owner(user_id, tenant_id):
+            return None
+        tenant = {"id": tenant_id, "user_id": user_id}
+    else:
+        response = (
+            supabase.table('tenants').select(columns).eq('id', tenant_id).eq('user_id', user_id)
+            .limit(1).execute()
+        )
+        if not response.data:
+            forget_tenant(user_id, tenant_id)
+            return None
+        tenant = {"id": tenant_id, "user_id": user_id, **response.data[0]}
+        _remember(user_id, tenant_id)
+
+    g.tenant = tenant
+    return tenant
+
+
+def owned_tenant(columns: str | None = None):
+    """
+    Route decorator (below token_required): 404s unless current_user owns
+    tenant_id, and stores the tenant in g.tenant.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(current_user, tenant_id, *args, **kwargs):
+            try:
+                tenant = load_owned_tenant(current_user.id, tenant_id, columns)
+            except Exception as e:
+                error_logger.error(
+                    f"Error checking tenant {tenant_id} for user {current_user.id}: {e}",
+                    extra={'user_id': current_user.id}, exc_info=True,
+                )
+                return jsonify({"error": "Failed to load tenant", "details": str(e)}), 500
+            if not tenant:
+                return jsonify({"error": "Tenant not found or access denied"}), 404
+            return f(current_user, tenant_id, *args, **kwargs)
+
+        return decorated_function
+    return decorator
@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
 from app.database.supabase_client import supabase
-from app.auth.decorators import token_required
+from app.auth.decorators import fresh_token_required, token_required
 from app.models.database import Tenant, TenantFineTune
 from app.logging_config import error_logger
+from app.chat.faq import invalidate_faq_index
+from app.chat.service import CHAT_TURN_DEADLINE_SECONDS
+from app.billing.gate import invalidate_owner
+from app.tenants.context import forget_tenant, owned_tenant
+from app.tenants.bootstrap import get_public_config, invalidate_public_config
+from app.tenants.sources import source_totals
 from uuid import uuid4
 import os
 
@@ -30,16 +36,18 @@ def create_tenant(current_user):
         }
         supabase.table('tenants').insert(tenant_data).execute()
 
-        # Fine-tune rules are stored in DB only — injected into the system
-        # prompt at chat time. No vector embedding needed.
+        # Fine-tune rules are stored in DB only — the relevant ones are injected
+        # into the system prompt at chat time. No vector embedding needed.
         fine_tune_rules_data = data.get('fine_tune_rules', [])
         if fine_tune_rules_data:
             rules_to_insert = [
-                {"tenant_id": str(tenant_id), "trigger": r['trigger'], "instruction": r['instruction']}
+                {"tenant_id": str(tenant_id), "trigger": r['trigger'], "instruction": r['instruction'],
+                 "always_on": bool(r.get('always_on', False))}
                 for r in fine_tune_rules_data
             ]
             supabase.table('tenant_fine_tune').insert(rules_to_insert).execute()
 
+        forget_tenant(current_user.id, tenant_id)
         return jsonify({"message": "Tenant created successfully", "id": str(tenant_id)}), 201
     except Exception as e:
         error_logger.error(f"Error creating tenant for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
@@ -57,19 +65,21 @@ def get_tenants(current_user):
 
 @tenants_bp.route('/<uuid:tenant_id>', methods=['GET'])
 @token_required
+@owned_tenant("*")
 def get_tenant(current_user, tenant_id):
     try:
-        tenant = supabase.table('tenants').select("*").eq('id', str(tenant_id)).eq('user_id', current_user.id).single().execute()
-        if not tenant.data:
-            return jsonify({"error": "Tenant not found"}), 404
+        tenant = dict(g.tenant)
 
         fine_tune_rules = supabase.table('tenant_fine_tune').select("*").eq('tenant_id', str(tenant_id)).execute()
-        tenant.data['fine_tune_rules'] = fine_tune_rules.data
+        tenant['fine_tune_rules'] = fine_tune_rules.data
+
+        faqs = supabase.table('tenant_faqs').select("*").eq('tenant_id', str(tenant_id)).order('id').execute()
+        tenant['faqs'] = faqs.data
 
-        tenant_sources = supabase.table('tenant_sources').select("*").eq('tenant_id', str(tenant_id)).execute()
-        tenant.data['tenant_sources'] = tenant_sources.data
+        # Counts only — the sources themselves are paged by GET .../sources
+        tenant['source_counts'] = source_totals(tenant_id)
 
-        return jsonify(tenant.data), 200
+        return jsonify(tenant), 200
     except Exception as e:
         error_logger.error(f"Error fetching tenant {tenant_id} for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
         return jsonify({"error": "Failed to fetch tenant", "details": str(e)}), 500
@@ -77,34 +87,88 @@ def get_tenant(current_user, tenant_id):
 @tenants_bp.route('/<uuid:tenant_id>/public', methods=['GET'])
 def get_public_tenant(tenant_id):
     try:
-        tenant = supabase.table('tenants').select("name, intro_message, widget_config").eq('id', str(tenant_id)).single().execute()
-        if not tenant.data:
+        config, _ = get_public_config(str(tenant_id))
+        if config is None:
             return jsonify({"error": "Tenant not found"}), 404
-        return jsonify(tenant.data), 200
+        return jsonify(config), 200
     except Exception as e:
         error_logger.error(f"Error fetching public tenant info for {tenant_id}: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch tenant info"}), 500
 
+# Presets and tunable keys of worker_chat/app/chat/latency_profiles.py.
+# The models and hedging are set by ops only, never through the API. A model
+# call can never outlast the turn's deadline, so neither can its timeout.
+LATENCY_PROFILE_NAMES = ('fast', 'balanced', 'thorough')
+LATENCY_PROFILE_LIMITS = {
+    'max_output_tokens': (64, 8192),
+    'thinking_budget': (0, 8192),
+    'retrieval_top_k': (1, 20),
+    'timeout_seconds': (5, int(CHAT_TURN_DEADLINE_SECONDS)),
+}
+LATENCY_PROFILE_OPS_KEYS = ('model', 'fallback_model', 'hedge_delay_seconds')
+
+def _validate_latency_profile(profile):
+    """Returns an error message for an invalid latency profile, else None."""
+    if not isinstance(profile, dict) or profile.get('name') not in LATENCY_PROFILE_NAMES:
+        return f"latency_profile.name must be one of {', '.join(LATENCY_PROFILE_NAMES)}"
+    for key, value in profile.items():
+        if key == 'name' or value is None:
+            continue
+        if key not in LATENCY_PROFILE_LIMITS:
+            return f"Unknown latency_profile key '{key}'"
+        low, high = LATENCY_PROFILE_LIMITS[key]
+        if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+            return f"latency_profile.{key} must be an integer between {low} and {high}"
+    return None
+
+def _merge_latency_profile(submitted, stored):
+    """
+    (profile, error) for a latency profile sent by the settings page. Ops-only
+    keys in the payload are ignored and the stored ones kept — the page sends
+    back the whole stored profile, ops keys included.
+    """
+    if isinstance(submitted, dict):
+        submitted = {k: v for k, v in submitted.items() if k not in LATENCY_PROFILE_OPS_KEYS}
+        # Timeouts saved while the limit was 120s come back with the stored profile
+        timeout_max = LATENCY_PROFILE_LIMITS['timeout_seconds'][1]
+        timeout = submitted.get('timeout_seconds')
+        if isinstance(timeout, int) and not isinstance(timeout, bool) and timeout > timeout_max:
+            submitted['timeout_seconds'] = timeout_max
+    error = _validate_latency_profile(submitted)
+    if error:
+        return None, error
+    for key in LATENCY_PROFILE_OPS_KEYS:
+        if (stored or {}).get(key) is not None:
+            submitted[key] = stored[key]
+    return submitted, None
+
 @tenants_bp.route('/<uuid:tenant_id>', methods=['PUT'])
 @token_required
+@owned_tenant("id, latency_profile")
 def update_tenant(current_user, tenant_id):
     try:
         tenant_id_str = str(tenant_id)
         data = request.get_json()
 
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         tenant_update_data = {}
         allowed_fields = ['name', 'intro_message', 'system_persona', 'rag_prompt_template',
-                          'doc_language', 'translation_target', 'widget_config', 'crawl_mode']
+                          'doc_language', 'translation_target', 'widget_config', 'crawl_mode',
+                          'answer_cache_enabled', 'latency_profile']
         for field in allowed_fields:
             if field in data:
                 tenant_update_data[field] = data[field]
 
+        if 'latency_profile' in tenant_update_data:
+            profile, profile_error = _merge_latency_profile(
+                tenant_update_data['latency_profile'], g.tenant.get('latency_profile')
+            )
+            if profile_error:
+                return jsonify({"error": profile_error}), 400
+            tenant_update_data['latency_profile'] = profile
+
         if tenant_update_data:
             supabase.table('tenants').update(tenant_update_data).eq('id', tenant_id_str).execute()
+            invalidate_public_config(tenant_id_str)
 
         if 'fine_tune_rules' in data:
             # Replace all fine-tune rules — no vector store involved, just DB rows
@@ -112,27 +176,37 @@ def update_tenant(current_user, tenant_id):
             new_rules_data = data['fine_tune_rules']
             if new_rules_data:
                 rules_to_insert = [
-                    {"tenant_id": tenant_id_str, "trigger": r['trigger'], "instruction": r['instruction']}
+                    {"tenant_id": tenant_id_str, "trigger": r['trigger'], "instruction": r['instruction'],
+                     "always_on": bool(r.get('always_on', False))}
                     for r in new_rules_data
                 ]
                 supabase.table('tenant_fine_tune').insert(rules_to_insert).execute()
 
+        if 'faqs' in data:
+            # Replace all curated FAQ pairs used by the chat fast-path
+            supabase.table('tenant_faqs').delete().eq('tenant_id', tenant_id_str).execute()
+            faqs_to_insert = [
+                {"tenant_id": tenant_id_str, "question": f['question'], "answer": f['answer']}
+                for f in (data['faqs'] or [])
+                if f.get('question') and f.get('answer')
+            ]
+            if faqs_to_insert:
+                supabase.table('tenant_faqs').insert(faqs_to_insert).execute()
+            invalidate_faq_index(tenant_id_str)
+
         return jsonify({"message": "Tenant updated successfully"}), 200
     except Exception as e:
         error_logger.error(f"Error updating tenant {tenant_id} for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
         return jsonify({"error": "Failed to update tenant", "details": str(e)}), 500
 
 @tenants_bp.route('/<uuid:tenant_id>', methods=['DELETE'])
-@token_required
+@fresh_token_required
+@owned_tenant("id, gemini_file_store_name")
 def delete_tenant(current_user, tenant_id):
     try:
         tenant_id_str = str(tenant_id)
-        tenant_resp = supabase.table('tenants').select("*").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_resp.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         # Delete the Gemini File Search Store (and all its documents) if it exists
-        store_name = (tenant_resp.data or {}).get('gemini_file_store_name')
+        store_name = g.tenant.get('gemini_file_store_name')
         if store_name:
             try:
                 from app.gemini_store.service import GeminiStoreService
@@ -146,6 +220,9 @@ def delete_tenant(current_user, tenant_id):
         supabase.table('tenant_fine_tune').delete().eq('tenant_id', tenant_id_str).execute()
         supabase.table('tenant_sources').delete().eq('tenant_id', tenant_id_str).execute()
         supabase.table('tenants').delete().eq('id', tenant_id_str).execute()
+        invalidate_owner(tenant_id_str)
+        forget_tenant(current_user.id, tenant_id_str)
+        invalidate_public_config(tenant_id_str)
         return jsonify({"message": "Tenant deleted successfully"}), 200
     except Exception as e:
         error_logger.error(f"Error deleting tenant {tenant_id} for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
@@ -1,37 +1,91 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, g, request, jsonify
 from app.database.supabase_client import supabase
 from app.auth.decorators import token_required
-from app.models.database import SourceType
+from app.tenants.context import owned_tenant
+from app.models.database import CrawlingStatus, SourceStatus, SourceType
 from app.data_processing.tasks import process_local_file, process_urls, crawl_links_task
 from app.logging_config import error_logger
 from app import celery
 import os
 
 UPLOADS_DIR = os.environ.get("UPLOADS_DIR", "/app/data/uploads")
+SOURCES_PAGE_SIZE = 50
+JOBS_PAGE_SIZE = 20
+TASKS_PAGE_SIZE = 100
+PAGE_MAX = 200
 
 sources_bp = Blueprint('sources', __name__)
 
+def _page_args(default_limit):
+    """(limit, cursor) from the query string; the cursor is the last id of the previous page."""
+    limit = max(1, min(request.args.get('limit', default_limit, type=int), PAGE_MAX))
+    cursor = request.args.get('cursor')
+    if cursor is not None and not cursor.isdigit():
+        raise ValueError("Invalid cursor")
+    return limit, int(cursor) if cursor else None
+
+def _page(rows, limit):
+    """Rows were fetched with limit + 1: (page, next_cursor)."""
+    return rows[:limit], (rows[limit - 1]['id'] if len(rows) > limit else None)
+
+def source_totals(tenant_id):
+    """{'total', 'by_status', 'by_type'} of a tenant's sources, from tenant_source_counts."""
+    rows = supabase.rpc('tenant_source_totals', {'p_tenant_id': str(tenant_id)}).execute().data or []
+    by_status, by_type = {}, {}
+    for row in rows:
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['n']
+        by_type[row['source_type']] = by_type.get(row['source_type'], 0) + row['n']
+    return {"total": sum(by_status.values()), "by_status": by_status, "by_type": by_type}
+
+def _progress_body(row):
+    """The progress payload from a crawling_job_progress row."""
+    counts = {status: row[status] for status in ('pending', 'in_progress', 'completed', 'failed')}
+    return {"total": sum(counts.values()), **counts}
+
 @sources_bp.route('/<uuid:tenant_id>/sources', methods=['GET'])
 @token_required
+@owned_tenant()
 def get_sources(current_user, tenant_id):
+    """
+    One page of sources, newest first, optionally filtered by ?status=, ?type=
+    and ?job_id=. ?cursor= is the next_cursor of the previous page.
+    """
     try:
         tenant_id_str = str(tenant_id)
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-        sources = supabase.table('tenant_sources').select("*").eq('tenant_id', tenant_id_str).execute()
-        return jsonify(sources.data), 200
+        try:
+            limit, cursor = _page_args(SOURCES_PAGE_SIZE)
+            status = request.args.get('status')
+            source_type = request.args.get('type')
+            job_id = request.args.get('job_id', type=int)
+            if status is not None:
+                status = SourceStatus(status).value
+            if source_type is not None:
+                source_type = SourceType(source_type).value
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        query = supabase.table('tenant_sources').select("*").eq('tenant_id', tenant_id_str)
+        if status:
+            query = query.eq('status', status)
+        if source_type:
+            query = query.eq('source_type', source_type)
+        if job_id is not None:
+            query = query.eq('job_id', job_id)
+        if cursor is not None:
+            query = query.lt('id', cursor)
+        rows = query.order('id', desc=True).limit(limit + 1).execute().data or []
+
+        sources, next_cursor = _page(rows, limit)
+        return jsonify({"sources": sources, "next_cursor": next_cursor}), 200
     except Exception as e:
         error_logger.error(f"Error getting sources for tenant {tenant_id} for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
         return jsonify({"error": "Failed to retrieve sources", "details": str(e)}), 500
 
 @sources_bp.route('/<uuid:tenant_id>/sources/upload', methods=['POST'])
 @token_required
+@owned_tenant()
 def upload_source(current_user, tenant_id):
     tenant_id_str = str(tenant_id)
-    tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-    if not tenant_check.data:
-        return jsonify({"error": "Tenant not found or access denied"}), 404
 
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
@@ -65,6 +119,7 @@ def upload_source(current_user, tenant_id):
 
 @sources_bp.route('/<uuid:tenant_id>/sources/crawl', methods=['POST'])
 @token_required
+@owned_tenant()
 def crawl_sources(current_user, tenant_id):
     try:
         data = request.get_json()
@@ -73,10 +128,6 @@ def crawl_sources(current_user, tenant_id):
         if not urls or not isinstance(urls, list):
             return jsonify({"error": "A list of URLs is required"}), 400
 
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         sources_to_insert = [{"tenant_id": tenant_id_str, "source_type": SourceType.URL, "source_location": url, "status": "QUEUED"} for url in urls]
         source_records = supabase.table('tenant_sources').insert(sources_to_insert).execute()
         urls_with_ids = [(rec['source_location'], rec['id']) for rec in source_records.data]
@@ -90,6 +141,7 @@ def crawl_sources(current_user, tenant_id):
 
 @sources_bp.route('/<uuid:tenant_id>/sources/discover', methods=['POST'])
 @token_required
+@owned_tenant()
 def discover_links(current_user, tenant_id):
     try:
         data = request.get_json()
@@ -102,10 +154,6 @@ def discover_links(current_user, tenant_id):
         if not start_url:
             return jsonify({"error": "URL is required"}), 400
 
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         # Persist the selected crawl_mode so all worker tasks pick it up from the DB
         valid_modes = {'soup', 'playwright', 'playwright_llm'}
         if crawl_mode not in valid_modes:
@@ -126,95 +174,179 @@ def discover_links(current_user, tenant_id):
 
 @sources_bp.route('/<uuid:tenant_id>/crawling_jobs', methods=['GET'])
 @token_required
+@owned_tenant()
 def get_crawling_jobs(current_user, tenant_id):
+    """
+    One page of crawl jobs, newest first (?status=, ?cursor=, ?limit=). Each
+    job carries its counts, read from the summary tables:
+      source_counts   {status: n} of the sources it produced (tenant_source_counts)
+      error_codes     {status_code: n} of its ERROR sources
+      task_count      crawl tasks of any status (crawling_job_progress)
+    """
     try:
-        from collections import defaultdict
         tenant_id_str = str(tenant_id)
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
-        jobs_resp = supabase.table('crawling_jobs').select("*").eq('tenant_id', tenant_id_str).order('created_at', desc=True).execute()
-        jobs = jobs_resp.data or []
-        if not jobs:
-            return jsonify([]), 200
-
-        job_ids = [j['id'] for j in jobs]
-
-        # Batch-fetch tasks — one query for all jobs
-        # NOTE: Supabase default row limit is 1000 — raise it explicitly so large
-        # crawls (3000+ pages) are not silently truncated in the job stats display.
-        tasks_resp = supabase.table('crawling_tasks').select("job_id,url,status").in_('job_id', job_ids).limit(10000).execute()
-        tasks_by_job = defaultdict(list)
-        all_crawled_urls = set()
-        for t in (tasks_resp.data or []):
-            tasks_by_job[t['job_id']].append(t)
-            all_crawled_urls.add(t['url'])
-
-        # Batch-fetch matching tenant_sources — fetch all for this tenant, filter in Python
-        # (avoids httpx "URL component 'query' too long" when crawl jobs contain hundreds of URLs)
-        sources_by_url = {}
-        if all_crawled_urls:
-            sources_resp = supabase.table('tenant_sources').select("*") \
+        try:
+            limit, cursor = _page_args(JOBS_PAGE_SIZE)
+            status = request.args.get('status')
+            if status is not None:
+                status = CrawlingStatus(status).value
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        query = supabase.table('crawling_jobs').select("*").eq('tenant_id', tenant_id_str)
+        if status:
+            query = query.eq('status', status)
+        if cursor is not None:
+            query = query.lt('id', cursor)
+        jobs, next_cursor = _page(query.order('id', desc=True).limit(limit + 1).execute().data or [], limit)
+
+        counts, progress = [], []
+        if jobs:
+            job_ids = [j['id'] for j in jobs]
+            progress = supabase.table('crawling_job_progress') \
+                .select("job_id, pending, in_progress, completed, failed") \
+                .in_('job_id', job_ids) \
+                .execute().data or []
+            counts = supabase.table('tenant_source_counts') \
+                .select("job_key, status, status_code, n") \
                 .eq('tenant_id', tenant_id_str) \
-                .limit(10000) \
-                .execute()
-            for s in (sources_resp.data or []):
-                if s['source_location'] in all_crawled_urls:
-                    sources_by_url[s['source_location']] = s
+                .in_('job_key', job_ids) \
+                .gt('n', 0) \
+                .execute().data or []
 
-        # Attach sources + counts to each job
+        by_job = {j['id']: j for j in jobs}
         for job in jobs:
-            job_tasks = tasks_by_job.get(job['id'], [])
-            job['sources'] = [sources_by_url[t['url']] for t in job_tasks if t['url'] in sources_by_url]
-            job['task_count'] = len(job_tasks)
-
-        return jsonify(jobs), 200
+            job.update(source_counts={}, error_codes={}, task_count=0)
+        for row in progress:
+            by_job[row['job_id']]['task_count'] = _progress_body(row)['total']
+        for row in counts:
+            job = by_job[row['job_key']]
+            job['source_counts'][row['status']] = job['source_counts'].get(row['status'], 0) + row['n']
+            if row['status'] == SourceStatus.ERROR.value:
+                code = str(row['status_code'] or '?')
+                job['error_codes'][code] = job['error_codes'].get(code, 0) + row['n']
+
+        return jsonify({"jobs": jobs, "next_cursor": next_cursor}), 200
     except Exception as e:
         error_logger.error(f"Error getting crawling jobs for tenant {tenant_id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
         return jsonify({"error": "Failed to retrieve crawling jobs", "details": str(e)}), 500
 
 @sources_bp.route('/<uuid:tenant_id>/crawling_jobs/<int:job_id>/progress', methods=['GET'])
 @token_required
+@owned_tenant()
 def get_crawling_job_progress(current_user, tenant_id, job_id):
+    """
+    Task counts of a crawl job, from its crawling_job_progress row (kept by
+    triggers on crawling_tasks). The ETag is the row's version, so a poll of
+    an unchanged job is a 304.
+    """
     try:
-        from app.models.database import CrawlingStatus
         tenant_id_str = str(tenant_id)
 
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
-        job_check = supabase.table('crawling_jobs').select("id").eq('id', job_id).eq('tenant_id', tenant_id_str).maybe_single().execute()
-        if not job_check.data:
+        job_resp = supabase.table('crawling_jobs') \
+            .select("id, crawling_job_progress(pending, in_progress, completed, failed, version)") \
+            .eq('id', job_id).eq('tenant_id', tenant_id_str) \
+            .limit(1).execute()
+        if not job_resp.data:
             return jsonify({"error": "Job not found or not part of this tenant"}), 404
 
-        tasks_response = supabase.table('crawling_tasks').select('status').eq('job_id', job_id).limit(10000).execute()
+        row = job_resp.data[0].get('crawling_job_progress')
+        if isinstance(row, list):
+            row = row[0] if row else None
+        row = row or {'pending': 0, 'in_progress': 0, 'completed': 0, 'failed': 0, 'version': 0}
 
-        from collections import Counter
-        status_list = [task['status'] for task in tasks_response.data]
-        db_counts = Counter(status_list)
+        etag = f"{job_id}-{row['version']}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(_progress_body(row))
+        response.headers['ETag'] = f'"{etag}"'
+        # Revalidate every time — the browser turns a 304 back into the cached body
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except Exception as e:
+        error_logger.error(f"Error getting job progress for job {job_id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
+        return jsonify({"error": "Failed to retrieve job progress", "details": str(e)}), 500
 
-        counts = {status.value: 0 for status in CrawlingStatus}
-        for status_str, count in db_counts.items():
-            if status_str in counts:
-                counts[status_str] = count
+def _archived_tasks(entries):
+    """Task dicts from a crawling_job_archives tasks array ([url, status, depth, parent] entries)."""
+    return [
+        {"id": i + 1, "url": url, "status": status, "depth": depth,
+         "parent_url": entries[parent][0] if parent is not None else None}
+        for i, (url, status, depth, parent) in enumerate(entries)
+    ]
+
+def _task_cursor(cursor):
+    """(kind, value) of a crawl task cursor: ('t', task id), ('a', position) or (None, None)."""
+    if not cursor:
+        return None, None
+    kind, _, value = cursor.partition(':')
+    if kind not in ('t', 'a') or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    return kind, int(value)
+
+@sources_bp.route('/<uuid:tenant_id>/crawling_jobs/<int:job_id>/tasks', methods=['GET'])
+@token_required
+@owned_tenant()
+def get_crawling_job_tasks(current_user, tenant_id, job_id):
+    """
+    One page of a crawl job's pages in crawl order (?status=, ?cursor=,
+    ?limit=): url, status, depth and parent_url. Finished jobs are read from
+    their crawling_job_archives row once compacted, live ones from
+    crawling_tasks. Archived tasks are numbered by position, not by task id,
+    so the cursor names its source: "t:<task id>" or "a:<position>". A task
+    cursor for a job compacted in the meantime gets a 409 — page again from
+    the start.
+    """
+    try:
+        tenant_id_str = str(tenant_id)
+        try:
+            limit = max(1, min(request.args.get('limit', TASKS_PAGE_SIZE, type=int), PAGE_MAX))
+            cursor_kind, cursor = _task_cursor(request.args.get('cursor'))
+            status = request.args.get('status')
+            if status is not None:
+                status = CrawlingStatus(status).value
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        job_resp = supabase.table('crawling_jobs') \
+            .select("id, crawling_job_archives(tasks)") \
+            .eq('id', job_id).eq('tenant_id', tenant_id_str) \
+            .limit(1).execute()
+        if not job_resp.data:
+            return jsonify({"error": "Job not found or not part of this tenant"}), 404
+
+        archive = job_resp.data[0].get('crawling_job_archives')
+        if isinstance(archive, list):
+            archive = archive[0] if archive else None
 
-        progress = {
-            "total": sum(counts.values()),
-            "completed": counts.get(CrawlingStatus.COMPLETED.value, 0),
-            "pending": counts.get(CrawlingStatus.PENDING.value, 0),
-            "in_progress": counts.get(CrawlingStatus.IN_PROGRESS.value, 0),
-            "failed": counts.get(CrawlingStatus.FAILED.value, 0)
-        }
+        if cursor_kind and cursor_kind != ('a' if archive else 't'):
+            return jsonify({"error": "The crawl job was archived since the last page; start again"}), 409
 
-        return jsonify(progress), 200
+        if archive:
+            rows = [t for t in _archived_tasks(archive['tasks'])
+                    if t['id'] > (cursor or 0) and (status is None or t['status'] == status)][:limit + 1]
+        else:
+            query = supabase.table('crawling_tasks') \
+                .select("id, url, status, depth, parent_url") \
+                .eq('job_id', job_id)
+            if status:
+                query = query.eq('status', status)
+            if cursor is not None:
+                query = query.gt('id', cursor)
+            rows = query.order('id').limit(limit + 1).execute().data or []
+
+        tasks, next_cursor = _page(rows, limit)
+        if next_cursor is not None:
+            next_cursor = f"{'a' if archive else 't'}:{next_cursor}"
+        return jsonify({"tasks": tasks, "next_cursor": next_cursor, "archived": bool(archive)}), 200
     except Exception as e:
-        error_logger.error(f"Error getting job progress for job {job_id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
-        return jsonify({"error": "Failed to retrieve job progress", "details": str(e)}), 500
+        error_logger.error(f"Error getting tasks for crawl job {job_id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
+        return jsonify({"error": "Failed to retrieve crawl job tasks", "details": str(e)}), 500
 
 @sources_bp.route('/<uuid:tenant_id>/crawling_jobs/<int:job_id>/cancel', methods=['POST'])
 @token_required
+@owned_tenant()
 def cancel_crawling_job(current_user, tenant_id, job_id):
     """
     Soft-cancel a crawl job.
@@ -227,11 +359,6 @@ def cancel_crawling_job(current_user, tenant_id, job_id):
         from app.models.database import CrawlingStatus
         tenant_id_str = str(tenant_id)
 
-        # Auth check
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         # Ownership check
         job_check = supabase.table('crawling_jobs').select("id", "status").eq('id', job_id).eq('tenant_id', tenant_id_str).single().execute()
         if not job_check.data:
@@ -265,12 +392,12 @@ def cancel_crawling_job(current_user, tenant_id, job_id):
 
 @sources_bp.route('/<uuid:tenant_id>/crawling_jobs/<int:job_id>', methods=['DELETE'])
 @token_required
+@owned_tenant()
 def delete_crawling_job(current_user, tenant_id, job_id):
     """
     Delete a crawl job and ALL data it produced:
       1. Cancel any in-flight tasks (mark FAILED so workers stop)
-      2. Bulk-delete every tenant_sources row whose source_location was
-         crawled by this job (identified via crawling_tasks.url)
+      2. Bulk-delete every tenant_sources row the job produced (job_id)
       3. Delete those vectors from ChromaDB
       4. Delete crawling_tasks rows
       5. Delete the crawling_jobs row
@@ -279,10 +406,6 @@ def delete_crawling_job(current_user, tenant_id, job_id):
         from app.models.database import CrawlingStatus
         tenant_id_str = str(tenant_id)
 
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
         job_check = supabase.table('crawling_jobs').select("id", "status").eq('id', job_id).eq('tenant_id', tenant_id_str).single().execute()
         if not job_check.data:
             return jsonify({"error": "Job not found or not part of this tenant"}), 404
@@ -297,38 +420,25 @@ def delete_crawling_job(current_user, tenant_id, job_id):
                 .execute()
             supabase.table('crawling_jobs').update({"status": CrawlingStatus.FAILED.value}).eq('id', job_id).execute()
 
-        # 2. Collect all URLs that this job crawled
-        tasks_resp = supabase.table('crawling_tasks').select("url").eq('job_id', job_id).execute()
-        crawled_urls = [t['url'] for t in (tasks_resp.data or [])]
-
-        # 3. Find + delete matching tenant_sources rows
-        deleted_source_ids = []
-        if crawled_urls:
-            sources_resp = supabase.table('tenant_sources') \
-                .select("id") \
-                .eq('tenant_id', tenant_id_str) \
-                .in_('source_location', crawled_urls) \
-                .execute()
-            deleted_source_ids = [s['id'] for s in (sources_resp.data or [])]
-
-            if deleted_source_ids:
-                # Fetch gemini_document_name for each source before deletion
-                sources_full = supabase.table('tenant_sources') \
-                    .select("id, gemini_document_name") \
-                    .in_('id', deleted_source_ids) \
-                    .execute()
-                supabase.table('tenant_sources').delete().in_('id', deleted_source_ids).execute()
+        # 2.+3. Delete the job's tenant_sources rows, keeping their document names
+        sources_full = supabase.table('tenant_sources') \
+            .delete() \
+            .eq('tenant_id', tenant_id_str) \
+            .eq('job_id', job_id) \
+            .execute()
+        deleted_source_ids = [s['id'] for s in (sources_full.data or [])]
 
-                # 4. Delete each document from the Gemini File Search Store — soft-fail
-                try:
-                    from app.gemini_store.service import GeminiStoreService
-                    for src in (sources_full.data or []):
-                        doc_name = src.get('gemini_document_name')
-                        if doc_name:
-                            GeminiStoreService.delete_document(doc_name)
-                    error_logger.info("delete_job: purged %d Gemini document(s) for job %s", len(deleted_source_ids), job_id)
-                except Exception as vec_err:
-                    error_logger.warning("delete_job: Gemini store cleanup partial failure for job %s: %s", job_id, vec_err)
+        if deleted_source_ids:
+            # 4. Delete each document from the Gemini File Search Store — soft-fail
+            try:
+                from app.gemini_store.service import GeminiStoreService
+                for src in (sources_full.data or []):
+                    doc_name = src.get('gemini_document_name')
+                    if doc_name:
+                        GeminiStoreService.delete_document(doc_name)
+                error_logger.info("delete_job: purged %d Gemini document(s) for job %s", len(deleted_source_ids), job_id)
+            except Exception as vec_err:
+                error_logger.warning("delete_job: Gemini store cleanup partial failure for job %s: %s", job_id, vec_err)
 
         # 5. Delete crawling_tasks + job row
         supabase.table('crawling_tasks').delete().eq('job_id', job_id).execute()
@@ -350,12 +460,10 @@ def delete_crawling_job(current_user, tenant_id, job_id):
 
 @sources_bp.route('/<uuid:tenant_id>/sources/<int:source_id>', methods=['DELETE'])
 @token_required
+@owned_tenant()
 def delete_source(current_user, tenant_id, source_id):
     try:
         tenant_id_str = str(tenant_id)
-        tenant_check = supabase.table('tenants').select("id").eq('id', tenant_id_str).eq('user_id', current_user.id).single().execute()
-        if not tenant_check.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
 
         source_resp = supabase.table('tenant_sources').select("*").eq('id', source_id).eq('tenant_id', tenant_id_str).single().execute()
         if not source_resp.data:
@@ -395,6 +503,7 @@ def delete_source(current_user, tenant_id, source_id):
 
 @sources_bp.route('/<uuid:tenant_id>/sources', methods=['DELETE'])
 @token_required
+@owned_tenant("id, gemini_file_store_name")
 def delete_all_sources(current_user, tenant_id):
     """
     Nukes ALL knowledge for a tenant:
@@ -406,19 +515,9 @@ def delete_all_sources(current_user, tenant_id):
     """
     try:
         tenant_id_str = str(tenant_id)
-        tenant_resp = (
-            supabase.table('tenants')
-            .select("id, gemini_file_store_name")
-            .eq('id', tenant_id_str)
-            .eq('user_id', current_user.id)
-            .single()
-            .execute()
-        )
-        if not tenant_resp.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
 
         # 1. Delete the Gemini File Search Store (drops all indexed documents at once)
-        store_name = (tenant_resp.data or {}).get('gemini_file_store_name')
+        store_name = g.tenant.get('gemini_file_store_name')
         if store_name:
             try:
                 from app.gemini_store.service import GeminiStoreService
@@ -496,6 +595,7 @@ def get_task_status(current_user, task_id):
 
 @sources_bp.route('/<uuid:tenant_id>/store-stats', methods=['GET'])
 @token_required
+@owned_tenant("gemini_file_store_name")
 def get_store_stats(current_user, tenant_id):
     """
     Returns real stats from the tenant's Gemini File Search Store:
@@ -507,19 +607,7 @@ def get_store_stats(current_user, tenant_id):
     Falls back gracefully if the store hasn't been created yet.
     """
     try:
-        tenant_id_str = str(tenant_id)
-        tenant_resp = (
-            supabase.table('tenants')
-            .select("gemini_file_store_name")
-            .eq('id', tenant_id_str)
-            .eq('user_id', current_user.id)
-            .single()
-            .execute()
-        )
-        if not tenant_resp.data:
-            return jsonify({"error": "Tenant not found or access denied"}), 404
-
-        store_name = (tenant_resp.data or {}).get('gemini_file_store_name')
+        store_name = g.tenant.get('gemini_file_store_name')
         if not store_name:
             return jsonify({
                 "has_store": False,
@@ -1,140 +1,130 @@
-from flask import Blueprint, Response, jsonify
+"""
+api/app/tenants/widget.py
+
+The embeddable widget and its public bootstrap data.
+
+  /api/tenants/widget.js              tiny loader customers embed; cached for
+                                      WIDGET_LOADER_MAX_AGE seconds + ETag
+  /api/tenants/widget.<version>.js    the bundle (static/widget.js), versioned
+                                      by content hash and cached immutably
+  /api/tenants/<id>/bootstrap         name + intro_message + widget_config,
+                                      from the cached public config (ETag)
+
+The bundle is rendered and gzip-compressed once per process, so serving it
+is a dict lookup. A new deploy changes the version, and the loader (short
+cache) points browsers at the new bundle.
+"""
+from flask import Blueprint, Response, jsonify, request
 from app.logging_config import error_logger
+from app.tenants.bootstrap import PUBLIC_CONFIG_CACHE_SECONDS, get_public_config
+import gzip
+import hashlib
+import json
 import os
 
 widget_bp = Blueprint('widget', __name__)
 
-@widget_bp.route('/widget.js', methods=['GET'])
-def get_widget_script():
-    try:
+WIDGET_LOADER_MAX_AGE = int(os.environ.get('WIDGET_LOADER_MAX_AGE', '300'))
+_BUNDLE_PATH = os.path.join(os.path.dirname(__file__), 'static', 'widget.js')
+
+_bundle = None
+
+
+def _get_bundle():
+    """Renders the bundle once: (version, raw bytes, gzip bytes)."""
+    global _bundle
+    if _bundle is None:
         api_base_url = os.environ.get('API_BASE_URL', 'http://localhost:5000')
         frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
+        with open(_BUNDLE_PATH, encoding='utf-8') as f:
+            js = f.read()
+        js = js.replace('"__API_BASE_URL__"', json.dumps(api_base_url))
+        js = js.replace('"__FRONTEND_URL__"', json.dumps(frontend_url))
+        raw = js.encode('utf-8')
+        version = hashlib.sha256(raw).hexdigest()[:12]
+        _bundle = (version, raw, gzip.compress(raw, compresslevel=9, mtime=0))
+    return _bundle
+
+
+def _loader_script(version):
+    api_base_url = os.environ.get('API_BASE_URL', 'http://localhost:5000').rstrip('/')
+    bundle_url = json.dumps(f"{api_base_url}/api/tenants/widget.{version}.js")
+    # Re-emits the customer's <script> attributes on the versioned bundle,
+    # which reads them from document.currentScript
+    return f"""(function() {{
+    var current = document.currentScript;
+    var s = document.createElement('script');
+    s.src = {bundle_url};
+    s.async = true;
+    for (var i = 0; i < current.attributes.length; i++) {{
+        var a = current.attributes[i];
+        if (a.name.indexOf('data-') === 0) s.setAttribute(a.name, a.value);
+    }}
+    current.parentNode.insertBefore(s, current.nextSibling);
+}})();
+"""
 
-        js_content = f"""
-(function() {{
-    const scriptTag = document.currentScript;
-    const tenantId = scriptTag.getAttribute('data-tenant-id');
-    const apiBaseUrl = "{api_base_url}".replace(/\\/$/, "");
-    const frontendUrl = "{frontend_url}".replace(/\\/$/, "");
 
-    if (!tenantId) {{
-        console.error('Burncodes AI Widget: data-tenant-id attribute is missing.');
-        return;
-    }}
+def _cacheable(body, mimetype, etag, cache_control, compressed=None):
+    """A response with ETag/Cache-Control that honours If-None-Match and gzip."""
+    use_gzip = compressed is not None and 'gzip' in request.headers.get('Accept-Encoding', '')
+    # Each encoding is a different representation, so it gets its own ETag
+    if use_gzip:
+        etag = f"{etag}-gz"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(compressed, mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = cache_control
+    if compressed is not None:
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
-    // Create container for the widget
-    const container = document.createElement('div');
-    container.id = 'burncodes-ai-widget-container';
-    container.style.position = 'fixed';
-    container.style.bottom = '20px';
-    container.style.right = '20px';
-    container.style.zIndex = '9999';
-    container.style.display = 'flex';
-    container.style.flexDirection = 'column';
-    container.style.alignItems = 'flex-end';
-    document.body.appendChild(container);
-
-    // Create Iframe
-    const iframe = document.createElement('iframe');
-    iframe.src = `${{frontendUrl}}/chat/${{tenantId}}?widget`;
-    iframe.style.width = '400px';
-    iframe.style.height = '600px';
-    iframe.style.border = 'none';
-    iframe.style.borderRadius = '10px';
-    iframe.style.boxShadow = '0 4px 12px rgba(0, 0, 0, 0.15)';
-    iframe.style.marginBottom = '10px';
-    iframe.style.display = 'none'; // Hidden by default
-    iframe.style.backgroundColor = 'white';
-    container.appendChild(iframe);
-
-    // Fetch Tenant Config for Launcher Appearance
-    fetch(`${{apiBaseUrl}}/api/tenants/${{tenantId}}/public`)
-        .then(response => response.json())
-        .then(data => {{
-            if (data.error) {{
-                console.error('Burncodes AI Widget: Failed to load tenant config.', data.error);
-                return;
-            }}
-
-            const config = data.widget_config || {{}};
-
-            // Respect the hide/show toggle set in the dashboard
-            if (config.widget_enabled === false) {{
-                return;
-            }}
-
-            const styles = config.component_styles || {{}};
-            const palette = config.color_palette || [];
-
-            const getPaletteColor = (colorId) => {{
-                const color = palette.find(c => c.id === colorId);
-                return color ? color.value : colorId;
-            }};
-
-            const launcherBgColor = getPaletteColor(styles.launcher_background_color || 'c_primary') || '#A855F7';
-            const launcherIcon = config.launcher_icon;
-
-            // Create Launcher Button
-            const launcher = document.createElement('div');
-            launcher.style.width = '60px';
-            launcher.style.height = '60px';
-            launcher.style.borderRadius = '50%';
-            launcher.style.backgroundColor = launcherBgColor;
-            launcher.style.cursor = 'pointer';
-            launcher.style.boxShadow = '0 4px 6px rgba(0, 0, 0, 0.1)';
-            launcher.style.display = 'flex';
-            launcher.style.justifyContent = 'center';
-            launcher.style.alignItems = 'center';
-            launcher.style.transition = 'transform 0.2s';
-
-            // Add Icon or Default
-            if (launcherIcon) {{
-                const img = document.createElement('img');
-                img.src = launcherIcon;
-                img.style.width = '30px';
-                img.style.height = '30px';
-                img.style.objectFit = 'contain';
-                launcher.appendChild(img);
-            }} else {{
-                // Default Icon (Chat Bubble)
-                launcher.innerHTML = `
-                    <svg xmlns="http://www.w3.org/2000/svg" width="30" height="30" viewBox="0 0 24 24" fill="none" stroke="white" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                        <path d="M21 15a2 2 0 0 1-2 2H7l-4 4V5a2 2 0 0 1 2-2h14a2 2 0 0 1 2 2z"></path>
-                    </svg>
-                `;
-            }}
-
-            launcher.addEventListener('mouseenter', () => {{
-                launcher.style.transform = 'scale(1.1)';
-            }});
-            launcher.addEventListener('mouseleave', () => {{
-                launcher.style.transform = 'scale(1.0)';
-            }});
-
-            launcher.addEventListener('click', () => {{
-                if (iframe.style.display === 'none') {{
-                    iframe.style.display = 'block';
-                }} else {{
-                    iframe.style.display = 'none';
-                }}
-            }});
-
-            container.appendChild(launcher);
-
-            // Listen for close event emitted from inside the chat iframe
-            window.addEventListener('message', (event) => {{
-                if (event.data && event.data.type === 'burncodes:close-widget') {{
-                    iframe.style.display = 'none';
-                }}
-            }});
-        }})
-        .catch(err => {{
-            console.error('Burncodes AI Widget: Error fetching config.', err);
-        }});
 
-}})();
-"""
-        return Response(js_content, mimetype='application/javascript')
+@widget_bp.route('/widget.js', methods=['GET'])
+def get_widget_script():
+    try:
+        version = _get_bundle()[0]
+        loader = _loader_script(version)
+        return _cacheable(
+            loader, 'application/javascript', f"loader-{version}",
+            f"public, max-age={WIDGET_LOADER_MAX_AGE}, stale-while-revalidate=86400",
+        )
     except Exception as e:
         error_logger.error(f"Error serving widget script: {e}", exc_info=True)
         return jsonify({"error": "Failed to serve widget script"}), 500
+
+
+@widget_bp.route('/widget.<string:version>.js', methods=['GET'])
+def get_widget_bundle(version):
+    try:
+        current, raw, compressed = _get_bundle()
+        if version != current:
+            # An old version after a deploy — serve the current bundle, briefly cached
+            cache_control = f"public, max-age={WIDGET_LOADER_MAX_AGE}"
+        else:
+            cache_control = "public, max-age=31536000, immutable"
+        return _cacheable(raw, 'application/javascript', current, cache_control, compressed)
+    except Exception as e:
+        error_logger.error(f"Error serving widget bundle {version}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to serve widget script"}), 500
+
+
+@widget_bp.route('/<uuid:tenant_id>/bootstrap', methods=['GET'])
+def get_widget_bootstrap(tenant_id):
+    """Public — everything the widget needs to start, in one cached response."""
+    try:
+        config, etag = get_public_config(str(tenant_id))
+        if config is None:
+            return jsonify({"error": "Tenant not found"}), 404
+        return _cacheable(
+            json.dumps(config), 'application/json', etag,
+            f"public, max-age={PUBLIC_CONFIG_CACHE_SECONDS}, stale-while-revalidate=300",
+        )
+    except Exception as e:
+        error_logger.error(f"Error fetching widget bootstrap for {tenant_id}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch tenant info"}), 500
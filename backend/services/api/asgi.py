@@ -0,0 +1,10 @@
+"""
+services/api/asgi.py
+
+Entry point of the async gateway (see app/gateway):
+
+  uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+from app.gateway import create_gateway
+
+app = create_gateway()
@@ -21,6 +21,10 @@ celery.conf.update(
     task_routes={
         'app.data_processing.tasks.maintenance_tasks.job_scheduler_task': {'queue': 'fast'},
         'app.data_processing.tasks.maintenance_tasks.zombie_reaper_task': {'queue': 'fast'},
+        'app.data_processing.tasks.maintenance_tasks.compact_crawl_tasks_task': {'queue': 'fast'},
+        'app.data_processing.tasks.maintenance_tasks.prune_chat_stats_task': {'queue': 'fast'},
+        'app.data_processing.tasks.maintenance_tasks.archive_chat_logs_task': {'queue': 'fast'},
+        'app.chat.write_behind.drain_chat_writes': {'queue': 'chat'},
     },
     beat_schedule={
         'job-scheduler-every-30-seconds': {
@@ -32,5 +36,26 @@ celery.conf.update(
             'task': 'app.data_processing.tasks.maintenance_tasks.zombie_reaper_task',
             'schedule': 1800.0,
         },
+        'crawl-tasks-compact-every-10-minutes': {
+            # Archives the crawling_tasks rows of jobs finished CRAWL_TASKS_IDLE_MINUTES ago
+            'task': 'app.data_processing.tasks.maintenance_tasks.compact_crawl_tasks_task',
+            'schedule': 600.0,
+        },
+        'chat-stats-prune-daily': {
+            # Minute-level analytics rollups older than CHAT_STATS_MINUTE_DAYS
+            'task': 'app.data_processing.tasks.maintenance_tasks.prune_chat_stats_task',
+            'schedule': 86400.0,
+        },
+        'chat-logs-archive-daily': {
+            # Creates upcoming chat_logs partitions, archives months past CHAT_LOGS_HOT_MONTHS
+            'task': 'app.data_processing.tasks.maintenance_tasks.archive_chat_logs_task',
+            'schedule': 86400.0,
+        },
+        'chat-writes-drain-every-2-seconds': {
+            # Flushes buffered chat_logs rows and billing debits (worker_chat)
+            'task': 'app.chat.write_behind.drain_chat_writes',
+            'schedule': float(os.environ.get('CHAT_WRITE_FLUSH_SECONDS', '2')),
+            'options': {'expires': 10},
+        },
     },
 )
@@ -0,0 +1,54 @@
+"""
+worker_chat/app/billing/gate.py
+
+Balance gate for chat turns — worker side.
+
+The API admits each turn against a cached balance and reserves an estimate
+for it (see api/app/billing/gate.py for the key layout). Once the turn's
+real cost is known, chat_task settles it here:
+
+  charge()   subtracts the real cost from the cached balance, so later turns
+             see it before the write-behind drainer has debited user_billing
+  release()  drops the turn's own reservation, whatever the outcome; a
+             redelivered task (acks_late) releasing again is a no-op
+
+Both are single atomic scripts and never raise.
+"""
+from app.database.redis_client import get_redis
+from app.logging_config import error_logger
+
+# Only touches a cached balance — charging an expired key would recreate it
+# without a TTL and pin a stale value
+_CHARGE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrbyfloat', KEYS[1], -tonumber(ARGV[1]))
+end
+return false
+"""
+
+# Reservations are kept per turn id; removing one twice is a no-op
+_RELEASE_SCRIPT = """
+redis.call('zrem', KEYS[1], ARGV[1])
+return redis.call('hdel', KEYS[2], ARGV[1])
+"""
+
+
+def charge(user_id: str | None, cost: float) -> None:
+    """Applies a finished turn's cost to the owner's cached balance."""
+    if not user_id or not cost:
+        return
+    try:
+        get_redis().eval(_CHARGE_SCRIPT, 1, f"billing:balance:{user_id}", cost)
+    except Exception as e:
+        error_logger.warning("billing gate: charge failed for user %s: %s", user_id, e)
+
+
+def release(user_id: str | None, reserved: float, turn_id: str | None = None) -> None:
+    """Releases the estimate the API reserved for turn turn_id (the chat task id)."""
+    if not user_id or not reserved or not turn_id:
+        return
+    keys = [f"billing:reservations:{user_id}", f"billing:reservation_amounts:{user_id}"]
+    try:
+        get_redis().eval(_RELEASE_SCRIPT, 2, *keys, turn_id)
+    except Exception as e:
+        error_logger.warning("billing gate: release failed for user %s: %s", user_id, e)
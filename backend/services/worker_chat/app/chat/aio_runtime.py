@@ -0,0 +1,162 @@
+"""
+worker_chat/app/chat/aio_runtime.py
+
+Per-process asyncio runtime for Gemini calls.
+
+Chat turns are almost entirely network-bound: a turn spends a few ms on
+Supabase lookups and several seconds waiting for generate_content. With a
+prefork pool every waiting turn pins a whole process, so a container serves
+--concurrency turns at a time.
+
+In async mode (CHAT_EXECUTION_MODE=async, the default) the worker runs a
+thread pool with a high --concurrency and every Gemini call is submitted to a
+single persistent event loop owned by the process:
+
+  Celery thread ──run_coroutine_threadsafe──▶ loop thread ──client.aio──▶ Gemini
+        ▲                                                                 │
+        └──────────────────────── result / exception ◀────────────────────┘
+
+The loop multiplexes all in-flight requests over one async HTTP client, and an
+asyncio.Semaphore caps them at CHAT_MAX_INFLIGHT per process so a burst of
+turns queues locally instead of overrunning the API quota.
+
+CHAT_EXECUTION_MODE=sync keeps the original blocking client.models path, for
+running the worker with the prefork pool.
+
+USAGE:
+  from app.chat.aio_runtime import generate_content, hedged_generate_content
+
+  response = generate_content(model=..., contents=..., config=...)
+  result = hedged_generate_content(model=..., fallback_model=..., deadline=20, ...)
+"""
+import asyncio
+import os
+import threading
+import time
+
+from google import genai
+
+from app.logging_config import error_logger
+from app.chat.hedging import HedgeResult, hedged_generate
+from app.chat.cancellation import CHAT_CANCEL_CHECK_SECONDS, TurnCancelled
+
+CHAT_EXECUTION_MODE = os.getenv("CHAT_EXECUTION_MODE", "async").lower()
+CHAT_MAX_INFLIGHT = int(os.getenv("CHAT_MAX_INFLIGHT", "64"))
+# Upper bound a Celery thread waits for the loop — a safety net, not an SLA
+CHAT_CALL_TIMEOUT_SECONDS = float(os.getenv("CHAT_CALL_TIMEOUT_SECONDS", "120"))
+
+_client: genai.Client | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+_lock = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """Returns the process-wide Gemini client (sync and .aio share it)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
+    return _client
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Starts the process's event loop thread on first use.
+
+    Created lazily (not at import) so a prefork parent never owns a loop
+    thread that its children would inherit in a dead state.
+    """
+    global _loop, _semaphore
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=_run_loop, args=(loop,), name="chat-aio-loop", daemon=True
+                ).start()
+                _semaphore = asyncio.Semaphore(CHAT_MAX_INFLIGHT)
+                _loop = loop
+                error_logger.info(
+                    "aio_runtime: event loop started (max %d in-flight Gemini calls)",
+                    CHAT_MAX_INFLIGHT,
+                )
+    return _loop
+
+
+def run(coro_factory, timeout: float = CHAT_CALL_TIMEOUT_SECONDS, should_stop=None):
+    """
+    Runs coro_factory() on the process loop under the in-flight limit and
+    blocks the calling thread until it finishes. Exceptions propagate.
+
+    should_stop is polled from the calling thread (never on the loop) every
+    CHAT_CANCEL_CHECK_SECONDS; when it returns True the coroutine — and with
+    it the HTTP request to Gemini — is cancelled and TurnCancelled raised.
+    """
+    loop = get_loop()
+
+    async def _limited():
+        async with _semaphore:
+            return await coro_factory()
+
+    future = asyncio.run_coroutine_threadsafe(_limited(), loop)
+    expires_at = time.monotonic() + timeout
+    while True:
+        remaining = expires_at - time.monotonic()
+        try:
+            wait = min(remaining, CHAT_CANCEL_CHECK_SECONDS) if should_stop else remaining
+            return future.result(timeout=max(0.0, wait))
+        except TimeoutError:
+            if time.monotonic() >= expires_at:
+                future.cancel()
+                raise
+            if should_stop():
+                future.cancel()
+                raise TurnCancelled("Chat turn abandoned during generation")
+
+
+def generate_content(*, model: str, contents, config: dict, timeout: float | None = None, should_stop=None):
+    """
+    generate_content through the async client, or the sync one in sync mode.
+    timeout bounds the wait on the loop; the request itself is bounded by
+    config["http_options"]["timeout"] when the caller sets it.
+    """
+    client = get_client()
+    if CHAT_EXECUTION_MODE == "sync":
+        return client.models.generate_content(model=model, contents=contents, config=config)
+    return run(
+        lambda: client.aio.models.generate_content(model=model, contents=contents, config=config),
+        timeout=(timeout + 5) if timeout else CHAT_CALL_TIMEOUT_SECONDS,
+        should_stop=should_stop,
+    )
+
+
+def hedged_generate_content(
+    *, model: str, contents, config: dict, deadline: float,
+    fallback_model: str | None = None, fallback_config: dict | None = None,
+    hedge_delay: float | None = None, should_stop=None,
+) -> HedgeResult:
+    """
+    Deadline-bounded generation with an optional hedged fallback model
+    (see chat/hedging.py). Sync mode has no event loop to race on, so it
+    makes a single plain call.
+    """
+    client = get_client()
+    if CHAT_EXECUTION_MODE == "sync":
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        return HedgeResult(response, model, hedged=False)
+    return run(
+        lambda: hedged_generate(
+            client, model=model, contents=contents, config=config, deadline=deadline,
+            fallback_model=fallback_model, fallback_config=fallback_config, hedge_delay=hedge_delay,
+        ),
+        timeout=deadline + 5,
+        should_stop=should_stop,
+    )
+
@@ -0,0 +1,122 @@
+"""
+worker_chat/app/chat/answer_cache.py
+
+Opt-in per-tenant answer cache for history-independent chat turns.
+
+Public widgets see the same first questions over and over ("opening hours",
+"contact"). When a tenant enables tenants.answer_cache_enabled, the answer to
+a first-turn question is stored in Redis and served again without calling
+Gemini, for as long as nothing that could change the answer has changed.
+
+Cache key components:
+  - tenant id
+  - normalized query (case, accents and punctuation folded)
+  - answer language (tenants.translation_target)
+  - store version (tenants.knowledge_version — bumped by a DB trigger
+    whenever a source finishes indexing or is deleted)
+  - config version (hash of prompt template, persona and fine-tune rules)
+
+Redis layout per tenant:
+  answer_cache:{tenant_id}:{digest}  → JSON payload, expires after the TTL
+  answer_cache:{tenant_id}:lru       → sorted set of digests scored by last use
+
+When the sorted set grows past ANSWER_CACHE_MAX_ENTRIES the least recently
+used entries are evicted. Every Redis error degrades to a cache miss.
+"""
+import hashlib
+import json
+import os
+import time
+
+from app.database.redis_client import get_redis
+from app.chat.rule_index import normalize_text, rules_signature
+from app.logging_config import error_logger
+
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+# Tenant fields whose change must invalidate cached answers
+_CONFIG_FIELDS = (
+    "rag_prompt_template", "system_persona", "translation_target", "gemini_file_store_name",
+    "latency_profile",
+)
+
+
+def normalize_query(query: str) -> str:
+    """Folds case, accents, punctuation and whitespace so trivial variants share an entry."""
+    return normalize_text(query)
+
+
+def is_history_independent(chat_history: list) -> bool:
+    """True for first turns — the only history is the intro message, if any."""
+    return not any(msg.get("type") == "human" for msg in chat_history)
+
+
+def config_version(tenant_config: dict, fine_tune_rules: list) -> str:
+    """Fingerprint of everything in the tenant config that shapes an answer."""
+    digest = hashlib.sha1()
+    for field in _CONFIG_FIELDS:
+        digest.update(f"{field}={tenant_config.get(field)}\x1e".encode("utf-8"))
+    digest.update(rules_signature(fine_tune_rules).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def cache_key(tenant_config: dict, fine_tune_rules: list, query: str) -> str:
+    """Digest identifying one cacheable answer for this tenant."""
+    parts = (
+        normalize_query(query),
+        tenant_config.get("translation_target") or "en",
+        str(tenant_config.get("knowledge_version") or 0),
+        config_version(tenant_config, fine_tune_rules),
+    )
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _entry_key(tenant_id: str, digest: str) -> str:
+    return f"answer_cache:{tenant_id}:{digest}"
+
+
+def _lru_key(tenant_id: str) -> str:
+    return f"answer_cache:{tenant_id}:lru"
+
+
+def get_cached_answer(tenant_id: str, digest: str) -> dict | None:
+    """Returns the cached {"answer", "citations"} payload, or None on a miss."""
+    try:
+        r = get_redis()
+        raw = r.get(_entry_key(tenant_id, digest))
+        if raw is None:
+            return None
+        r.zadd(_lru_key(tenant_id), {digest: time.time()})
+        return json.loads(raw)
+    except Exception as e:
+        error_logger.warning("answer_cache: lookup failed for tenant %s: %s", tenant_id, e)
+        return None
+
+
+def store_answer(tenant_id: str, digest: str, answer: str, citations: list) -> None:
+    """Stores an answer and evicts the least recently used entries past the cap."""
+    try:
+        r = get_redis()
+        now = time.time()
+        lru = _lru_key(tenant_id)
+        pipe = r.pipeline()
+        pipe.set(
+            _entry_key(tenant_id, digest),
+            json.dumps({"answer": answer, "citations": citations}),
+            ex=ANSWER_CACHE_TTL_SECONDS,
+        )
+        pipe.zadd(lru, {digest: now})
+        # Drop LRU members whose entries have already expired
+        pipe.zremrangebyscore(lru, "-inf", now - ANSWER_CACHE_TTL_SECONDS)
+        pipe.expire(lru, ANSWER_CACHE_TTL_SECONDS)
+        pipe.zcard(lru)
+        size = pipe.execute()[-1]
+
+        overflow = size - ANSWER_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [member for member, _ in r.zpopmin(lru, overflow)]
+            if evicted:
+                r.delete(*(_entry_key(tenant_id, d) for d in evicted))
+    except Exception as e:
+        error_logger.warning("answer_cache: store failed for tenant %s: %s", tenant_id, e)
@@ -0,0 +1,72 @@
+"""
+worker_chat/app/chat/cancellation.py
+
+Cancellation of abandoned chat turns — worker side.
+
+The API (api/app/chat/cancellation.py) keeps two Redis keys per queued turn:
+
+  chat_turn:{task_id}:cancel     set when the widget explicitly cancels
+  chat_turn:{task_id}:heartbeat  refreshed while someone long-polls the
+                                 task; expires CHAT_HEARTBEAT_SECONDS after
+                                 the last poll
+
+A turn is abandoned when it was cancelled or its heartbeat has expired.
+chat_task checks this before it starts (queued turns are dropped) and every
+CHAT_CANCEL_CHECK_SECONDS while waiting on Gemini (the in-flight request is
+cancelled). Each dropped turn is recorded in chat_cancellations together with
+its queue time and the generation time that went to waste.
+
+Any Redis error counts as "not abandoned" — cancellation is best effort.
+"""
+import os
+
+from app.database.redis_client import get_redis
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+CHAT_CANCEL_CHECK_SECONDS = float(os.getenv("CHAT_CANCEL_CHECK_SECONDS", "1.0"))
+
+
+class TurnCancelled(Exception):
+    """The visitor abandoned the turn; its answer would never be read."""
+
+
+def _cancel_key(task_id: str) -> str:
+    return f"chat_turn:{task_id}:cancel"
+
+
+def _heartbeat_key(task_id: str) -> str:
+    return f"chat_turn:{task_id}:heartbeat"
+
+
+def is_abandoned(task_id: str | None, heartbeat: bool = True) -> bool:
+    """
+    True if the turn was cancelled or nobody is polling for it any more.
+    heartbeat=False skips the expiry check for turns queued without one.
+    """
+    if not task_id:
+        return False
+    try:
+        pipe = get_redis().pipeline()
+        pipe.exists(_cancel_key(task_id))
+        pipe.exists(_heartbeat_key(task_id))
+        cancelled, alive = pipe.execute()
+        return bool(cancelled) or (heartbeat and not alive)
+    except Exception as e:
+        error_logger.warning("cancellation: check failed for task %s: %s", task_id, e)
+        return False
+
+
+def record_cancellation(tenant_id, conversation_id, task_id, stage, queue_ms, wasted_ms) -> None:
+    """Writes one chat_cancellations row. Failures are logged, never raised."""
+    try:
+        supabase.table("chat_cancellations").insert({
+            "tenant_id": str(tenant_id),
+            "conversation_id": str(conversation_id),
+            "task_id": task_id,
+            "stage": stage,
+            "queue_ms": queue_ms,
+            "wasted_ms": wasted_ms,
+        }).execute()
+    except Exception as e:
+        error_logger.error("cancellation: insert failed for tenant %s: %s", tenant_id, e, exc_info=True)
@@ -0,0 +1,123 @@
+"""
+worker_chat/app/chat/hedging.py
+
+Deadline-aware generation with a hedged fallback model.
+
+The primary model is called in streaming mode so its first token is visible.
+If no token has arrived after `hedge_delay` seconds (or the primary fails),
+a second request goes to the faster fallback model; whichever finishes first
+wins and the other request is cancelled. The whole race is bounded by
+`deadline` seconds — past it DeadlineExceeded is raised instead of waiting
+on a slow upstream indefinitely.
+
+  t=0            primary stream ─────────── first token? ──▶ keep streaming
+  t=hedge_delay  (no token yet)  fallback ──▶ first to finish wins
+  t=deadline     DeadlineExceeded
+
+The client only needs the google-genai async surface
+(client.aio.models.generate_content / generate_content_stream), so tests pass
+a stub. This module has no app imports.
+"""
+import asyncio
+from dataclasses import dataclass
+
+
+class DeadlineExceeded(TimeoutError):
+    """The chat turn ran out of time before any model produced an answer."""
+
+
+@dataclass
+class HedgeResult:
+    response: object
+    model: str
+    hedged: bool  # True if the fallback request was started
+
+
+class StreamedResponse:
+    """Merges streamed chunks into the shape chat_task reads from a response."""
+
+    def __init__(self, chunks: list):
+        self.text = "".join(getattr(c, "text", None) or "" for c in chunks)
+        self.usage_metadata = next(
+            (c.usage_metadata for c in reversed(chunks) if getattr(c, "usage_metadata", None)), None
+        )
+        # Grounding metadata arrives on the final chunks — prefer a chunk that has it
+        grounded = [
+            c for c in chunks
+            if getattr(c, "candidates", None) and getattr(c.candidates[0], "grounding_metadata", None)
+        ]
+        source = grounded[-1] if grounded else (chunks[-1] if chunks else None)
+        self.candidates = getattr(source, "candidates", None) or []
+
+
+async def hedged_generate(
+    client, *, model: str, contents, config: dict, deadline: float,
+    fallback_model: str | None = None, fallback_config: dict | None = None,
+    hedge_delay: float | None = None,
+) -> HedgeResult:
+    """
+    Generates with `model`, hedging to `fallback_model` when the first token
+    is late. Without a fallback model this is a plain deadline-bounded call.
+    """
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + deadline
+    first_token = asyncio.Event()
+
+    async def _primary():
+        stream = await client.aio.models.generate_content_stream(
+            model=model, contents=contents, config=config,
+        )
+        chunks = []
+        async for chunk in stream:
+            first_token.set()
+            chunks.append(chunk)
+        return StreamedResponse(chunks)
+
+    async def _fallback():
+        return await client.aio.models.generate_content(
+            model=fallback_model, contents=contents, config=fallback_config or config,
+        )
+
+    primary = asyncio.create_task(_primary())
+    running = {primary: model}
+    can_hedge = bool(fallback_model) and fallback_model != model and hedge_delay is not None
+
+    def _start_fallback():
+        task = asyncio.create_task(_fallback())
+        running[task] = fallback_model
+        return task
+
+    def _cancel(tasks):
+        for task in tasks:
+            task.cancel()
+
+    if can_hedge:
+        token_wait = asyncio.create_task(first_token.wait())
+        await asyncio.wait(
+            {primary, token_wait},
+            timeout=max(0.0, min(hedge_delay, expires_at - loop.time())),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        token_wait.cancel()
+        if not first_token.is_set() and loop.time() < expires_at:
+            _start_fallback()
+            can_hedge = False
+
+    pending = set(running)
+    last_error = None
+    while pending:
+        remaining = expires_at - loop.time()
+        if remaining <= 0:
+            _cancel(pending)
+            raise DeadlineExceeded(f"No answer within {deadline:.1f}s")
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                _cancel(pending)
+                return HedgeResult(task.result(), running[task], hedged=len(running) > 1)
+            last_error = task.exception()
+            # The primary failed before the hedge fired — go straight to the fallback
+            if task is primary and can_hedge:
+                pending.add(_start_fallback())
+                can_hedge = False
+    raise last_error
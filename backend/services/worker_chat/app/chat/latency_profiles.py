@@ -0,0 +1,122 @@
+"""
+worker_chat/app/chat/latency_profiles.py
+
+Per-tenant latency profiles for chat generation.
+
+tenants.latency_profile is a small JSON object naming a preset, optionally
+with overrides:
+
+  {"name": "fast"}
+  {"name": "balanced", "max_output_tokens": 800}
+
+Presets trade answer depth for speed:
+
+  fast       short answers, no thinking, few retrieved chunks, tight timeout
+  balanced   the previous global behaviour (model defaults) — the default
+  thorough   thinking enabled, more retrieved chunks, the whole turn deadline
+
+Keys:
+  model              Gemini model (ops-only; not settable through the API)
+  max_output_tokens  output token cap, None = model default
+  thinking_budget    thinking tokens, 0 disables thinking, None = model default
+  retrieval_top_k    File Search chunks per query, None = tool default
+  timeout_seconds    per-request deadline for the Gemini call; the turn's own
+                     deadline (CHAT_TURN_DEADLINE_SECONDS) caps it
+  fallback_model     faster model raced against the primary (ops-only),
+                     None disables hedging — see chat/hedging.py
+  hedge_delay_seconds  how long to wait for the primary's first token
+                       before starting the fallback
+
+Resolved profiles are cached per tenant and rebuilt only when the stored
+JSON changes. This module has no app imports.
+"""
+import json
+import os
+
+CHAT_GEMINI_MODEL = os.getenv("CHAT_GEMINI_MODEL", "gemini-3.1-flash-lite-preview")
+CHAT_FALLBACK_GEMINI_MODEL = os.getenv("CHAT_FALLBACK_GEMINI_MODEL") or None
+# Stamped on each turn by the API (same default); no model call outlives it
+CHAT_TURN_DEADLINE_SECONDS = float(os.getenv("CHAT_TURN_DEADLINE_SECONDS", "60"))
+DEFAULT_PROFILE = "balanced"
+
+PROFILES = {
+    "fast": {
+        "model": os.getenv("CHAT_FAST_GEMINI_MODEL") or CHAT_GEMINI_MODEL,
+        "max_output_tokens": 512,
+        "thinking_budget": 0,
+        "retrieval_top_k": 3,
+        "timeout_seconds": 20,
+        "fallback_model": CHAT_FALLBACK_GEMINI_MODEL,
+        "hedge_delay_seconds": 2,
+    },
+    "balanced": {
+        "model": CHAT_GEMINI_MODEL,
+        "max_output_tokens": None,
+        "thinking_budget": None,
+        "retrieval_top_k": None,
+        "timeout_seconds": 60,
+        "fallback_model": CHAT_FALLBACK_GEMINI_MODEL,
+        "hedge_delay_seconds": 4,
+    },
+    "thorough": {
+        "model": os.getenv("CHAT_THOROUGH_GEMINI_MODEL") or CHAT_GEMINI_MODEL,
+        "max_output_tokens": None,
+        "thinking_budget": 2048,
+        "retrieval_top_k": 10,
+        "timeout_seconds": int(CHAT_TURN_DEADLINE_SECONDS),
+        "fallback_model": CHAT_FALLBACK_GEMINI_MODEL,
+        "hedge_delay_seconds": 10,
+    },
+}
+
+# tenant_id -> (stored JSON signature, resolved profile)
+_PROFILE_CACHE: dict[str, tuple[str, dict]] = {}
+
+
+def resolve_profile(raw: dict | None) -> dict:
+    """Merges a stored profile over its preset. Unknown names fall back to the default."""
+    raw = raw if isinstance(raw, dict) else {}
+    name = raw.get("name") if raw.get("name") in PROFILES else DEFAULT_PROFILE
+    profile = dict(PROFILES[name])
+    for key in profile:
+        if key in raw:
+            profile[key] = raw[key]
+    profile["name"] = name
+    return profile
+
+
+def get_latency_profile(tenant_id: str, raw: dict | None) -> dict:
+    """Returns the tenant's resolved profile, reusing the cached one while unchanged."""
+    signature = json.dumps(raw, sort_keys=True, default=str)
+    cached = _PROFILE_CACHE.get(tenant_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+    profile = resolve_profile(raw)
+    _PROFILE_CACHE[tenant_id] = (signature, profile)
+    return profile
+
+
+def generation_config(profile: dict) -> dict:
+    """The generate_content config entries a profile controls."""
+    config = {"http_options": {"timeout": int(profile["timeout_seconds"] * 1000)}}
+    if profile["max_output_tokens"]:
+        config["max_output_tokens"] = profile["max_output_tokens"]
+    if profile["thinking_budget"] is not None:
+        config["thinking_config"] = {"thinking_budget": profile["thinking_budget"]}
+    return config
+
+
+def file_search_tool(store_name: str, profile: dict) -> dict:
+    """The file_search tool entry, with the profile's retrieval depth."""
+    file_search = {"file_search_store_names": [store_name]}
+    if profile["retrieval_top_k"]:
+        file_search["top_k"] = profile["retrieval_top_k"]
+    return {"file_search": file_search}
+
+
+def fallback_generation_config(profile: dict) -> dict:
+    """Config for the hedged fallback request: same limits, no thinking budget override."""
+    config = generation_config(profile)
+    config.pop("thinking_config", None)
+    return config
+
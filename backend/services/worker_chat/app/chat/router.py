@@ -0,0 +1,125 @@
+"""
+worker_chat/app/chat/router.py
+
+Local query router that runs before generate_content.
+
+Greetings, thanks and small talk do not need retrieval, yet with a File Search
+store attached every turn pays for retrieval and grounding tokens. This stage
+classifies a turn in-process (no I/O, well under a millisecond) into one of:
+
+  rag        — normal path: system prompt, fine-tune rules, file_search tool
+  smalltalk  — short no-tool generation with a minimal persona prompt
+  canned     — bare greeting answered with the tenant's intro_message,
+               no model call at all
+
+The classifier is deliberately conservative: a turn leaves the rag path only
+if it is short and *every* word is in the small-talk vocabulary below, so any
+content word ("hello, what are your prices?") keeps the full pipeline. Answer
+and question words ("yes", "no", "how") are not in the vocabulary, and a turn
+that replies to a question from the assistant always goes to rag — "sure" to
+"Shall I explain the pricing tiers?" needs retrieval.
+
+This module has no app imports so it can be unit-tested in isolation.
+"""
+import os
+import re
+import unicodedata
+
+ROUTE_RAG = "rag"
+ROUTE_SMALLTALK = "smalltalk"
+ROUTE_CANNED = "canned"
+
+ROUTER_ENABLED = os.getenv("CHAT_ROUTER_ENABLED", "true").lower() == "true"
+# Longer messages always go to rag, whatever words they contain
+ROUTER_MAX_TOKENS = int(os.getenv("CHAT_ROUTER_MAX_TOKENS", "6"))
+
+# Per-language vocabularies, accent-folded and lower-cased (see _tokens)
+GREETING_WORDS = {
+    "en": {"hi", "hello", "hey", "hiya", "howdy", "morning", "afternoon", "evening", "good", "greetings"},
+    "de": {"hallo", "hoi", "hi", "servus", "gruezi", "gruss", "grusse", "moin", "guten", "tag", "morgen", "abend"},
+    "fr": {"bonjour", "salut", "bonsoir", "coucou", "allo"},
+    "it": {"ciao", "buongiorno", "buonasera", "salve"},
+}
+SMALLTALK_WORDS = {
+    "en": {"thanks", "thank", "thx", "ty", "cheers", "bye", "goodbye", "cool", "great", "nice", "perfect",
+           "awesome", "see", "later", "have", "day", "appreciate"},
+    "de": {"danke", "dankeschon", "vielen", "dank", "merci", "tschuss", "ciao", "ade", "super", "gut",
+           "prima", "perfekt", "schonen", "bis", "bald", "spater"},
+    "fr": {"merci", "beaucoup", "au", "revoir", "bonne", "journee", "soiree", "parfait", "super", "genial",
+           "ca", "va", "tres", "bien", "a", "plus", "bientot"},
+    "it": {"grazie", "mille", "arrivederci", "perfetto", "buona", "giornata"},
+}
+# Words that may accompany either kind without changing the meaning
+FILLER_WORDS = {
+    "there", "you", "so", "much", "very", "all", "again", "too", "and", "the", "a", "for", "your", "help",
+    "und", "sehr", "fur", "die", "hilfe", "nochmal", "et", "pour", "l", "aide", "e", "per",
+}
+
+_ALL_GREETINGS = set().union(*GREETING_WORDS.values())
+_ALL_SMALLTALK = set().union(*SMALLTALK_WORDS.values())
+_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _tokens(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [t for t in _WORD_RE.split(text) if t]
+
+
+def classify(query: str) -> tuple[str, str]:
+    """
+    Classifies a message as "greeting", "smalltalk" or "content".
+    Returns (kind, reason) — the reason is for logs only.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return "content", "empty"
+    if len(tokens) > ROUTER_MAX_TOKENS:
+        return "content", "long"
+
+    meaningful = [t for t in tokens if t not in FILLER_WORDS]
+    if not meaningful:
+        return "content", "fillers-only"
+
+    unknown = [t for t in meaningful if t not in _ALL_GREETINGS and t not in _ALL_SMALLTALK]
+    if unknown:
+        return "content", "content-words"
+    if all(t in _ALL_GREETINGS for t in meaningful):
+        return "greeting", "greeting-vocab"
+    return "smalltalk", "smalltalk-vocab"
+
+
+def _last_ai_turn(chat_history: list | None, intro_message: str | None) -> str | None:
+    """The assistant's latest message, not counting the widget's intro message."""
+    intro = (intro_message or "").strip()
+    for msg in reversed(chat_history or []):
+        if msg.get("type") == "human":
+            continue
+        content = (msg.get("content") or "").strip()
+        if content and content != intro:
+            return content
+    return None
+
+
+def route_query(
+    query: str, intro_message: str | None = None, chat_history: list | None = None
+) -> tuple[str, str]:
+    """
+    Picks the generation path for a turn. Returns (route, reason).
+
+    A reply to a question from the assistant is always rag. Otherwise bare
+    greetings that open a conversation get the tenant's intro_message when it
+    has one; other small talk gets a short no-tool generation; everything
+    else is rag.
+    """
+    if not ROUTER_ENABLED:
+        return ROUTE_RAG, "disabled"
+    last_ai = _last_ai_turn(chat_history, intro_message)
+    if last_ai and last_ai.rstrip(" \t\n*_)\"'»").endswith(("?", "？")):
+        return ROUTE_RAG, "follow-up"
+    kind, reason = classify(query)
+    if kind == "greeting" and last_ai is None and (intro_message or "").strip():
+        return ROUTE_CANNED, reason
+    if kind in ("greeting", "smalltalk"):
+        return ROUTE_SMALLTALK, reason
+    return ROUTE_RAG, reason
@@ -0,0 +1,147 @@
+"""
+worker_chat/app/chat/rule_index.py
+
+Per-tenant relevance index over fine-tune rule triggers.
+
+Instead of injecting every tenant_fine_tune row into every system prompt,
+chat_task asks the index for the top-k rules whose trigger is lexically
+closest to the current turn. Rules flagged `always_on` bypass scoring and
+are always included.
+
+Scoring is purely local (no embeddings, no network):
+  - IDF-weighted word overlap between query and trigger
+  - Character trigram Dice similarity (tolerates typos, inflection, compounds)
+
+The index is rebuilt only when the tenant's rule set changes — a signature
+of the rule rows is compared on every turn and the cached index is reused
+while it matches.
+"""
+import hashlib
+import math
+import os
+import re
+import unicodedata
+
+# Maximum number of scored (non always-on) rules injected per turn.
+# Tenants with this many rules or fewer get every rule, as before.
+FINE_TUNE_TOP_K = int(os.getenv("FINE_TUNE_TOP_K", "8"))
+
+# Minimum relevance score for a rule to be injected at all.
+FINE_TUNE_MIN_SCORE = float(os.getenv("FINE_TUNE_MIN_SCORE", "0.15"))
+
+_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# tenant_id -> (signature, RuleIndex)
+_INDEX_CACHE: dict[str, tuple[str, "RuleIndex"]] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases, strips accents and collapses punctuation to single spaces."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD_RE.sub(" ", text).strip()
+
+
+def _tokens(normalized: str) -> set[str]:
+    return {tok for tok in normalized.split() if len(tok) > 1}
+
+
+def _trigrams(normalized: str) -> set[str]:
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def rules_signature(rules: list[dict]) -> str:
+    """Stable fingerprint of a rule set — changes whenever any rule changes."""
+    digest = hashlib.sha1()
+    for rule in sorted(rules, key=lambda r: (str(r.get("id")), r.get("trigger") or "")):
+        digest.update(
+            f"{rule.get('id')}\x1f{rule.get('trigger')}\x1f{rule.get('instruction')}"
+            f"\x1f{bool(rule.get('always_on'))}\x1e".encode("utf-8")
+        )
+    return digest.hexdigest()
+
+
+class RuleIndex:
+    """Lexical + trigram index over the triggers of one tenant's rules."""
+
+    def __init__(self, rules: list[dict]):
+        self.rules = list(rules)
+        self.always_on = [r for r in self.rules if r.get("always_on")]
+        self._entries = []
+        doc_freq: dict[str, int] = {}
+
+        for position, rule in enumerate(self.rules):
+            if rule.get("always_on"):
+                continue
+            normalized = normalize_text(rule.get("trigger", ""))
+            tokens = _tokens(normalized)
+            for tok in tokens:
+                doc_freq[tok] = doc_freq.get(tok, 0) + 1
+            self._entries.append((position, rule, tokens, _trigrams(normalized)))
+
+        n_docs = max(len(self._entries), 1)
+        self._idf = {
+            tok: math.log(1 + n_docs / freq) for tok, freq in doc_freq.items()
+        }
+
+    def score(self, query: str) -> list[tuple[float, int, dict]]:
+        """Returns (score, position, rule) for every scored rule, best first."""
+        normalized = normalize_text(query)
+        q_tokens = _tokens(normalized)
+        q_grams = _trigrams(normalized)
+
+        scored = []
+        for position, rule, tokens, grams in self._entries:
+            token_score = 0.0
+            if tokens:
+                total = sum(self._idf[tok] for tok in tokens)
+                hit = sum(self._idf[tok] for tok in tokens & q_tokens)
+                token_score = hit / total if total else 0.0
+            gram_score = 0.0
+            if grams and q_grams:
+                gram_score = 2 * len(grams & q_grams) / (len(grams) + len(q_grams))
+            scored.append((0.6 * token_score + 0.4 * gram_score, position, rule))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored
+
+    def select(self, query: str, top_k: int = FINE_TUNE_TOP_K,
+               min_score: float = FINE_TUNE_MIN_SCORE) -> list[dict]:
+        """
+        Returns the always-on rules plus the top_k most relevant rules,
+        in their original order so the prompt stays deterministic.
+        """
+        if len(self._entries) <= top_k:
+            return list(self.rules)
+
+        picked = {
+            position
+            for score, position, _ in self.score(query)[:top_k]
+            if score >= min_score
+        }
+        return [
+            rule for position, rule in enumerate(self.rules)
+            if rule.get("always_on") or position in picked
+        ]
+
+
+def get_rule_index(tenant_id: str, rules: list[dict]) -> RuleIndex:
+    """Returns the cached index for a tenant, rebuilding it if the rules changed."""
+    signature = rules_signature(rules)
+    cached = _INDEX_CACHE.get(tenant_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+    index = RuleIndex(rules)
+    _INDEX_CACHE[tenant_id] = (signature, index)
+    return index
+
+
+def select_rules(tenant_id: str, rules: list[dict], query: str) -> list[dict]:
+    """Top-k relevant rules (plus always-on rules) for this turn."""
+    if not rules:
+        return []
+    return get_rule_index(tenant_id, rules).select(query)
@@ -0,0 +1,124 @@
+"""
+worker_chat/app/chat/single_flight.py
+
+Coalesces identical in-flight chat turns.
+
+When many visitors ask the same first question within seconds, only the first
+turn (the leader) calls Gemini. Concurrent duplicates (followers) wait for the
+leader's result instead of starting their own call. The key is the same digest
+the answer cache uses (tenant, normalized query, language, store and config
+version — see chat/answer_cache.py), so coalesced answers are exactly the
+answers the cache would serve.
+
+Redis layout per digest:
+  chat_flight:{tenant_id}:{digest}         → leader token, SET NX with a TTL
+  chat_flight:{tenant_id}:{digest}:result  → JSON result, kept for a few seconds
+                                             so stragglers still find it
+
+Followers poll the result key. If the lock disappears without a result
+(leader failed) or SINGLE_FLIGHT_WAIT_SECONDS passes, the follower computes
+the turn itself. A follower whose visitor has left (should_stop) stops
+waiting too. Every Redis error degrades to "compute it yourself".
+"""
+import json
+import os
+import time
+import uuid
+from typing import Callable
+
+from app.database.redis_client import get_redis
+from app.logging_config import error_logger
+
+SINGLE_FLIGHT_LOCK_SECONDS = int(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", "90"))
+SINGLE_FLIGHT_RESULT_SECONDS = int(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", "15"))
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "60"))
+_POLL_INTERVAL = 0.15
+# should_stop is a Redis round trip of its own; ask it less often than we poll
+_STOP_CHECK_INTERVAL = 1.0
+
+# Deletes the lock only if it still holds this leader's token
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_key(tenant_id: str, digest: str) -> str:
+    return f"chat_flight:{tenant_id}:{digest}"
+
+
+def _result_key(tenant_id: str, digest: str) -> str:
+    return f"chat_flight:{tenant_id}:{digest}:result"
+
+
+def acquire(tenant_id: str, digest: str) -> str | None:
+    """
+    Tries to become the leader for this digest.
+
+    Returns a leader token, or None if another turn is already computing it.
+    On Redis errors a token is returned so the caller just proceeds alone.
+    """
+    token = uuid.uuid4().hex
+    try:
+        if get_redis().set(_lock_key(tenant_id, digest), token, nx=True, ex=SINGLE_FLIGHT_LOCK_SECONDS):
+            return token
+        return None
+    except Exception as e:
+        error_logger.warning("single_flight: acquire failed for tenant %s: %s", tenant_id, e)
+        return token
+
+
+def publish(tenant_id: str, digest: str, token: str, result: dict) -> None:
+    """Hands the leader's result to waiting followers and releases the lock."""
+    try:
+        r = get_redis()
+        r.set(_result_key(tenant_id, digest), json.dumps(result), ex=SINGLE_FLIGHT_RESULT_SECONDS)
+        r.eval(_RELEASE_SCRIPT, 1, _lock_key(tenant_id, digest), token)
+    except Exception as e:
+        error_logger.warning("single_flight: publish failed for tenant %s: %s", tenant_id, e)
+
+
+def release(tenant_id: str, digest: str, token: str) -> None:
+    """Releases the lock without a result, so followers fall back to computing."""
+    try:
+        get_redis().eval(_RELEASE_SCRIPT, 1, _lock_key(tenant_id, digest), token)
+    except Exception as e:
+        error_logger.warning("single_flight: release failed for tenant %s: %s", tenant_id, e)
+
+
+def wait_for_result(
+    tenant_id: str,
+    digest: str,
+    timeout: float = SINGLE_FLIGHT_WAIT_SECONDS,
+    should_stop: Callable[[], bool] | None = None,
+) -> dict | None:
+    """
+    Waits for the leader's result.
+
+    Returns the result dict, or None if the leader gave up, the wait timed out
+    or should_stop() turned true (the caller checks which).
+    """
+    deadline = time.monotonic() + timeout
+    next_stop_check = time.monotonic() + _STOP_CHECK_INTERVAL
+    lock_key, result_key = _lock_key(tenant_id, digest), _result_key(tenant_id, digest)
+    try:
+        r = get_redis()
+        while time.monotonic() < deadline:
+            pipe = r.pipeline()
+            pipe.get(result_key)
+            pipe.exists(lock_key)
+            raw, locked = pipe.execute()
+            if raw is not None:
+                return json.loads(raw)
+            if not locked:
+                return None
+            if should_stop and time.monotonic() >= next_stop_check:
+                if should_stop():
+                    return None
+                next_stop_check = time.monotonic() + _STOP_CHECK_INTERVAL
+            time.sleep(_POLL_INTERVAL)
+    except Exception as e:
+        error_logger.warning("single_flight: wait failed for tenant %s: %s", tenant_id, e)
+    return None
@@ -9,27 +9,50 @@ Key changes:
 - Conversation history passed natively (no LangChain message wrappers)
 - Token usage read from response.usage_metadata (no callback needed)
 - Fine-tune rules injected directly into the system instruction
+  (only the rules relevant to the turn — see chat/rule_index.py)
 - Citations extracted from grounding_metadata and returned to the frontend
+- Opt-in answer cache for repeated first-turn questions (see chat/answer_cache.py)
+- Model, output cap, thinking budget, retrieval depth and timeout come from the
+  tenant's latency profile (see chat/latency_profiles.py)
+- Log rows and billing debits are written behind the answer through a Redis
+  stream (see chat/write_behind.py); the turn's balance reservation is settled
+  against the cached balance (see billing/gate.py)
+- Abandoned turns (widget closed, polling stopped) are dropped or aborted
+  mid-generation (see chat/cancellation.py)
+- Every turn carries a deadline; a late first token hedges to a faster
+  fallback model (see chat/hedging.py)
+- Greetings and small talk skip retrieval via a local router (see chat/router.py)
+- Identical concurrent first turns share one Gemini call (see chat/single_flight.py)
+- Gemini calls run on the process's asyncio loop so one worker serves many
+  turns at once (see chat/aio_runtime.py)
 """
 import os
+import time
 from celery import shared_task
-from google import genai
 
 from app.database.supabase_client import supabase
 from app.billing.services import BillingService
+from app.billing import gate
 from app.logging_config import error_logger
-from app.prompts import FINE_TUNE_RULE_PROMPTS
-
-CHAT_GEMINI_MODEL = os.getenv("CHAT_GEMINI_MODEL", "gemini-3.1-flash-lite-preview")
-
-_client: genai.Client | None = None
-
-
-def _get_client() -> genai.Client:
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
-    return _client
+from app.prompts import FINE_TUNE_RULE_PROMPTS, SMALLTALK_PROMPTS
+from app.chat.rule_index import select_rules
+from app.chat.answer_cache import (
+    cache_key, get_cached_answer, is_history_independent, store_answer,
+)
+from app.chat.aio_runtime import generate_content, hedged_generate_content
+from app.chat.hedging import DeadlineExceeded
+from app.chat.cancellation import TurnCancelled, is_abandoned, record_cancellation
+from app.chat.write_behind import record_turn
+from app.chat import single_flight
+from app.chat.router import ROUTE_CANNED, ROUTE_RAG, ROUTE_SMALLTALK, route_query
+from app.chat.latency_profiles import (
+    CHAT_TURN_DEADLINE_SECONDS, fallback_generation_config, file_search_tool, generation_config,
+    get_latency_profile,
+)
+
+CHAT_SMALLTALK_MAX_TOKENS = int(os.getenv("CHAT_SMALLTALK_MAX_TOKENS", "120"))
+# Small-talk turns only see the tail of the conversation
+_SMALLTALK_HISTORY = 4
 
 
 def _build_contents(chat_history_json: list, query: str) -> list:
@@ -94,11 +117,134 @@ def _extract_citations(response) -> list[dict]:
     return citations
 
 
+def _log_chat_turn(
+    tenant_id, conversation_id, query, ai_message, model,
+    input_tokens, output_tokens, cost, latency_ms, cache_hit=False, coalesced=False, route=ROUTE_RAG,
+    latency_profile=None, hedged=False, queue_ms=None, user_id=None,
+) -> None:
+    """
+    Queues one chat_logs row, and the owner's debit of `cost` when user_id is
+    set, for the write-behind drainer, and charges the cost to the cached
+    balance right away. Failures are logged, never raised.
+    """
+    try:
+        record_turn({
+            "tenant_id": tenant_id,
+            "conversation_id": conversation_id,
+            "user_message": query,
+            "ai_message": ai_message,
+            "model_used": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_chf": cost,
+            "latency_ms": latency_ms,
+            "cache_hit": cache_hit,
+            "coalesced": coalesced,
+            "route": route,
+            "latency_profile": latency_profile,
+            "hedged": hedged,
+            "queue_ms": queue_ms,
+        }, user_id, cost)
+        gate.charge(user_id, cost)
+    except Exception as db_error:
+        error_logger.error(
+            "chat_task: DB log failed for tenant %s: %s", tenant_id, db_error, exc_info=True
+        )
+
+
+def _token_usage(response, tenant_id, prompt_text: str, ai_message: str) -> tuple[int, int]:
+    """Reads (input_tokens, output_tokens) from usage_metadata, estimating if absent."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return (
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0,
+        )
+    error_logger.warning("chat_task: usage_metadata unavailable for tenant %s — estimating", tenant_id)
+    return len(prompt_text) // 4, len(ai_message or "") // 4
+
+
+def _time_left(deadline_at: float, profile: dict) -> float:
+    """Seconds the next model call may take: the profile timeout, capped by the turn deadline."""
+    remaining = deadline_at - time.time()
+    if remaining <= 0:
+        raise DeadlineExceeded("Chat turn deadline passed before generation")
+    return min(float(profile["timeout_seconds"]), remaining)
+
+
+def _smalltalk_turn(
+    tenant_id, tenant_config, profile, query, chat_history_json, conversation_id, user_id,
+    started, deadline_at, queue_ms, should_stop,
+):
+    """
+    Answers a small-talk turn: persona-only system prompt, no file_search tool,
+    short history tail and a small output budget.
+    """
+    translation_target = tenant_config.get("translation_target", "en")
+    system_instruction = SMALLTALK_PROMPTS.get(translation_target, SMALLTALK_PROMPTS["en"]).format(
+        persona=tenant_config.get("system_persona", "")
+    )
+    history = list(chat_history_json)[-_SMALLTALK_HISTORY:]
+    while history and history[0].get("type") != "human":
+        history.pop(0)
+
+    response = generate_content(
+        model=profile["model"],
+        contents=_build_contents(history, query),
+        config={
+            **generation_config(profile),
+            "system_instruction": system_instruction,
+            "max_output_tokens": CHAT_SMALLTALK_MAX_TOKENS,
+        },
+        timeout=_time_left(deadline_at, profile),
+        should_stop=should_stop,
+    )
+    ai_message = response.text
+    input_tokens, output_tokens = _token_usage(response, tenant_id, system_instruction + query, ai_message)
+
+    cost = BillingService.calculate_cost(profile["model"], input_tokens, output_tokens) if user_id else 0.0
+
+    latency_ms = int((time.monotonic() - started) * 1000)
+    _log_chat_turn(
+        tenant_id, conversation_id, query, ai_message, profile["model"],
+        input_tokens, output_tokens, cost, latency_ms, route=ROUTE_SMALLTALK,
+        latency_profile=profile["name"], queue_ms=queue_ms, user_id=user_id,
+    )
+    return _turn_result(chat_history_json, query, ai_message, [])
+
+
+def _turn_result(chat_history_json: list, query: str, ai_message: str, citations: list) -> dict:
+    """Builds the task result, including the updated history."""
+    updated_history = list(chat_history_json) + [
+        {"type": "human", "content": query},
+        {"type": "ai", "content": ai_message},
+    ]
+    return {
+        "answer": ai_message,
+        "chat_history": updated_history,
+        "citations": citations,
+    }
+
+
 @shared_task(bind=True, queue="chat")
-def chat_task(self, tenant_id, query, chat_history_json, conversation_id, user_id=None):
+def chat_task(
+    self, tenant_id, query, chat_history_json, conversation_id, user_id=None,
+    deadline=None, enqueued_at=None, heartbeat=False, reserved=0.0,
+):
     """
     Celery task to handle a chat turn using Gemini with the File Search tool.
 
+    deadline is the epoch time by which the widget stops waiting for this
+    turn (stamped by the API). A turn dequeued after it fails immediately;
+    otherwise every model call is bounded by what is left of it.
+
+    enqueued_at (epoch) gives the queue time. With heartbeat=True the API
+    keeps a heartbeat for the turn while the widget polls, and the turn is
+    dropped or aborted once it is cancelled or the heartbeat expires.
+
+    reserved is the balance estimate the API's billing gate took for this
+    turn; it is released however the turn ends.
+
     Returns:
         {
             "answer": str,
@@ -106,8 +252,22 @@ def chat_task(self, tenant_id, query, chat_history_json, conversation_id, user_i
             "citations": [...],      # grounding sources used by the model
         }
     """
+    started = time.monotonic()
+    # Older callers did not stamp a deadline on the turn
+    deadline_at = deadline or (time.time() + CHAT_TURN_DEADLINE_SECONDS)
+    queue_ms = int((time.time() - enqueued_at) * 1000) if enqueued_at else None
+    task_id = self.request.id
+    generation_started = None
+    flight_digest, flight_token = None, None
+
+    def should_stop():
+        return is_abandoned(task_id, heartbeat)
+
     try:
-        client = _get_client()
+        if time.time() >= deadline_at:
+            raise DeadlineExceeded("Chat turn expired while queued")
+        if should_stop():
+            raise TurnCancelled("Chat turn abandoned while queued")
 
         # --- Fetch tenant config ---
         tenant_response = (
@@ -120,6 +280,27 @@ def chat_task(self, tenant_id, query, chat_history_json, conversation_id, user_i
         if not tenant_response.data:
             raise Exception(f"Tenant '{tenant_id}' not found")
         tenant_config = tenant_response.data
+        profile = get_latency_profile(str(tenant_id), tenant_config.get("latency_profile"))
+
+        # --- Route: greetings and small talk skip retrieval entirely ---
+        route, route_reason = route_query(query, tenant_config.get("intro_message"), chat_history_json)
+        if route != ROUTE_RAG:
+            error_logger.info("chat_task: routed turn for tenant %s to %s (%s)", tenant_id, route, route_reason)
+        if route == ROUTE_CANNED:
+            ai_message = tenant_config["intro_message"]
+            latency_ms = int((time.monotonic() - started) * 1000)
+            _log_chat_turn(
+                tenant_id, conversation_id, query, ai_message, "canned",
+                0, 0, 0.0, latency_ms, route=ROUTE_CANNED, latency_profile=profile["name"],
+                queue_ms=queue_ms,
+            )
+            return _turn_result(chat_history_json, query, ai_message, [])
+        if route == ROUTE_SMALLTALK:
+            generation_started = time.monotonic()
+            return _smalltalk_turn(
+                tenant_id, tenant_config, profile, query, chat_history_json, conversation_id, user_id,
+                started, deadline_at, queue_ms, should_stop,
+            )
 
         # --- Fetch fine-tune rules ---
         fine_tune_response = (
@@ -130,15 +311,70 @@ def chat_task(self, tenant_id, query, chat_history_json, conversation_id, user_i
         )
         fine_tune_rules = fine_tune_response.data or []
 
+        # --- Answer cache (opt-in, history-independent turns only) ---
+        cache_digest = None
+        if tenant_config.get("answer_cache_enabled") and is_history_independent(chat_history_json):
+            cache_digest = cache_key(tenant_config, fine_tune_rules, query)
+            cached = get_cached_answer(str(tenant_id), cache_digest)
+            if cached:
+                latency_ms = int((time.monotonic() - started) * 1000)
+                error_logger.info("chat_task: answer cache hit for tenant %s (%dms)", tenant_id, latency_ms)
+                _log_chat_turn(
+                    tenant_id, conversation_id, query, cached["answer"], "answer-cache",
+                    0, 0, 0.0, latency_ms, cache_hit=True, latency_profile=profile["name"],
+                    queue_ms=queue_ms,
+                )
+                return _turn_result(chat_history_json, query, cached["answer"], cached["citations"])
+
+        # --- Single-flight: concurrent identical first turns share one Gemini call ---
+        # Each follower still gets its own chat_logs row and is billed like the leader.
+        if is_history_independent(chat_history_json):
+            flight_digest = cache_digest or cache_key(tenant_config, fine_tune_rules, query)
+            flight_token = single_flight.acquire(str(tenant_id), flight_digest)
+            if flight_token is None:
+                shared = single_flight.wait_for_result(
+                    str(tenant_id), flight_digest,
+                    timeout=min(single_flight.SINGLE_FLIGHT_WAIT_SECONDS, max(0.0, deadline_at - time.time())),
+                    should_stop=should_stop,
+                )
+                if shared:
+                    cost = BillingService.calculate_cost(
+                        shared["model"], shared["input_tokens"], shared["output_tokens"]
+                    ) if user_id else 0.0
+                    latency_ms = int((time.monotonic() - started) * 1000)
+                    error_logger.info("chat_task: coalesced duplicate turn for tenant %s (%dms)", tenant_id, latency_ms)
+                    _log_chat_turn(
+                        tenant_id, conversation_id, query, shared["answer"], shared["model"],
+                        shared["input_tokens"], shared["output_tokens"], cost, latency_ms, coalesced=True,
+                        latency_profile=profile["name"], queue_ms=queue_ms, user_id=user_id,
+                    )
+                    return _turn_result(chat_history_json, query, shared["answer"], shared["citations"])
+                if should_stop():
+                    raise TurnCancelled("Chat turn abandoned while waiting for a duplicate")
+                # Leader failed or timed out — answer this turn independently
+
         # --- Build system instruction ---
-        system_instruction = _build_system_instruction(tenant_config, fine_tune_rules)
+        # Only the rules relevant to this turn (plus always-on rules) are injected.
+        # The previous human message is included so short follow-ups still match.
+        last_human = next(
+            (m["content"] for m in reversed(chat_history_json) if m.get("type") == "human"), ""
+        )
+        selected_rules = select_rules(str(tenant_id), fine_tune_rules, f"{last_human} {query}")
+        system_instruction = _build_system_instruction(tenant_config, selected_rules)
+        if len(selected_rules) < len(fine_tune_rules):
+            full_instruction = _build_system_instruction(tenant_config, fine_tune_rules)
+            error_logger.info(
+                "chat_task: %d/%d fine-tune rules selected for tenant %s — system prompt ~%d → ~%d tokens",
+                len(selected_rules), len(fine_tune_rules), tenant_id,
+                len(full_instruction) // 4, len(system_instruction) // 4,
+            )
 
         # --- Build tool config ---
         # Only attach file_search if the tenant has an indexed store
         tools = []
         store_name = tenant_config.get("gemini_file_store_name")
         if store_name:
-            tools = [{"file_search": {"file_search_store_names": [store_name]}}]
+            tools = [file_search_tool(store_name, profile)]
         else:
             error_logger.info(
                 "chat_task: no File Search store for tenant %s — answering from base knowledge",
@@ -153,66 +389,85 @@ def chat_task(self, tenant_id, query, chat_history_json, conversation_id, user_i
 
         contents = _build_contents(history, query)
 
-        # --- Generate ---
-        response = client.models.generate_content(
-            model=CHAT_GEMINI_MODEL,
+        # --- Generate (deadline-bounded, hedged to the fallback model if the first token is late) ---
+        generation_started = time.monotonic()
+        result = hedged_generate_content(
+            model=profile["model"],
             contents=contents,
             config={
+                **generation_config(profile),
+                "system_instruction": system_instruction,
+                "tools": tools,
+            },
+            deadline=_time_left(deadline_at, profile),
+            fallback_model=profile["fallback_model"],
+            fallback_config={
+                **fallback_generation_config(profile),
                 "system_instruction": system_instruction,
                 "tools": tools,
             },
+            hedge_delay=profile["hedge_delay_seconds"],
+            should_stop=should_stop,
         )
+        response, model = result.response, result.model
+        if result.hedged:
+            error_logger.info(
+                "chat_task: hedged turn for tenant %s — %s answered after %dms",
+                tenant_id, model, int((time.monotonic() - started) * 1000),
+            )
 
         ai_message = response.text
 
         # --- Token usage ---
-        usage = getattr(response, "usage_metadata", None)
-        if usage:
-            input_tokens = getattr(usage, "prompt_token_count", 0) or 0
-            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
-        else:
-            # Fallback estimation
-            input_tokens = len(query + str(chat_history_json)) // 4
-            output_tokens = len(ai_message) // 4
-            error_logger.warning("chat_task: usage_metadata unavailable for tenant %s — estimating", tenant_id)
+        input_tokens, output_tokens = _token_usage(response, tenant_id, query + str(chat_history_json), ai_message)
 
         # --- Citations ---
         citations = _extract_citations(response)
 
-        # --- Billing ---
-        cost = 0.0
-        if user_id:
-            cost = BillingService.deduct_cost(user_id, CHAT_GEMINI_MODEL, input_tokens, output_tokens)
-
-        # --- Log to DB ---
-        try:
-            supabase.table("chat_logs").insert({
-                "tenant_id": tenant_id,
-                "conversation_id": conversation_id,
-                "user_message": query,
-                "ai_message": ai_message,
-                "model_used": CHAT_GEMINI_MODEL,
+        # Release waiting duplicates before the billing/logging round-trips
+        if flight_token:
+            single_flight.publish(str(tenant_id), flight_digest, flight_token, {
+                "answer": ai_message,
+                "citations": citations,
+                "model": model,
                 "input_tokens": input_tokens,
                 "output_tokens": output_tokens,
-                "cost_chf": cost,
-            }).execute()
-        except Exception as db_error:
-            error_logger.error(
-                "chat_task: DB log failed for tenant %s: %s", tenant_id, db_error, exc_info=True
-            )
+            })
+            flight_token = None
 
-        # --- Build updated history ---
-        updated_history = list(chat_history_json) + [
-            {"type": "human", "content": query},
-            {"type": "ai", "content": ai_message},
-        ]
+        # --- Billing (debited by the write-behind drainer) ---
+        cost = BillingService.calculate_cost(model, input_tokens, output_tokens) if user_id else 0.0
 
-        return {
-            "answer": ai_message,
-            "chat_history": updated_history,
-            "citations": citations,
-        }
+        # --- Log + debit (write-behind, off the response path) ---
+        latency_ms = int((time.monotonic() - started) * 1000)
+        _log_chat_turn(
+            tenant_id, conversation_id, query, ai_message, model,
+            input_tokens, output_tokens, cost, latency_ms, latency_profile=profile["name"],
+            hedged=result.hedged, queue_ms=queue_ms, user_id=user_id,
+        )
+
+        # Fallback answers are good enough to serve once, not to pin in the cache
+        if cache_digest and ai_message and model == profile["model"]:
+            store_answer(str(tenant_id), cache_digest, ai_message, citations)
+
+        return _turn_result(chat_history_json, query, ai_message, citations)
+
+    except TurnCancelled as e:
+        stage = "generating" if generation_started else "queued"
+        wasted_ms = int((time.monotonic() - generation_started) * 1000) if generation_started else 0
+        error_logger.info(
+            "chat_task: %s for tenant %s (queued %sms, wasted %dms)", e, tenant_id, queue_ms, wasted_ms
+        )
+        record_cancellation(tenant_id, conversation_id, task_id, stage, queue_ms, wasted_ms)
+        if flight_token:
+            single_flight.release(str(tenant_id), flight_digest, flight_token)
+        raise
 
     except Exception as e:
         error_logger.error("chat_task: error for tenant %s: %s", tenant_id, e, exc_info=True)
+        if flight_token:
+            single_flight.release(str(tenant_id), flight_digest, flight_token)
         raise
+
+    finally:
+        gate.release(user_id, reserved, task_id)
@@ -0,0 +1,145 @@
+"""
+worker_chat/app/chat/write_behind.py
+
+Write-behind buffering for chat_logs rows and billing debits.
+
+A finished turn used to do a deduct_balance RPC and a chat_logs insert before
+chat_task could return — two Supabase round trips on the path the visitor
+waits on. Now chat_task appends one entry to a Redis stream and returns;
+drain_chat_writes (scheduled by beat) flushes the stream in batches through
+the apply_chat_writes() RPC, which inserts the log rows and applies the
+debits summed per user, all in one transaction.
+
+Exactly-once:
+  - every entry carries a write_id; chat_logs.write_id is unique and
+    billing_debits.write_id is a primary key, so replaying a batch is a no-op
+  - entries are read through a consumer group and only XACKed (and deleted)
+    after the RPC committed; entries a crashed drainer left pending are
+    reclaimed with XAUTOCLAIM after CHAT_WRITE_CLAIM_IDLE_MS
+
+Redis must be persistent (AOF) for the stream to survive a Redis restart.
+If the XADD itself fails, the entry is written synchronously instead.
+"""
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+from celery import shared_task
+from redis.exceptions import ResponseError
+
+from app.database.redis_client import get_redis
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+CHAT_WRITE_STREAM = "chat_writes"
+CHAT_WRITE_GROUP = "chat_writes_drainer"
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "500"))
+CHAT_WRITE_CLAIM_IDLE_MS = int(os.getenv("CHAT_WRITE_CLAIM_IDLE_MS", "60000"))
+# Upper bound on one drain run, so a backlog does not pin a worker thread
+_DRAIN_BUDGET_SECONDS = 10.0
+
+
+def _apply(entries: list[dict]) -> int:
+    """Writes a batch through apply_chat_writes(). Returns the rows inserted."""
+    result = supabase.rpc("apply_chat_writes", {"p_rows": entries}).execute()
+    return result.data or 0
+
+
+def _as_uuid(value) -> str | None:
+    """The user id as a UUID string, or None — a bad id must not poison a whole batch."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def record_turn(log_row: dict, user_id: str | None, cost: float) -> None:
+    """
+    Queues one chat_logs row plus its billing debit. Never raises.
+
+    The row keeps the turn's own timestamp, not the time it is flushed.
+    """
+    entry = {
+        "write_id": uuid.uuid4().hex,
+        "user_id": _as_uuid(user_id) if cost else None,
+        "amount": cost,
+        "log": {**log_row, "created_at": datetime.now(timezone.utc).isoformat()},
+    }
+    try:
+        get_redis().xadd(CHAT_WRITE_STREAM, {"entry": json.dumps(entry, default=str)})
+        return
+    except Exception as e:
+        error_logger.warning("write_behind: XADD failed, writing synchronously: %s", e)
+    try:
+        _apply([entry])
+    except Exception as e:
+        error_logger.error(
+            "write_behind: synchronous write failed for tenant %s: %s",
+            log_row.get("tenant_id"), e, exc_info=True,
+        )
+
+
+def _ensure_group(r) -> None:
+    try:
+        r.xgroup_create(CHAT_WRITE_STREAM, CHAT_WRITE_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _decode(messages) -> tuple[list[str], list[dict]]:
+    ids, entries = [], []
+    for message_id, fields in messages or []:
+        ids.append(message_id)
+        if fields and "entry" in fields:  # deleted entries come back empty
+            entries.append(json.loads(fields["entry"]))
+    return ids, entries
+
+
+@shared_task(queue="chat")
+def drain_chat_writes():
+    """Flushes buffered chat_logs rows and debits. Scheduled by beat."""
+    r = get_redis()
+    _ensure_group(r)
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    started = time.monotonic()
+    flushed = 0
+
+    # Entries another drainer read but never acknowledged (it crashed or its RPC failed)
+    claimed = r.xautoclaim(
+        CHAT_WRITE_STREAM, CHAT_WRITE_GROUP, consumer,
+        min_idle_time=CHAT_WRITE_CLAIM_IDLE_MS, start_id="0-0", count=CHAT_WRITE_BATCH_SIZE,
+    )
+    batches = [claimed[1]] if claimed and claimed[1] else []
+
+    while time.monotonic() - started < _DRAIN_BUDGET_SECONDS:
+        if not batches:
+            response = r.xreadgroup(
+                CHAT_WRITE_GROUP, consumer, {CHAT_WRITE_STREAM: ">"}, count=CHAT_WRITE_BATCH_SIZE
+            )
+            if not response or not response[0][1]:
+                break
+            batches.append(response[0][1])
+
+        ids, entries = _decode(batches.pop())
+        if entries:
+            try:
+                flushed += _apply(entries)
+            except Exception as e:
+                # Left pending; reclaimed and retried after CHAT_WRITE_CLAIM_IDLE_MS
+                error_logger.error("write_behind: flush of %d entries failed: %s", len(entries), e, exc_info=True)
+                break
+        if ids:
+            pipe = r.pipeline()
+            pipe.xack(CHAT_WRITE_STREAM, CHAT_WRITE_GROUP, *ids)
+            pipe.xdel(CHAT_WRITE_STREAM, *ids)
+            pipe.execute()
+
+    if flushed:
+        error_logger.info(
+            "write_behind: flushed %d chat_logs rows in %dms", flushed, int((time.monotonic() - started) * 1000)
+        )
+    return flushed
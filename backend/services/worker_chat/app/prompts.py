@@ -182,4 +182,9 @@ FINE_TUNE_RULE_PROMPTS = {
     'en': "If the user's question is in some way related to '{trigger}', use the following guideline for your response: '{instruction}'",
     'de': "Wenn die Frage des Benutzers sich in irgend einer Weise auf '{trigger}' bezieht, verwende die folgende Richtlinie für deine Antwort: '{instruction}'",
     'fr': "Si la question de l'utilisateur se rapporte d'une manière ou d'une autre à '{trigger}', utilisez la ligne directrice suivante pour votre réponse: '{instruction}'"
-}
\ No newline at end of file
+}
+SMALLTALK_PROMPTS = {
+    'en': "{persona}\n\nThe user is making small talk (a greeting, thanks or a goodbye). Reply in one or two short, friendly sentences and offer to help with further questions. Do not state any facts about products, services or policies.",
+    'de': "{persona}\n\nDer Benutzer macht Smalltalk (eine Begrüssung, ein Dank oder eine Verabschiedung). Antworte in ein bis zwei kurzen, freundlichen Sätzen und biete Hilfe bei weiteren Fragen an. Mache keine Sachaussagen über Produkte, Dienstleistungen oder Richtlinien.",
+    'fr': "{persona}\n\nL'utilisateur fait la conversation (une salutation, un remerciement ou un au revoir). Répondez en une ou deux phrases courtes et aimables et proposez votre aide pour d'autres questions. N'affirmez aucun fait sur des produits, services ou règles."
+}
@@ -25,5 +25,6 @@ celery.conf.update(
 
 # Explicitly import to register @shared_task decorators
 import app.chat.tasks  # noqa: F401, E402
+import app.chat.write_behind  # noqa: F401, E402
 
 error_logger.info("worker_chat: tasks registered — chat queue ready")
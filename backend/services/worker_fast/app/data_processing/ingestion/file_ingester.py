@@ -9,7 +9,7 @@ import httpx
 from pathlib import Path
 from urllib.parse import urlparse
 
-from app.database.supabase_client import supabase
+from app.database.status_writer import status_writer
 from app.gemini_store.service import GeminiStoreService, INDEXABLE_FILE_EXTENSIONS, UNSUPPORTED_EXTENSIONS
 from app.logging_config import error_logger
 
@@ -23,12 +23,10 @@ def process_local_file(file_path: str, source_filename: str, source_id: int, ten
 
     if ext in UNSUPPORTED_EXTENSIONS:
         error_logger.warning("Unsupported file type %s for source %s", ext, source_id)
-        supabase.table("tenant_sources").update({
-            "status": "UNSUPPORTED",
-        }).eq("id", source_id).execute()
+        status_writer.update(source_id, status="UNSUPPORTED")
         return
 
-    supabase.table("tenant_sources").update({"status": "PROCESSING"}).eq("id", source_id).execute()
+    status_writer.update(source_id, status="PROCESSING")
     try:
         store_name = GeminiStoreService.get_or_create_store(tenant_id)
         doc_name = GeminiStoreService.upload_file(
@@ -37,14 +35,11 @@ def process_local_file(file_path: str, source_filename: str, source_id: int, ten
             display_name=source_filename,
             metadata={"tenant_id": tenant_id, "source_id": str(source_id)},
         )
-        supabase.table("tenant_sources").update({
-            "gemini_document_name": doc_name,
-            "status": "COMPLETED",
-        }).eq("id", source_id).execute()
+        status_writer.update(source_id, gemini_document_name=doc_name, status="COMPLETED")
         error_logger.info("Indexed local file %s (source %s)", source_filename, source_id)
     except Exception as e:
         error_logger.error("Failed to index local file %s: %s", source_filename, e, exc_info=True)
-        supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
+        status_writer.update(source_id, status="ERROR")
 
 
 def process_file_url(url: str, source_id: int, tenant_id: str) -> None:
@@ -59,10 +54,10 @@ def process_file_url(url: str, source_id: int, tenant_id: str) -> None:
 
     if ext in UNSUPPORTED_EXTENSIONS:
         error_logger.warning("Unsupported file type %s at %s (source %s)", ext, url, source_id)
-        supabase.table("tenant_sources").update({"status": "UNSUPPORTED"}).eq("id", source_id).execute()
+        status_writer.update(source_id, status="UNSUPPORTED")
         return
 
-    supabase.table("tenant_sources").update({"status": "PROCESSING"}).eq("id", source_id).execute()
+    status_writer.update(source_id, status="PROCESSING")
     try:
         error_logger.info("Downloading file URL %s", url)
         response = httpx.get(url, follow_redirects=True, timeout=60.0)
@@ -76,14 +71,11 @@ def process_file_url(url: str, source_id: int, tenant_id: str) -> None:
             display_name=filename,
             metadata={"tenant_id": tenant_id, "source_id": str(source_id), "source_url": url},
         )
-        supabase.table("tenant_sources").update({
-            "gemini_document_name": doc_name,
-            "status": "COMPLETED",
-        }).eq("id", source_id).execute()
+        status_writer.update(source_id, gemini_document_name=doc_name, status="COMPLETED")
         error_logger.info("Indexed file URL %s (source %s)", url, source_id)
     except Exception as e:
         error_logger.error("Failed to index file URL %s: %s", url, e, exc_info=True)
-        supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
+        status_writer.update(source_id, status="ERROR")
 
 
 def process_webpage(url: str, source_id: int, tenant_id: str) -> None:
@@ -95,14 +87,12 @@ def process_webpage(url: str, source_id: int, tenant_id: str) -> None:
     """
     import trafilatura
 
-    supabase.table("tenant_sources").update({"status": "PROCESSING"}).eq("id", source_id).execute()
+    status_writer.update(source_id, status="PROCESSING")
     try:
         downloaded = trafilatura.fetch_url(url)
         if not downloaded:
             error_logger.warning("trafilatura: empty response for %s", url)
-            supabase.table("tenant_sources").update({
-                "status": "ERROR", "status_code": 0,
-            }).eq("id", source_id).execute()
+            status_writer.update(source_id, status="ERROR", status_code=0)
             return
 
         text = trafilatura.extract(
@@ -112,7 +102,7 @@ def process_webpage(url: str, source_id: int, tenant_id: str) -> None:
         )
         if not text:
             error_logger.warning("trafilatura: no content extracted from %s", url)
-            supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
+            status_writer.update(source_id, status="ERROR")
             return
 
         store_name = GeminiStoreService.get_or_create_store(tenant_id)
@@ -122,11 +112,8 @@ def process_webpage(url: str, source_id: int, tenant_id: str) -> None:
             display_name=url,
             metadata={"tenant_id": tenant_id, "source_id": str(source_id), "source_url": url},
         )
-        supabase.table("tenant_sources").update({
-            "gemini_document_name": doc_name,
-            "status": "COMPLETED",
-        }).eq("id", source_id).execute()
+        status_writer.update(source_id, gemini_document_name=doc_name, status="COMPLETED")
         error_logger.info("Indexed web page %s (source %s)", url, source_id)
     except Exception as e:
         error_logger.error("Failed to index web page %s: %s", url, e, exc_info=True)
-        supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
+        status_writer.update(source_id, status="ERROR")
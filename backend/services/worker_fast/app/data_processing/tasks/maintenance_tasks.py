@@ -1,11 +1,14 @@
 """
 tasks/maintenance_tasks.py
-Celery Beat periodic tasks — job scheduler and zombie reaper.
+Celery Beat periodic tasks — job scheduler, zombie reaper, crawl task
+compaction, analytics pruning and chat_logs archiving.
 """
-from datetime import datetime, timezone, timedelta
+import os
+from datetime import date, datetime, timezone, timedelta
 
 from celery import shared_task
 
+from app.database import chat_archive
 from app.database.supabase_client import supabase
 from app.data_processing.config import MAX_CONCURRENT_CRAWLS_PER_JOB
 from app.models.database import CrawlingStatus
@@ -81,3 +84,113 @@ def zombie_reaper_task(self):
 
     except Exception as e:
         error_logger.error("zombie_reaper: unexpected error: %s", e, exc_info=True)
+
+
+@shared_task(bind=True, queue="fast")
+def compact_crawl_tasks_task(self):
+    """
+    Periodic Celery Beat task — moves the crawling_tasks rows of jobs finished
+    for CRAWL_TASKS_IDLE_MINUTES into their crawling_job_archives row (URL,
+    status, depth and parent of each task), so the hot table only holds live
+    jobs. Each job is compacted in its own transaction.
+    """
+    idle_minutes = int(os.environ.get("CRAWL_TASKS_IDLE_MINUTES", "60"))
+    batch = int(os.environ.get("CRAWL_TASKS_COMPACT_BATCH", "50"))
+    try:
+        candidates = supabase.rpc("crawl_compaction_candidates", {
+            "p_idle_minutes": idle_minutes, "p_limit": batch,
+        }).execute().data or []
+        if not candidates:
+            error_logger.debug("compact_crawl_tasks: nothing to compact.")
+            return
+
+        for candidate in candidates:
+            job_id = candidate["job_id"]
+            try:
+                archived = supabase.rpc("compact_crawling_job", {"p_job_id": job_id}).execute().data
+                error_logger.info("compact_crawl_tasks: job %s archived with %s task(s).", job_id, archived)
+            except Exception as e:
+                error_logger.warning("compact_crawl_tasks: job %s failed, retrying next run: %s", job_id, e)
+
+    except Exception as e:
+        error_logger.error("compact_crawl_tasks: unexpected error: %s", e, exc_info=True)
+
+
+@shared_task(bind=True, queue="fast")
+def prune_chat_stats_task(self):
+    """
+    Periodic Celery Beat task — drops minute-level chat analytics rollups older
+    than CHAT_STATS_MINUTE_DAYS. Hour and day rollups are kept.
+    """
+    minute_days = int(os.environ.get("CHAT_STATS_MINUTE_DAYS", "14"))
+    try:
+        deleted = supabase.rpc("prune_chat_stats", {"p_minute_days": minute_days}).execute().data
+        error_logger.info("prune_chat_stats: removed %s minute bucket(s) older than %dd.", deleted, minute_days)
+    except Exception as e:
+        error_logger.error("prune_chat_stats: unexpected error: %s", e, exc_info=True)
+
+
+_RESTORE_BATCH_SIZE = 1000
+
+
+def _month_rows(month):
+    """Yields one month of chat_logs rows, tenant by tenant in (created_at, id) order."""
+    start = month.isoformat()
+    end = (month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)).isoformat()
+    tenants = supabase.rpc("chat_logs_month_tenants", {"p_month": start}).execute().data or []
+    for tenant in tenants:
+        yield from chat_archive.iter_tenant_rows(tenant["tenant_id"], start, end)
+
+
+@shared_task(bind=True, queue="fast")
+def archive_chat_logs_task(self):
+    """
+    Periodic Celery Beat task — keeps the next chat_logs partitions created and
+    moves months older than CHAT_LOGS_HOT_MONTHS to the archive files
+    (app/database/chat_archive.py). A partition is dropped only after its
+    files are written and the row count still matches.
+    """
+    hot_months = int(os.environ.get("CHAT_LOGS_HOT_MONTHS", "6"))
+    try:
+        supabase.rpc("ensure_chat_logs_partitions", {"p_months_ahead": 3}).execute()
+        candidates = supabase.rpc("chat_logs_archive_candidates", {"p_hot_months": hot_months}).execute().data or []
+
+        for candidate in candidates:
+            month = date.fromisoformat(candidate["month"])
+            written = chat_archive.write_month(month, _month_rows(month))
+            if written != candidate["row_count"]:
+                error_logger.warning(
+                    "archive_chat_logs: %s exported %d rows, expected %d — keeping the partition.",
+                    month, written, candidate["row_count"],
+                )
+                continue
+            supabase.rpc("finish_chat_logs_archive", {"p_month": month.isoformat(), "p_row_count": written}).execute()
+            error_logger.info("archive_chat_logs: archived %d row(s) of %s to %s.", written, month, chat_archive.month_dir(month))
+
+    except Exception as e:
+        error_logger.error("archive_chat_logs: unexpected error: %s", e, exc_info=True)
+
+
+@shared_task(bind=True, queue="fast")
+def restore_chat_logs_task(self, month, hold_days=7):
+    """
+    On-demand — loads an archived month (YYYY-MM-DD of its first day) back
+    into chat_logs and keeps it out of the archive for hold_days. Safe to
+    re-run: rows are inserted idempotently.
+    """
+    month = date.fromisoformat(month).replace(day=1)
+    try:
+        supabase.rpc("begin_chat_logs_restore", {"p_month": month.isoformat(), "p_hold_days": hold_days}).execute()
+        restored, batch = 0, []
+        for row in chat_archive.read_month(month):
+            batch.append(row)
+            if len(batch) >= _RESTORE_BATCH_SIZE:
+                restored += supabase.rpc("restore_chat_logs_rows", {"p_rows": batch}).execute().data or 0
+                batch = []
+        if batch:
+            restored += supabase.rpc("restore_chat_logs_rows", {"p_rows": batch}).execute().data or 0
+        supabase.rpc("finish_chat_logs_restore", {"p_month": month.isoformat()}).execute()
+        error_logger.info("restore_chat_logs: restored %d row(s) of %s for %dd.", restored, month, hold_days)
+    except Exception as e:
+        error_logger.error("restore_chat_logs: failed for %s: %s", month, e, exc_info=True)
+        raise
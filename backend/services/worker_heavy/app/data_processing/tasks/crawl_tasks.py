@@ -18,7 +18,7 @@ from celery import shared_task
 from celery import current_app as celery_app
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
 
-from app.database.supabase_client import supabase
+from app.database.supabase_client import supabase, start_query_count, query_count, query_time_ms
 from app.gemini_store.service import GeminiStoreService, INDEXABLE_FILE_EXTENSIONS
 from app.data_processing.crawler import get_crawler, browser_config
 from app.data_processing.soup_extractor import fetch_html, extract_internal_links
@@ -33,7 +33,7 @@ def _is_file_link(url: str) -> bool:
     return ext in INDEXABLE_FILE_EXTENSIONS
 
 
-def _dispatch_file_url(url: str, tenant_id: str) -> None:
+def _dispatch_file_url(url: str, tenant_id: str, job_id: int) -> None:
     """
     Creates a FILE_URL source record and dispatches process_file_url to worker_fast.
     Called when a file link is discovered during a Playwright crawl.
@@ -44,6 +44,7 @@ def _dispatch_file_url(url: str, tenant_id: str) -> None:
             "source_type": SourceType.FILE_URL.value,
             "source_location": url,
             "status": "QUEUED",
+            "job_id": job_id,
         }).execute()
         source_id = rec.data[0]["id"]
         celery_app.send_task(
@@ -56,22 +57,63 @@ def _dispatch_file_url(url: str, tenant_id: str) -> None:
         error_logger.error("Failed to dispatch FILE_URL %s: %s", url, e, exc_info=True)
 
 
-def _upload_page_to_store(
-    markdown: str, url: str, source_id: int, tenant_id: str
-) -> None:
-    """Uploads crawled markdown to the tenant's File Search Store and marks the source COMPLETED."""
-    store_name = GeminiStoreService.get_or_create_store(tenant_id)
-    doc_name = GeminiStoreService.upload_text(
-        store_name=store_name,
-        text=markdown,
-        display_name=url,
-        metadata={"tenant_id": tenant_id, "source_id": str(source_id), "source_url": url},
+# Longer links are not queued — they would not fit the (job_id, url) index
+_MAX_URL_LENGTH = 2048
+
+
+def _index_page(markdown: str, url: str, tenant_id: str, job_id: int, status_code) -> dict:
+    """
+    Uploads crawled markdown to the tenant's File Search Store and returns the
+    page's tenant_sources fields for complete_crawling_task — ERROR when there
+    is nothing to index or the upload fails.
+    """
+    if not markdown:
+        error_logger.warning("No content extracted from %s", url)
+        return {"status": "ERROR", "status_code": status_code}
+    try:
+        store_name = GeminiStoreService.get_or_create_store(tenant_id)
+        doc_name = GeminiStoreService.upload_text(
+            store_name=store_name,
+            text=markdown,
+            display_name=url,
+            metadata={"tenant_id": tenant_id, "job_id": str(job_id), "source_url": url},
+        )
+    except Exception as upload_err:
+        error_logger.error("Gemini upload failed for %s (job %s): %s", url, job_id, upload_err, exc_info=True)
+        return {"status": "ERROR", "status_code": status_code}
+    error_logger.info("Indexed page %s (job %s) → %s", url, job_id, doc_name)
+    return {"status": "COMPLETED", "status_code": status_code, "gemini_document_name": doc_name}
+
+
+def _finish_task(task_id: int, url: str, tenant_id: str, source: dict | None = None,
+                 children=(), failed: bool = False) -> None:
+    """
+    Records a page's outcome in one RPC — its source row, its new child tasks
+    (queued here) and, for the last outstanding task, the job's completion —
+    and logs the page's database round trips.
+    """
+    if failed:
+        result = supabase.rpc("fail_crawling_task", {"p_task_id": task_id, "p_source": source}).execute().data
+    else:
+        result = supabase.rpc("complete_crawling_task", {
+            "p_task_id": task_id,
+            "p_source": source,
+            "p_children": sorted(link for link in children if len(link) <= _MAX_URL_LENGTH),
+        }).execute().data
+    result = result or {}
+
+    for child in result.get("children") or []:
+        process_single_url_task.apply_async(
+            kwargs={"task_id": child["id"], "tenant_id": tenant_id, "parent_url": url},
+            queue="heavy",
+        )
+    if result.get("job_completed"):
+        error_logger.info("Crawl job %s marked COMPLETED (last task finished: %s)", result["job_id"], url)
+    error_logger.info(
+        "Finished %s %s — %d child task(s), db=%s calls %sms",
+        "FAILED" if failed else "COMPLETED", url, len(result.get("children") or []),
+        query_count(), query_time_ms(),
     )
-    supabase.table("tenant_sources").update({
-        "gemini_document_name": doc_name,
-        "status": "COMPLETED",
-    }).eq("id", source_id).execute()
-    error_logger.info("Indexed page %s (source %s) → %s", url, source_id, doc_name)
 
 
 # ---------------------------------------------------------------------------
@@ -143,30 +185,30 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
 
     File links found during discovery are dispatched to process_file_url (worker_fast)
     and shown as FILE_URL sources in the UI.
+
+    Database work is two RPCs per page: claim_crawling_task before the crawl,
+    complete_crawling_task or fail_crawling_task after it (_finish_task).
     """
+    start_query_count()
     task_details = {}
+    tenant_id = str(tenant_id)
     try:
-        task_response = (
-            supabase.table("crawling_tasks")
-            .select("*, crawling_jobs(*)")
-            .eq("id", task_id)
-            .execute()
-        )
-        if not task_response.data:
-            error_logger.debug("Task %s not found — job deleted while queued, discarding.", task_id)
+        claimed = supabase.rpc("claim_crawling_task", {"p_task_id": task_id}).execute().data
+        if not claimed:
+            error_logger.debug("Task %s not claimable — job deleted or task finished while queued, discarding.", task_id)
             return
 
-        task_details = task_response.data[0]
-        job = task_details["crawling_jobs"]
-        job_id = job["id"]
+        task_details = claimed[0]
+        job_id = task_details["job_id"]
         url = task_details["url"]
         depth = task_details["depth"]
-        max_depth = job["max_depth"]
-        excluded_urls = job.get("excluded_urls", [])
+        max_depth = task_details["max_depth"]
+        excluded_urls = task_details.get("excluded_urls") or []
+        crawl_mode = task_details["crawl_mode"]
         # Enforce same-host crawling: only follow links whose hostname exactly
         # matches the start URL. This prevents drifting into subdomains
         # (e.g. impactlab.fhnw.ch when the user entered www.fhnw.ch).
-        start_hostname = urlparse(job["start_url"]).hostname or ""
+        start_hostname = urlparse(task_details["start_url"]).hostname or ""
 
         normalized_url = normalize_url(url)
         normalized_excluded_list = [normalize_url(str(ex).strip()) for ex in excluded_urls]
@@ -186,28 +228,11 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
 
         if is_excluded:
             error_logger.info("Skipping excluded URL: %s", url)
-            supabase.table("crawling_tasks").update(
-                {"status": CrawlingStatus.COMPLETED.value}
-            ).eq("id", task_id).execute()
+            _finish_task(task_id, url, tenant_id)
             return
 
-        supabase.table("crawling_tasks").update(
-            {"status": CrawlingStatus.IN_PROGRESS.value}
-        ).eq("id", task_id).execute()
         error_logger.info("Crawling URL: %s at depth %s", url, depth)
 
-        # ------------------------------------------------------------------
-        # Resolve crawl mode
-        # ------------------------------------------------------------------
-        crawl_mode_resp = (
-            supabase.table("tenants")
-            .select("crawl_mode")
-            .eq("id", str(tenant_id))
-            .single()
-            .execute()
-        )
-        crawl_mode = (crawl_mode_resp.data or {}).get("crawl_mode") or "playwright_llm"
-
         # ==================================================================
         # SOUP MODE — httpx + trafilatura, no Playwright
         # ==================================================================
@@ -216,45 +241,22 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
 
             html, status_code = fetch_html(url)
             if not html or status_code >= 400:
-                supabase.table("crawling_tasks").update(
-                    {"status": CrawlingStatus.FAILED.value}
-                ).eq("id", task_id).execute()
-                supabase.table("tenant_sources").insert({
-                    "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                    "source_location": url, "status": "ERROR", "status_code": status_code,
-                }).execute()
+                _finish_task(task_id, url, tenant_id, {"status": "ERROR", "status_code": status_code}, failed=True)
                 return
 
-            source_response = supabase.table("tenant_sources").insert({
-                "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                "source_location": url, "status": "PROCESSING", "status_code": status_code,
-            }).execute()
-            source_id = source_response.data[0]["id"]
-
             # pyrefly: ignore [missing-import]
             import trafilatura
             text = trafilatura.extract(html, url=url, output_format="markdown",
                                        include_links=False, include_images=False)
-            if text:
-                try:
-                    _upload_page_to_store(text, url, source_id, str(tenant_id))
-                except Exception as upload_err:
-                    error_logger.error("soup: Gemini upload failed for %s (source %s): %s", url, source_id, upload_err, exc_info=True)
-                    supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
-            else:
-                error_logger.warning("soup: no content extracted from %s", url)
-                supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
-
-            # Link discovery
+            source = _index_page(text, url, tenant_id, job_id, status_code)
+
+            # Link discovery — file links are dispatched, pages are not followed in soup mode
             found_links: set[str] = set()
             for href in extract_internal_links(html, url):
                 _check_and_add_link(href, normalized_excluded_list, found_links,
-                                    str(tenant_id), job_id, depth, max_depth, url, start_hostname)
+                                    tenant_id, job_id, depth, max_depth, url, start_hostname)
 
-            supabase.table("crawling_tasks").update(
-                {"status": CrawlingStatus.COMPLETED.value}
-            ).eq("id", task_id).execute()
-            error_logger.info("soup: completed %s", url)
+            _finish_task(task_id, url, tenant_id, source)
             return
 
         # ==================================================================
@@ -268,14 +270,8 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
                 )
                 if fast_check.status_code == 404 or fast_check.status_code >= 500:
                     error_logger.info("Fast-fail %s with status %s", url, fast_check.status_code)
-                    supabase.table("crawling_tasks").update(
-                        {"status": CrawlingStatus.FAILED.value}
-                    ).eq("id", task_id).execute()
-                    supabase.table("tenant_sources").insert({
-                        "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                        "source_location": url, "status": "ERROR",
-                        "status_code": fast_check.status_code,
-                    }).execute()
+                    _finish_task(task_id, url, tenant_id,
+                                 {"status": "ERROR", "status_code": fast_check.status_code}, failed=True)
                     return
         except Exception as e:
             error_logger.warning("Fast-check failed for %s, falling back to crawler: %s", url, e)
@@ -294,34 +290,14 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
             asyncio.run(asyncio.wait_for(crawl_and_close(), timeout=70.0))
         except asyncio.TimeoutError:
             error_logger.error("Timeout loading page %s", url)
-            supabase.table("crawling_tasks").update(
-                {"status": CrawlingStatus.FAILED.value}
-            ).eq("id", task_id).execute()
-            supabase.table("tenant_sources").insert({
-                "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                "source_location": url, "status": "ERROR", "status_code": 408,
-            }).execute()
+            _finish_task(task_id, url, tenant_id, {"status": "ERROR", "status_code": 408}, failed=True)
             return
 
         found_links: set[str] = set()
         status_code = getattr(crawl_result, "status_code", None) if crawl_result else None
 
         if crawl_result and crawl_result.success and crawl_result.markdown:
-            # Create source record and upload markdown to File Search
-            source_response = supabase.table("tenant_sources").insert({
-                "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                "source_location": url, "status": "PROCESSING", "status_code": status_code,
-            }).execute()
-            source_id = source_response.data[0]["id"]
-
-            try:
-                _upload_page_to_store(crawl_result.markdown, url, source_id, str(tenant_id))
-            except Exception as upload_err:
-                error_logger.error(
-                    "playwright: Gemini upload failed for %s (source %s): %s",
-                    url, source_id, upload_err, exc_info=True
-                )
-                supabase.table("tenant_sources").update({"status": "ERROR"}).eq("id", source_id).execute()
+            source = _index_page(crawl_result.markdown, url, tenant_id, job_id, status_code)
 
             # Link discovery — use Crawl4AI's pre-filtered internal link list.
             # Do NOT use raw BS4 on rendered_html: it picks up every <a> tag
@@ -330,92 +306,16 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
                 href = lnk.get("href", "").split("#")[0].strip()  # strip fragments
                 if href:
                     _check_and_add_link(href, normalized_excluded_list, found_links,
-                                        str(tenant_id), job_id, depth, max_depth, url, start_hostname)
+                                        tenant_id, job_id, depth, max_depth, url, start_hostname)
 
             error_logger.info("playwright: found %d page links on %s", len(found_links), url)
         else:
-            supabase.table("tenant_sources").insert({
-                "tenant_id": str(tenant_id), "source_type": SourceType.URL.value,
-                "source_location": url, "status": "ERROR",
-                "status_code": status_code if status_code else 500,
-            }).execute()
-
-        # Enqueue discovered page links (file links already dispatched in _check_and_add_link)
-        if depth < max_depth and found_links:
-            found_list = list(found_links)
-
-            # Deduplicate within the current job only — URLs already in crawling_tasks
-            # for this job_id are skipped. We do NOT check tenant_sources so that
-            # re-crawling the same site across separate jobs works correctly.
-            #
-            # NOTE: PostgREST serialises .in_() values into the query-string, so
-            # large or percent-encoded URL lists can exceed the server's URL-length
-            # limit and return a raw "Bad Request" (non-JSON) 400 response, which
-            # causes a pydantic crash in the postgrest client. Guard against this by
-            # (a) chunking the list into batches of 50 and (b) wrapping in try/except
-            # so a single bad response degrades gracefully instead of aborting the task.
-            already_queued: set[str] = set()
-            try:
-                CHUNK_SIZE = 50
-                for i in range(0, len(found_list), CHUNK_SIZE):
-                    chunk = found_list[i : i + CHUNK_SIZE]
-                    tasks_resp = (
-                        supabase.table("crawling_tasks")
-                        .select("url")
-                        .eq("job_id", job_id)
-                        .in_("url", chunk)
-                        .execute()
-                    )
-                    already_queued.update(item["url"] for item in (tasks_resp.data or []))
-            except Exception as dedup_err:
-                error_logger.warning(
-                    "Dedup query failed for job %s (skipping dedup, may re-enqueue some URLs): %s",
-                    job_id, dedup_err,
-                )
+            source = {"status": "ERROR", "status_code": status_code if status_code else 500}
 
-            new_links = found_links - already_queued
-
-            if new_links:
-                new_task_rows = supabase.table("crawling_tasks").insert([
-                    {
-                        "job_id": job_id, "url": link, "depth": depth + 1,
-                        "status": CrawlingStatus.PENDING.value, "parent_url": url,
-                    }
-                    for link in new_links
-                ]).execute()
-                for new_task in new_task_rows.data:
-                    process_single_url_task.apply_async(
-                        kwargs={
-                            "task_id": new_task["id"],
-                            "tenant_id": str(tenant_id),
-                            "parent_url": url,
-                        },
-                        queue="heavy",
-                    )
-
-        supabase.table("crawling_tasks").update(
-            {"status": CrawlingStatus.COMPLETED.value}
-        ).eq("id", task_id).execute()
-        error_logger.info("Completed processing URL: %s", url)
-
-        # ── Final-task check ───────────────────────────────────────────────
-        # No single worker knows it's "the last one", so after each completion
-        # we ask: are there still any PENDING or IN_PROGRESS tasks for this job?
-        # If not, we own the responsibility of marking the job COMPLETED.
-        # Use limit(1) — we only need to know if at least one exists.
-        outstanding = (
-            supabase.table("crawling_tasks")
-            .select("id", count="exact")
-            .eq("job_id", job_id)
-            .in_("status", [CrawlingStatus.PENDING.value, CrawlingStatus.IN_PROGRESS.value])
-            .limit(1)
-            .execute()
-        )
-        if not outstanding.data:
-            supabase.table("crawling_jobs").update(
-                {"status": CrawlingStatus.COMPLETED.value}
-            ).eq("id", job_id).eq("status", CrawlingStatus.IN_PROGRESS.value).execute()
-            error_logger.info("Crawl job %s marked COMPLETED (last task finished: %s)", job_id, url)
+        # Discovered page links become child tasks in the same call; URLs the
+        # job already has are skipped by its (job_id, url) key, and a
+        # cancelled job gets none. File links were dispatched in _check_and_add_link.
+        _finish_task(task_id, url, tenant_id, source, found_links if depth < max_depth else ())
 
     except Exception as e:
         err_str = str(e)
@@ -429,9 +329,7 @@ def process_single_url_task(self, task_id: int, tenant_id: UUID, parent_url: str
                 "Error processing URL %s: %s",
                 task_details.get("url", "unknown"), err_str, exc_info=True,
             )
-        supabase.table("crawling_tasks").update(
-            {"status": CrawlingStatus.FAILED.value}
-        ).eq("id", task_id).execute()
+        _finish_task(task_id, task_details.get("url", "unknown"), tenant_id, failed=True)
 
 
 # ---------------------------------------------------------------------------
@@ -475,7 +373,7 @@ def _check_and_add_link(
 
     if _is_file_link(href):
         # File link: dispatch to worker_fast immediately, don't add to crawling_tasks
-        _dispatch_file_url(href, tenant_id)
+        _dispatch_file_url(href, tenant_id, job_id)
     elif depth < max_depth:
         # Regular HTML page within depth budget
         found_page_links.add(href)
\ No newline at end of file
@@ -1,25 +1,35 @@
 from functools import wraps
 from flask import request, jsonify
-from app.database.supabase_client import supabase
+from app.auth.tokens import authenticate, fetch_user
 
-def token_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
+def _bearer_token():
+    parts = request.headers.get('Authorization', '').split(" ")
+    return parts[1] if len(parts) == 2 else None
 
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
+def _require_token(resolve_user):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            token = _bearer_token()
 
-        try:
-            user_response = supabase.auth.get_user(token)
-            current_user = user_response.user
-            if not current_user:
-                return jsonify({'message': 'Token is invalid!'}), 401
-        except Exception as e:
-            return jsonify({'message': 'Token is invalid!', 'error': str(e)}), 401
+            if not token:
+                return jsonify({'message': 'Token is missing!'}), 401
 
-        return f(current_user, *args, **kwargs)
+            try:
+                current_user = resolve_user(token)
+                if not current_user:
+                    return jsonify({'message': 'Token is invalid!'}), 401
+            except Exception as e:
+                return jsonify({'message': 'Token is invalid!', 'error': str(e)}), 401
 
-    return decorated_function
+            return f(current_user, *args, **kwargs)
+
+        return decorated_function
+    return decorator
+
+# Verifies the JWT locally (see auth/tokens.py) — no Supabase round trip
+token_required = _require_token(authenticate)
+
+# Asks Supabase Auth on every request, so a revoked session is refused at once.
+# For account and payment routes.
+fresh_token_required = _require_token(fetch_user)
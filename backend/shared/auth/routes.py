@@ -1,7 +1,8 @@
 import os
 from flask import Blueprint, request, jsonify
 from app.database.supabase_client import supabase
-from app.auth.decorators import token_required
+from app.auth.decorators import fresh_token_required
+from app.auth.tokens import forget_token
 from app.logging_config import error_logger
 from app import limiter
 from supabase import create_client, Client
@@ -56,7 +57,7 @@ def login():
         return jsonify({"error": "Invalid login credentials."}), 401
 
 @auth_bp.route('/user', methods=['GET'])
-@token_required
+@fresh_token_required
 def get_user(current_user):
     try:
         return jsonify({
@@ -68,7 +69,7 @@ def get_user(current_user):
         return jsonify({"error": "Failed to retrieve user information", "details": str(e)}), 500
 
 @auth_bp.route('/user', methods=['PUT'])
-@token_required
+@fresh_token_required
 def update_user(current_user):
     try:
         data = request.get_json()
@@ -85,17 +86,18 @@ def update_user(current_user):
         return jsonify({"error": "Could not update user metadata", "details": str(e)}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
-@token_required
+@fresh_token_required
 def logout(current_user):
     try:
         token = request.headers['Authorization'].split(" ")[1]
         supabase.auth.sign_out(token)
+        forget_token(token)
         return jsonify({"message": "Successfully logged out"}), 200
     except Exception as e:
         error_logger.error(f"Error during logout for user {current_user.id}: {e}", extra={'user_id': current_user.id}, exc_info=True)
         return jsonify({"error": "Logout failed", "details": str(e)}), 500
 @auth_bp.route('/change-password', methods=['POST'])
-@token_required
+@fresh_token_required
 def change_password(current_user):
     try:
         data = request.get_json()
@@ -0,0 +1,162 @@
+"""
+shared/auth/tokens.py
+
+Local verification of Supabase access tokens.
+
+token_required used to call supabase.auth.get_user(token) on every request —
+a round trip to Supabase Auth before the endpoint even started, repeated for
+every progress poll. Supabase access tokens are JWTs, so they are verified
+here instead:
+
+  HS256             signed with the project's JWT secret (SUPABASE_JWT_SECRET)
+  RS256 / ES256     signed with the project's asymmetric keys, fetched from
+                    {SUPABASE_URL}/auth/v1/.well-known/jwks.json and cached for
+                    AUTH_JWKS_CACHE_SECONDS (refetched on an unknown kid)
+
+A verified token's user is cached until the token expires, so repeat requests
+cost a dict lookup. When a token cannot be verified locally (HS256 without a
+configured secret, JWKS endpoint unreachable) it is checked with get_user
+once and cached the same way.
+
+Local verification cannot see a session that was revoked before the token
+expired; routes where that matters use fresh_token_required, which always
+asks Supabase Auth.
+
+USAGE:
+  from app.auth.tokens import authenticate
+
+  user = authenticate(token)   # raises jwt.InvalidTokenError
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import jwt
+
+from app.database.supabase_client import supabase
+
+SUPABASE_URL = (os.environ.get("SUPABASE_URL") or "").rstrip("/")
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET") or None
+AUTH_JWKS_CACHE_SECONDS = int(os.environ.get("AUTH_JWKS_CACHE_SECONDS", "600"))
+JWT_AUDIENCE = "authenticated"
+_ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+# Tolerates small clock drift between this host and Supabase Auth
+_LEEWAY_SECONDS = 10
+_USER_CACHE_MAX = 10_000
+
+# token -> (user, expires_at epoch)
+_user_cache: dict[str, tuple[object, float]] = {}
+_jwks_client: jwt.PyJWKClient | None = None
+_lock = threading.Lock()
+
+
+@dataclass
+class TokenUser:
+    """The subset of the Supabase User the routes read, built from JWT claims."""
+    id: str
+    email: str | None = None
+    phone: str | None = None
+    role: str | None = None
+    aud: str | None = None
+    user_metadata: dict = field(default_factory=dict)
+    app_metadata: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "TokenUser":
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            phone=claims.get("phone"),
+            role=claims.get("role"),
+            aud=claims.get("aud"),
+            user_metadata=dict(claims.get("user_metadata") or {}),
+            app_metadata=dict(claims.get("app_metadata") or {}),
+        )
+
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    global _jwks_client
+    if _jwks_client is None:
+        with _lock:
+            if _jwks_client is None:
+                _jwks_client = jwt.PyJWKClient(
+                    f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+                    cache_keys=True,
+                    lifespan=AUTH_JWKS_CACHE_SECONDS,
+                    timeout=5,
+                )
+    return _jwks_client
+
+
+def decode_token(token: str) -> dict | None:
+    """
+    Verifies the token's signature, expiry and audience and returns its
+    claims. Returns None when the token cannot be verified locally.
+    Raises jwt.InvalidTokenError for a token that is not valid.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            return None
+        key = SUPABASE_JWT_SECRET
+        algorithms = ["HS256"]
+    elif algorithm in _ASYMMETRIC_ALGORITHMS:
+        try:
+            key = _get_jwks_client().get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientConnectionError:
+            return None
+        algorithms = _ASYMMETRIC_ALGORITHMS
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+    return jwt.decode(
+        token, key, algorithms=algorithms, audience=JWT_AUDIENCE,
+        leeway=_LEEWAY_SECONDS, options={"require": ["exp", "sub"]},
+    )
+
+
+def _cache_user(token: str, user, expires_at: float) -> None:
+    if len(_user_cache) >= _USER_CACHE_MAX:
+        now = time.time()
+        for cached_token, (_, cached_expiry) in list(_user_cache.items()):
+            if cached_expiry <= now:
+                _user_cache.pop(cached_token, None)
+        if len(_user_cache) >= _USER_CACHE_MAX:
+            _user_cache.clear()
+    _user_cache[token] = (user, expires_at)
+
+
+def fetch_user(token: str):
+    """Asks Supabase Auth for the token's user. Raises on an invalid token."""
+    user = supabase.auth.get_user(token).user
+    if not user:
+        raise jwt.InvalidTokenError("Token is invalid")
+    return user
+
+
+def authenticate(token: str):
+    """
+    Returns the user for a valid access token, from the cache when possible.
+    Raises jwt.InvalidTokenError (or the Supabase Auth error) otherwise.
+    """
+    cached = _user_cache.get(token)
+    if cached and cached[1] > time.time():
+        return cached[0]
+
+    claims = decode_token(token)
+    if claims is not None:
+        user = TokenUser.from_claims(claims)
+        expires_at = float(claims["exp"])
+    else:
+        user = fetch_user(token)
+        # Supabase Auth just vouched for the token, so its exp claim is trustworthy
+        expires_at = float(jwt.decode(token, options={"verify_signature": False}).get("exp", 0))
+
+    _cache_user(token, user, expires_at)
+    return user
+
+
+def forget_token(token: str) -> None:
+    """Drops a token from the cache (on logout)."""
+    _user_cache.pop(token, None)
@@ -0,0 +1,144 @@
+"""
+shared/database/chat_archive.py
+
+Cold storage for chat_logs months past the retention window.
+
+worker_fast exports each month older than CHAT_LOGS_HOT_MONTHS to
+zstd-compressed JSON lines on the shared data volume, one file per tenant so
+reading a conversation back only decompresses that tenant's month:
+
+  CHAT_ARCHIVE_DIR/2025-11/<tenant_id>.jsonl.zst
+
+Each tenant file holds its rows in (created_at, id) order — the order of
+chat_logs_page(), which the archiver reads tenant by tenant — so an export
+can resume from any (created_at, id) whether the row is hot or archived.
+A month is written to a temporary directory and renamed into place once
+complete, so readers never see half an archive. chat_logs_archives (see the
+partition_chat_logs migration) records which months live only here.
+
+USAGE:
+  from app.database import chat_archive
+
+  chat_archive.write_month(month, rows)                     # worker_fast
+  chat_archive.read_conversation(month, tenant_id, conv_id) # api
+  chat_archive.iter_tenant_rows(tenant_id, start, end)      # table, keyset pages
+"""
+import io
+import json
+import os
+import shutil
+from datetime import date
+
+import zstandard
+
+from app.database.supabase_client import supabase
+
+ARCHIVE_DIR = os.environ.get("CHAT_ARCHIVE_DIR", "/app/data/archive/chat_logs")
+PAGE_SIZE = 1000
+_LEVEL = 10
+
+
+def month_dir(month: date) -> str:
+    return os.path.join(ARCHIVE_DIR, month.strftime("%Y-%m"))
+
+
+def archive_path(month: date, tenant_id: str) -> str:
+    return os.path.join(month_dir(month), f"{tenant_id}.jsonl.zst")
+
+
+def write_month(month: date, rows) -> int:
+    """
+    Writes an iterable of chat_logs rows (dicts) as the month's archive and
+    returns the number of rows written. Replaces an earlier archive of the month.
+    """
+    final_dir = month_dir(month)
+    tmp_dir = f"{final_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Rows arrive tenant by tenant, so one file is open at a time. A tenant
+    # seen again appends a new zstd frame (readers read across frames).
+    tenant_id, writer, count = None, None, 0
+    try:
+        for row in rows:
+            if str(row["tenant_id"]) != tenant_id:
+                if writer:
+                    writer.close()
+                tenant_id = str(row["tenant_id"])
+                f = open(os.path.join(tmp_dir, f"{tenant_id}.jsonl.zst"), "ab")
+                writer = zstandard.ZstdCompressor(level=_LEVEL).stream_writer(f)
+            writer.write(json.dumps(row, default=str).encode() + b"\n")
+            count += 1
+    finally:
+        if writer:
+            writer.close()
+
+    old_dir = f"{final_dir}.old"
+    if os.path.exists(final_dir):
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.rename(final_dir, old_dir)
+    os.rename(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return count
+
+
+def _read_file(path: str):
+    with open(path, "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        for line in io.TextIOWrapper(reader, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_conversation(month: date, tenant_id: str, conversation_id: str) -> list[dict]:
+    """The archived rows of one conversation in one month ([] if there are none)."""
+    path = archive_path(month, tenant_id)
+    if not os.path.exists(path):
+        return []
+    conversation_id = str(conversation_id)
+    return [row for row in _read_file(path) if row.get("conversation_id") == conversation_id]
+
+
+def read_tenant_month(month: date, tenant_id: str):
+    """Yields a tenant's archived rows of the month in (created_at, id) order."""
+    path = archive_path(month, tenant_id)
+    if os.path.exists(path):
+        yield from _read_file(path)
+
+
+def iter_tenant_rows(tenant_id: str, start=None, end=None, after=None):
+    """
+    Yields a tenant's chat_logs rows in (created_at, id) order, PAGE_SIZE rows
+    per query. start/end bound created_at (ISO strings, end exclusive);
+    after=(created_at, id) continues behind that row.
+    """
+    after_created, after_id = after or (None, None)
+    while True:
+        page = supabase.rpc("chat_logs_page", {
+            "p_tenant_id": str(tenant_id),
+            "p_from": start,
+            "p_to": end,
+            "p_after_created": after_created,
+            "p_after_id": after_id,
+            "p_limit": PAGE_SIZE,
+        }).execute().data or []
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        after_created, after_id = page[-1]["created_at"], page[-1]["id"]
+
+
+def read_month(month: date):
+    """Yields every archived row of the month, tenant by tenant."""
+    directory = month_dir(month)
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"No chat_logs archive for {month:%Y-%m} in {ARCHIVE_DIR}")
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".jsonl.zst"):
+            yield from _read_file(os.path.join(directory, name))
+
+
+__all__ = [
+    "ARCHIVE_DIR", "archive_path", "month_dir", "write_month", "read_conversation",
+    "read_tenant_month", "read_month", "iter_tenant_rows",
+]
@@ -0,0 +1,45 @@
+"""
+shared/database/redis_client.py
+
+Lazy Redis client for application-level caching and coordination
+(answer cache, locks, counters). Celery keeps its own broker connection —
+this client is only for data the application reads and writes directly.
+
+REDIS_URL defaults to the Celery broker so no extra service is required.
+
+USAGE:
+  from app.database.redis_client import get_redis
+
+  get_redis().set("key", "value", ex=60)
+"""
+import os
+
+import redis
+
+REDIS_URL = os.environ.get("REDIS_URL") or os.environ.get("CELERY_BROKER_URL", "redis://redis:6379/0")
+
+_client: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Returns the process-wide Redis client, creating it on first use.
+
+    redis-py's connection pool detects a fork and re-creates its connections
+    in the child, so the client is safe to share with ForkPoolWorkers.
+    Timeouts are short: callers treat Redis as an optimisation and fall back
+    to the uncached path when it is unavailable.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=2.0,
+            socket_timeout=2.0,
+            health_check_interval=30,
+        )
+    return _client
+
+
+__all__ = ["get_redis", "REDIS_URL"]
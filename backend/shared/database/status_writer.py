@@ -0,0 +1,199 @@
+"""
+shared/database/status_writer.py
+
+Write-coalescing tenant_sources updates for the ingestion workers.
+
+Ingestion used to write each transition of a source as its own single-row
+update — PROCESSING, then status_code, token counts, COMPLETED — often
+several per source and all on the task's critical path. The writer queues the
+fields in Redis instead, merged per source id (a later value for the same
+field wins), and one drain at a time writes everything queued by every worker
+process with one update_tenant_sources() RPC per STATUS_WRITER_MAX_ROWS
+sources. A prefork worker runs one task per process, so a per-process buffer
+would only ever hold one source; the shared queue is what batches.
+
+Redis layout:
+  source_status:pending      → hash: source id → JSON of the merged fields
+  source_status:inflight     → the batch being written (renamed from pending)
+  source_status:drain_lock   → one drain at a time, token + TTL
+  source_status:drain_tick   → at most one timed drain per STATUS_WRITER_FLUSH_MS
+
+Every process that queued an update runs a background thread that tries to
+drain every STATUS_WRITER_FLUSH_MS; the tick key lets only one of them
+through, so the write rate is bounded by the interval, not by the number of
+sources or processes. A failed batch is merged back under any newer values;
+a batch left behind by a crashed drain is written first by the next one, so
+an older value never overwrites a newer one. If Redis is unavailable the
+update is written directly.
+
+USAGE:
+  from app.database.status_writer import status_writer
+
+  status_writer.update(source_id, status="PROCESSING")
+  status_writer.update(source_id, status="COMPLETED", gemini_document_name=doc)
+  status_writer.flush()          # optional — the drain thread does it
+"""
+import atexit
+import json
+import os
+import threading
+import uuid
+
+from celery.signals import worker_process_shutdown
+
+from app.database.redis_client import get_redis
+from app.database.supabase_client import supabase
+from app.logging_config import error_logger
+
+STATUS_WRITER_FLUSH_MS = int(os.getenv("STATUS_WRITER_FLUSH_MS", "500"))
+STATUS_WRITER_MAX_ROWS = int(os.getenv("STATUS_WRITER_MAX_ROWS", "200"))
+
+_PENDING_KEY = "source_status:pending"
+_INFLIGHT_KEY = "source_status:inflight"
+_LOCK_KEY = "source_status:drain_lock"
+_TICK_KEY = "source_status:drain_tick"
+# Longer than any drain takes; frees the lock if a drainer dies holding it
+_LOCK_SECONDS = 30
+
+# Merges ARGV[2] (JSON object) into the queued fields of source ARGV[1]
+_UPDATE_SCRIPT = """
+local queued = redis.call('hget', KEYS[1], ARGV[1])
+local fields = queued and cjson.decode(queued) or {}
+for k, v in pairs(cjson.decode(ARGV[2])) do
+    fields[k] = v
+end
+redis.call('hset', KEYS[1], ARGV[1], cjson.encode(fields))
+return 1
+"""
+
+# The batch to write: one a crashed drain left behind, else everything pending
+_TAKE_SCRIPT = """
+if redis.call('exists', KEYS[2]) == 0 then
+    if redis.call('exists', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('rename', KEYS[1], KEYS[2])
+end
+return redis.call('hgetall', KEYS[2])
+"""
+
+# Puts a failed batch back; fields queued since then win
+_RESTORE_SCRIPT = """
+local batch = redis.call('hgetall', KEYS[2])
+for i = 1, #batch, 2 do
+    local fields = cjson.decode(batch[i + 1])
+    local queued = redis.call('hget', KEYS[1], batch[i])
+    if queued then
+        for k, v in pairs(cjson.decode(queued)) do
+            fields[k] = v
+        end
+    end
+    redis.call('hset', KEYS[1], batch[i], cjson.encode(fields))
+end
+return redis.call('del', KEYS[2])
+"""
+
+# Deletes the lock only if it still holds this drainer's token
+_UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _write(rows: list[dict]) -> int:
+    """Applies one batch of merged source updates. Returns the rows updated."""
+    return supabase.rpc("update_tenant_sources", {"p_rows": rows}).execute().data or 0
+
+
+class StatusWriter:
+    def __init__(self, flush_ms: int = STATUS_WRITER_FLUSH_MS, max_rows: int = STATUS_WRITER_MAX_ROWS):
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self._reset()
+
+    def _reset(self) -> None:
+        # Also run in a forked child: the thread does not survive fork
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def update(self, source_id: int, **fields) -> None:
+        """Queues field updates for one source. Never raises."""
+        if self._pid != os.getpid():
+            self._reset()
+        try:
+            get_redis().eval(_UPDATE_SCRIPT, 1, _PENDING_KEY, int(source_id), json.dumps(fields, default=str))
+        except Exception as e:
+            error_logger.warning("status_writer: queueing source %s failed, writing directly: %s", source_id, e)
+            try:
+                _write([{"id": int(source_id), **fields}])
+            except Exception as write_error:
+                error_logger.error("status_writer: direct write for source %s failed: %s", source_id, write_error)
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> int:
+        """Writes everything queued by any process. Returns the rows updated; never raises."""
+        token = uuid.uuid4().hex
+        try:
+            r = get_redis()
+            if not r.set(_LOCK_KEY, token, nx=True, ex=_LOCK_SECONDS):
+                return 0  # another process is draining
+        except Exception as e:
+            error_logger.warning("status_writer: drain lock failed: %s", e)
+            return 0
+        try:
+            raw = r.eval(_TAKE_SCRIPT, 2, _PENDING_KEY, _INFLIGHT_KEY)
+            batch = {int(raw[i]): json.loads(raw[i + 1]) for i in range(0, len(raw), 2)}
+            if not batch:
+                return 0
+            rows = [{"id": source_id, **fields} for source_id, fields in sorted(batch.items())]
+            updated = 0
+            try:
+                for start in range(0, len(rows), self.max_rows):
+                    updated += _write(rows[start:start + self.max_rows])
+            except Exception as e:
+                error_logger.warning("status_writer: flush of %d source(s) failed, will retry: %s", len(rows), e)
+                r.eval(_RESTORE_SCRIPT, 2, _PENDING_KEY, _INFLIGHT_KEY)
+                return 0
+            r.delete(_INFLIGHT_KEY)
+            return updated
+        except Exception as e:
+            error_logger.warning("status_writer: drain failed: %s", e)
+            return 0
+        finally:
+            try:
+                r.eval(_UNLOCK_SCRIPT, 1, _LOCK_KEY, token)
+            except Exception:
+                pass  # expires after _LOCK_SECONDS
+
+    def _due(self) -> bool:
+        """True for the first process to ask in each STATUS_WRITER_FLUSH_MS window."""
+        try:
+            return bool(get_redis().set(_TICK_KEY, self._pid, nx=True, px=self.flush_ms))
+        except Exception:
+            return False
+
+    def _run(self) -> None:
+        while True:
+            threading.Event().wait(self.flush_ms / 1000)
+            if self._due():
+                self.flush()
+
+
+status_writer = StatusWriter()
+
+
+@worker_process_shutdown.connect
+def _flush_on_shutdown(**_kwargs):
+    # Whatever is left stays queued in Redis for the other processes
+    if status_writer._thread is not None:
+        status_writer.flush()
+
+
+atexit.register(_flush_on_shutdown)
@@ -1,4 +1,6 @@
 import os
+import time
+from contextvars import ContextVar
 import httpx
 from supabase import create_client, Client
 from supabase.lib.client_options import ClientOptions
@@ -9,6 +11,43 @@ load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_SERVICE_KEY")
 
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "10"))
+SUPABASE_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_MAX_KEEPALIVE", "5"))
+
+# Per-request count of Supabase HTTP calls and the time spent waiting for
+# their responses. None outside a counted scope; the API starts a count per
+# request and logs it (see app/__init__.py), the crawler one per page.
+_query_count: ContextVar[list | None] = ContextVar("supabase_query_count", default=None)
+
+
+def start_query_count() -> None:
+    _query_count.set([0, 0.0])
+
+
+def query_count() -> int | None:
+    counter = _query_count.get()
+    return counter[0] if counter is not None else None
+
+
+def query_time_ms() -> int | None:
+    counter = _query_count.get()
+    return int(counter[1] * 1000) if counter is not None else None
+
+
+def _count_query(request) -> None:
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+        request.extensions["query_started"] = time.monotonic()
+
+
+def _time_query(response) -> None:
+    counter = _query_count.get()
+    started = response.request.extensions.get("query_started")
+    if counter is not None and started is not None:
+        counter[1] += time.monotonic() - started
+
+
 if not url or not key:
     raise EnvironmentError("Supabase URL and Service Key must be set in the environment variables.")
 
@@ -23,12 +62,18 @@ supabase: Client = create_client(
             # Short connect timeout — fail fast on stalled TCP handshakes
             # (common when ForkPoolWorkers inherit a shared connection pool)
             timeout=httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0),
-            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            # Thread-pool workers (worker_chat) share this client across many
+            # threads and raise the pool size via env
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+            ),
+            event_hooks={"request": [_count_query], "response": [_time_query]},
         ),
         postgrest_client_timeout=30,
         storage_client_timeout=30,
     ),
 )
 
-__all__ = ['supabase']
+__all__ = ['supabase', 'start_query_count', 'query_count', 'query_time_ms']
 
@@ -44,6 +44,14 @@ class TenantFineTune(BaseModel):
     tenant_id: UUID
     trigger: str
     instruction: str
+    always_on: bool = False  # injected on every turn, bypassing relevance selection
+
+
+class TenantFaq(BaseModel):
+    id: Optional[int] = None
+    tenant_id: UUID
+    question: str
+    answer: str  # returned verbatim by the chat FAQ fast-path
 
 
 class TenantSource(BaseModel):
@@ -54,6 +62,7 @@ class TenantSource(BaseModel):
     status: SourceStatus
     status_code: Optional[int] = None
     gemini_document_name: Optional[str] = None  # File Search doc resource name (for deletion)
+    job_id: Optional[int] = None  # crawl job that produced the source
     created_at: Optional[str] = None
 
 
@@ -69,7 +78,11 @@ class Tenant(BaseModel):
     widget_config: Optional[dict] = None
     crawl_mode: CrawlMode = CrawlMode.PLAYWRIGHT_LLM
     gemini_file_store_name: Optional[str] = None  # Gemini File Search Store resource name
+    answer_cache_enabled: bool = False  # serve repeated first-turn questions from cache
+    knowledge_version: int = 0  # bumped by DB trigger whenever indexed knowledge changes
+    latency_profile: dict = {"name": "balanced"}  # chat speed/depth preset, see worker_chat latency_profiles
     fine_tune_rules: List[TenantFineTune] = []
+    faqs: List[TenantFaq] = []
     sources: List[TenantSource] = []
 
 
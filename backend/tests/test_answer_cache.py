@@ -0,0 +1,132 @@
+"""
+Tests for worker_chat's per-tenant answer cache.
+
+The cache runs on fakeredis. answer_cache.py is loaded straight from the
+worker source tree (see test_rule_index.py); its one worker-only import,
+app.chat.rule_index, is provided the same way while it loads.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+_CHAT = Path(__file__).parent.parent / "services" / "worker_chat" / "app" / "chat"
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_rule_index = _load("worker_chat_rule_index", _CHAT / "rule_index.py")
+_saved = sys.modules.get("app.chat.rule_index")
+sys.modules["app.chat.rule_index"] = _rule_index
+try:
+    answer_cache = _load("worker_chat_answer_cache", _CHAT / "answer_cache.py")
+finally:
+    if _saved is None:
+        sys.modules.pop("app.chat.rule_index", None)
+    else:
+        sys.modules["app.chat.rule_index"] = _saved
+
+TENANT = "tenant-1"
+CONFIG = {
+    "rag_prompt_template": "Answer from the documents.",
+    "system_persona": "Friendly",
+    "translation_target": "de",
+    "gemini_file_store_name": "stores/acme",
+    "latency_profile": {"name": "balanced"},
+    "knowledge_version": 3,
+}
+RULES = [{"id": 1, "trigger": "opening hours", "instruction": "mention holidays"}]
+
+
+@pytest.fixture
+def r(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(answer_cache, "get_redis", lambda: client)
+    return client
+
+
+def test_trivial_query_variants_share_a_key():
+    key = answer_cache.cache_key(CONFIG, RULES, "Öffnungszeiten?")
+    assert answer_cache.cache_key(CONFIG, RULES, "  öffnungszeiten ") == key
+    assert answer_cache.cache_key(CONFIG, RULES, "Oeffnungszeiten am Samstag") != key
+
+
+def test_config_knowledge_and_rule_changes_invalidate_the_key():
+    key = answer_cache.cache_key(CONFIG, RULES, "opening hours")
+    changed = (
+        ({**CONFIG, "system_persona": "Formal"}, RULES),
+        ({**CONFIG, "translation_target": "fr"}, RULES),
+        ({**CONFIG, "knowledge_version": 4}, RULES),
+        ({**CONFIG, "latency_profile": {"name": "fast"}}, RULES),
+        (CONFIG, RULES + [{"id": 2, "trigger": "prices", "instruction": "link the list"}]),
+    )
+    for config, rules in changed:
+        assert answer_cache.cache_key(config, rules, "opening hours") != key
+    # Fields that do not shape the answer leave it alone
+    assert answer_cache.cache_key({**CONFIG, "name": "Renamed"}, RULES, "opening hours") == key
+
+
+def test_only_first_turns_are_history_independent():
+    assert answer_cache.is_history_independent([])
+    assert answer_cache.is_history_independent([{"type": "ai", "content": "Hi! How can I help?"}])
+    assert not answer_cache.is_history_independent([
+        {"type": "ai", "content": "Hi!"}, {"type": "human", "content": "prices"},
+    ])
+
+
+def test_stored_answers_are_served_until_they_expire(r):
+    digest = answer_cache.cache_key(CONFIG, RULES, "opening hours")
+    assert answer_cache.get_cached_answer(TENANT, digest) is None
+
+    answer_cache.store_answer(TENANT, digest, "8 to 18", [{"title": "hours.pdf"}])
+    assert answer_cache.get_cached_answer(TENANT, digest) == {
+        "answer": "8 to 18", "citations": [{"title": "hours.pdf"}],
+    }
+    assert 0 < r.ttl(f"answer_cache:{TENANT}:{digest}") <= answer_cache.ANSWER_CACHE_TTL_SECONDS
+
+    r.delete(f"answer_cache:{TENANT}:{digest}")     # what the TTL does
+    assert answer_cache.get_cached_answer(TENANT, digest) is None
+
+
+def test_least_recently_used_entries_are_evicted_past_the_cap(r, monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_MAX_ENTRIES", 2)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+
+    for digest in ("a", "b"):
+        answer_cache.store_answer(TENANT, digest, digest, [])
+        clock[0] += 1
+    answer_cache.get_cached_answer(TENANT, "a")     # "b" is now the least recently used
+    clock[0] += 1
+    answer_cache.store_answer(TENANT, "c", "c", [])
+
+    assert answer_cache.get_cached_answer(TENANT, "b") is None
+    assert answer_cache.get_cached_answer(TENANT, "a")["answer"] == "a"
+    assert answer_cache.get_cached_answer(TENANT, "c")["answer"] == "c"
+
+
+def test_expired_entries_leave_the_lru_index(r, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    answer_cache.store_answer(TENANT, "old", "old", [])
+    clock[0] += answer_cache.ANSWER_CACHE_TTL_SECONDS + 1
+    answer_cache.store_answer(TENANT, "new", "new", [])
+    assert r.zrange(f"answer_cache:{TENANT}:lru", 0, -1) == ["new"]
+
+
+def test_redis_errors_are_cache_misses(monkeypatch):
+    def broken():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(answer_cache, "get_redis", broken)
+    assert answer_cache.get_cached_answer(TENANT, "a") is None
+    answer_cache.store_answer(TENANT, "a", "a", [])   # must not raise
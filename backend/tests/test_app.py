@@ -11,3 +11,13 @@ def test_blueprints_registered(app):
     blueprint_names = list(app.blueprints.keys())
     for expected in ['auth', 'tenants', 'sources', 'widget', 'chat', 'billing']:
         assert expected in blueprint_names, f"Blueprint '{expected}' not registered"
+
+
+def test_tenant_metrics_require_a_token(app):
+    """Per-tenant metrics are for the tenant's owner, not the public widget."""
+    tenant_id = "00000000-0000-0000-0000-000000000001"
+    for endpoint in ("chat.get_chat_latency", "chat.get_chat_analytics", "chat.get_conversations"):
+        # Called directly: the test client would go through the Redis-backed limiter
+        with app.test_request_context():
+            _, status = app.view_functions[endpoint](tenant_id=tenant_id)
+        assert status == 401, endpoint
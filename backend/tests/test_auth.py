@@ -0,0 +1,59 @@
+"""
+Tests for local access-token verification used by token_required.
+"""
+import time
+
+import jwt
+import pytest
+
+from app.auth import tokens
+
+SECRET = "test-jwt-secret-that-is-long-enough-for-hs256"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_SECRET", SECRET)
+    tokens._user_cache.clear()
+
+
+def _token(secret=SECRET, **claims):
+    payload = {
+        "sub": "8d0b7c8e-0000-4000-8000-000000000001",
+        "email": "owner@example.com",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        "user_metadata": {"first_name": "Ada"},
+        **claims,
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def test_valid_token_is_verified_locally_and_cached(monkeypatch):
+    token = _token()
+    user = tokens.authenticate(token)
+    assert user.id.endswith("0001") and user.email == "owner@example.com"
+    assert user.user_metadata == {"first_name": "Ada"}
+
+    # A cached token never reaches the verifier again
+    monkeypatch.setattr(tokens, "decode_token", lambda _: pytest.fail("not cached"))
+    assert tokens.authenticate(token) is user
+
+
+def test_rejects_expired_tampered_and_foreign_tokens():
+    with pytest.raises(jwt.ExpiredSignatureError):
+        tokens.authenticate(_token(exp=int(time.time()) - 60))
+    with pytest.raises(jwt.InvalidSignatureError):
+        tokens.authenticate(_token(secret="another-secret-that-is-long-enough-too"))
+    with pytest.raises(jwt.InvalidAudienceError):
+        tokens.authenticate(_token(aud="anon"))
+
+
+def test_without_secret_falls_back_to_supabase_auth(monkeypatch):
+    monkeypatch.setattr(tokens, "SUPABASE_JWT_SECRET", None)
+    calls = []
+    monkeypatch.setattr(tokens, "fetch_user", lambda token: calls.append(token) or "remote-user")
+    token = _token()
+    assert tokens.authenticate(token) == "remote-user"
+    assert tokens.authenticate(token) == "remote-user"
+    assert len(calls) == 1
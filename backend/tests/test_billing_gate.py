@@ -0,0 +1,116 @@
+"""
+Tests for the chat balance gate's Redis scripts (reserve, charge, release).
+
+The scripts run for real on fakeredis's Lua engine (pip install
+"fakeredis[lua]"); Supabase is stubbed through the gate's _load_* helpers.
+worker_chat's gate is loaded straight from the worker source tree (see
+test_rule_index.py).
+"""
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.billing import gate as api_gate  # noqa: E402
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "billing" / "gate.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_gate", _PATH)
+worker_gate = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(worker_gate)
+
+TENANT = "00000000-0000-0000-0000-000000000001"
+USER = "user-1"
+
+
+@pytest.fixture
+def r(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(api_gate, "get_redis", lambda: client)
+    monkeypatch.setattr(worker_gate, "get_redis", lambda: client)
+    monkeypatch.setattr(api_gate, "_load_owner", lambda tenant_id: USER)
+    monkeypatch.setattr(api_gate, "CHAT_RESERVATION_CHF", 0.05)
+    return client
+
+
+RESERVATIONS = f"billing:reservations:{USER}"
+AMOUNTS = f"billing:reservation_amounts:{USER}"
+
+
+def _reserved(r):
+    return sum(float(v) for v in r.hvals(AMOUNTS))
+
+
+def test_turns_are_admitted_until_reservations_use_up_the_balance(r, monkeypatch):
+    monkeypatch.setattr(api_gate, "_load_balance", lambda user_id: 0.08)
+
+    assert api_gate.reserve_turn(TENANT, "t1") == (USER, 0.05)   # cache miss: balance read once
+    assert api_gate.reserve_turn(TENANT, "t2") == (USER, 0.05)   # 0.08 - 0.05 left
+    with pytest.raises(api_gate.InsufficientBalance):
+        api_gate.reserve_turn(TENANT, "t3")                      # 0.08 - 0.10 left
+    assert _reserved(r) == pytest.approx(0.10)
+    assert sorted(r.zrange(RESERVATIONS, 0, -1)) == ["t1", "t2"]
+
+
+def test_empty_balance_is_refused(r, monkeypatch):
+    monkeypatch.setattr(api_gate, "_load_balance", lambda user_id: 0.0)
+    with pytest.raises(api_gate.InsufficientBalance):
+        api_gate.reserve_turn(TENANT, "t1")
+    assert not r.exists(RESERVATIONS, AMOUNTS)
+
+
+def test_leaked_reservations_expire_despite_steady_traffic(r, monkeypatch):
+    monkeypatch.setattr(api_gate, "_load_balance", lambda user_id: 0.08)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(api_gate, "time", SimpleNamespace(time=lambda: clock[0]))
+
+    api_gate.reserve_turn(TENANT, "leaked-1")
+    clock[0] += 200
+    api_gate.reserve_turn(TENANT, "leaked-2")       # never settled either
+    clock[0] += api_gate._RESERVATION_TTL_SECONDS - 100
+
+    # leaked-1 is past its own expiry even though the keys were refreshed since
+    assert api_gate.reserve_turn(TENANT, "t3") == (USER, 0.05)
+    assert sorted(r.hkeys(AMOUNTS)) == ["leaked-2", "t3"]
+
+
+def test_failed_dispatch_releases_the_reservation(r, monkeypatch):
+    monkeypatch.setattr(api_gate, "_load_balance", lambda user_id: 1.0)
+    api_gate.reserve_turn(TENANT, "t1")
+    api_gate.release_turn(USER, "t1")
+    assert _reserved(r) == 0
+    assert r.zcard(RESERVATIONS) == 0
+
+
+def test_charge_updates_a_cached_balance_but_never_recreates_an_expired_one(r):
+    worker_gate.charge(USER, 0.5)
+    assert r.get(f"billing:balance:{USER}") is None
+
+    r.set(f"billing:balance:{USER}", 2.0, ex=30)
+    worker_gate.charge(USER, 0.5)
+    assert float(r.get(f"billing:balance:{USER}")) == pytest.approx(1.5)
+    assert r.ttl(f"billing:balance:{USER}") > 0
+
+
+def test_release_of_an_expired_reservation_changes_nothing(r):
+    worker_gate.release(USER, 0.05, "gone")
+    assert not r.exists(RESERVATIONS, AMOUNTS)
+
+
+def test_double_release_of_a_turn_keeps_other_turns_reserved(r, monkeypatch):
+    monkeypatch.setattr(api_gate, "_load_balance", lambda user_id: 1.0)
+    api_gate.reserve_turn(TENANT, "task-a")
+    api_gate.reserve_turn(TENANT, "task-b")           # two turns in flight
+
+    worker_gate.release(USER, 0.05, "task-a")
+    worker_gate.release(USER, 0.05, "task-a")         # redelivered task settles again
+    assert _reserved(r) == pytest.approx(0.05)
+
+    worker_gate.release(USER, 0.05, "task-b")
+    assert _reserved(r) == 0
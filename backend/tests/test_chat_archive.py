@@ -0,0 +1,38 @@
+"""
+Tests for the chat_logs archive files (app/database/chat_archive.py).
+"""
+from datetime import date
+
+import pytest
+
+from app.database import chat_archive
+
+MONTH = date(2025, 11, 1)
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_archive, "ARCHIVE_DIR", str(tmp_path))
+
+
+def _rows(n):
+    return [
+        {"id": i, "tenant_id": f"tenant-{i % 2}", "conversation_id": f"conv-{i % 3}",
+         "user_message": f"question {i}", "created_at": f"2025-11-{i + 1:02d}T10:00:00+00:00"}
+        for i in range(n)
+    ]
+
+
+def test_month_round_trips_per_tenant():
+    assert chat_archive.write_month(MONTH, iter(_rows(12))) == 12
+    assert sorted(r["id"] for r in chat_archive.read_month(MONTH)) == list(range(12))
+
+    rows = chat_archive.read_conversation(MONTH, "tenant-0", "conv-0")
+    assert [r["id"] for r in rows] == [0, 6]
+    assert chat_archive.read_conversation(MONTH, "tenant-9", "conv-0") == []
+
+
+def test_rewriting_a_month_replaces_its_archive():
+    chat_archive.write_month(MONTH, iter(_rows(12)))
+    chat_archive.write_month(MONTH, iter(_rows(2)))
+    assert sorted(r["id"] for r in chat_archive.read_month(MONTH)) == [0, 1]
@@ -0,0 +1,60 @@
+"""
+Tests for the streamed chat log export (app/chat/export.py).
+"""
+import json
+import zlib
+from datetime import date
+
+import pytest
+
+from app.chat import export
+from app.database import chat_archive
+
+TENANT = "tenant-0"
+
+
+def _row(i, month):
+    return {"id": i, "tenant_id": TENANT, "conversation_id": "conv-0",
+            "user_message": f"question {i}", "created_at": f"2025-{month:02d}-{i:02d}T10:00:00+00:00"}
+
+
+@pytest.fixture(autouse=True)
+def history(tmp_path, monkeypatch):
+    """November archived, December in the table."""
+    monkeypatch.setattr(chat_archive, "ARCHIVE_DIR", str(tmp_path))
+    chat_archive.write_month(date(2025, 11, 1), iter([_row(i, 11) for i in range(1, 4)]))
+    monkeypatch.setattr(export, "archived_month_set", lambda: frozenset({date(2025, 11, 1)}))
+
+    hot = [_row(i, 12) for i in range(4, 7)]
+
+    def iter_tenant_rows(tenant_id, start=None, end=None, after=None):
+        return iter([
+            r for r in hot
+            if (not end or r["created_at"] < end) and (not after or (r["created_at"], r["id"]) > after)
+        ])
+
+    monkeypatch.setattr(chat_archive, "iter_tenant_rows", iter_tenant_rows)
+
+
+def _ndjson(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+def test_export_spans_archive_and_table_and_resumes():
+    records = _ndjson(b"".join(export.iter_export(TENANT, "ndjson")))
+    assert [r["id"] for r in records] == [1, 2, 3, 4, 5, 6]
+
+    after = export.decode_cursor(records[1]["cursor"])
+    resumed = _ndjson(b"".join(export.iter_export(TENANT, "ndjson", after=after)))
+    assert [r["id"] for r in resumed] == [3, 4, 5, 6]
+
+    start = export.parse_bound("2025-11-02")
+    end = export.parse_bound("2025-11-03")
+    assert [r["id"] for r in _ndjson(b"".join(export.iter_export(TENANT, "ndjson", start, end)))] == [2]
+
+
+def test_csv_export_is_gzipped():
+    data = zlib.decompress(b"".join(export.iter_export(TENANT, "csv", compress=True)), 31).decode()
+    lines = data.splitlines()
+    assert lines[0].split(",") == export.EXPORT_COLUMNS
+    assert len(lines) == 7
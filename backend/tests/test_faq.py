@@ -0,0 +1,31 @@
+"""
+Tests for the curated FAQ matcher used by handle_chat's fast-path.
+"""
+from app.chat.faq import FaqIndex
+
+FAQS = [
+    {"id": 1, "question": "What are your opening hours?", "answer": "Mon–Fri 8–17."},
+    {"id": 2, "question": "How can I contact support?", "answer": "support@example.com"},
+    {"id": 3, "question": "Où se trouve votre bureau ?", "answer": "À Lausanne."},
+]
+
+
+def test_exact_match_after_normalization():
+    faq, score = FaqIndex(FAQS).match("what are your OPENING hours")
+    assert faq["id"] == 1 and score == 1.0
+
+
+def test_tolerates_typos_and_accents():
+    faq, _ = FaqIndex(FAQS).match("ou se trouve votre bureau")
+    assert faq["id"] == 3
+    faq, _ = FaqIndex(FAQS).match("what are your openning hours")
+    assert faq["id"] == 1
+
+
+def test_unrelated_question_misses():
+    faq, score = FaqIndex(FAQS).match("Do you ship to Germany?")
+    assert faq is None and score < 0.82
+
+
+def test_empty_index_misses():
+    assert FaqIndex([]).match("What are your opening hours?") == (None, 0.0)
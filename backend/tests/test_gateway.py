@@ -0,0 +1,66 @@
+"""
+Tests for the async gateway serving the public widget endpoints.
+"""
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.gateway import create_gateway, progress
+from app.gateway.routes import _status_response
+from app.tenants import bootstrap
+
+TENANT = "11111111-1111-4111-8111-111111111111"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    config = {"name": "Acme", "intro_message": "Hi!", "widget_config": {}}
+    monkeypatch.setitem(bootstrap._cache, TENANT, (float("inf"), config, "etag123"))
+    # Without the context manager no lifespan runs, so no Redis is needed
+    return TestClient(create_gateway())
+
+
+def test_public_config_routes_share_the_cached_config(client):
+    assert client.get(f"/api/chat/{TENANT}/intro").json() == {"intro_message": "Hi!"}
+    assert client.get(f"/api/tenants/{TENANT}/public").json()["name"] == "Acme"
+
+    response = client.get(f"/api/tenants/{TENANT}/bootstrap")
+    assert response.status_code == 200 and response.headers["etag"] == '"etag123"'
+    revalidated = client.get(f"/api/tenants/{TENANT}/bootstrap", headers={"If-None-Match": '"etag123"'})
+    assert revalidated.status_code == 304
+
+
+def test_status_body_matches_flask_long_poll():
+    assert _status_response("t1", None) == {"task_id": "t1", "state": "PENDING", "result": "None"}
+    success = _status_response("t1", {"status": "SUCCESS", "result": {"answer": "42"}})
+    assert success["result"] == {"answer": "42"}
+    failure = {"status": "FAILURE", "result": {"exc_type": "ValueError", "exc_message": ["boom"]}}
+    assert _status_response("t1", failure)["result"] == "boom"
+
+
+def _progress_row(job_id, status, completed):
+    return {"job_id": job_id, "status": status, "pending": 1, "in_progress": 0, "completed": completed,
+            "failed": 0, "version": completed, "sources_completed": completed, "sources_error": 0}
+
+
+def test_crawl_progress_hub_pushes_changed_jobs_only(monkeypatch):
+    polls = iter([
+        [_progress_row(1, "IN_PROGRESS", 1), _progress_row(2, "IN_PROGRESS", 5)],
+        [_progress_row(1, "IN_PROGRESS", 2), _progress_row(2, "IN_PROGRESS", 5)],
+    ])
+    monkeypatch.setattr(progress, "_fetch", lambda tenant_id: next(polls, []))
+    monkeypatch.setattr(progress, "CRAWL_PROGRESS_INTERVAL", 0.01)
+
+    async def run():
+        hub = progress.CrawlProgressHub()
+        subscriber = hub.subscribe(TENANT)
+        first = await subscriber.next(1)
+        second = await subscriber.next(1)
+        hub.unsubscribe(TENANT, subscriber)
+        await hub.stop()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert sorted(s["job_id"] for s in first) == [1, 2]
+    assert [(s["job_id"], s["progress"]["completed"]) for s in second] == [(1, 2)]
@@ -0,0 +1,85 @@
+"""
+Tests for worker_chat's deadline-aware hedged generation, using a stub client.
+
+hedging.py has no app imports, so it is loaded straight from the worker
+source tree (see test_rule_index.py).
+"""
+import asyncio
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "chat" / "hedging.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_hedging", _PATH)
+hedging = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(hedging)
+
+
+class StubModels:
+    """Per-model behaviour: (first_token_delay, total_delay, error)."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = []
+
+    async def generate_content_stream(self, model, contents, config):
+        self.calls.append(model)
+        first, total, error = self.behaviour[model]
+
+        async def _stream():
+            await asyncio.sleep(first)
+            if error:
+                raise error
+            yield SimpleNamespace(text=f"{model} ", usage_metadata=None, candidates=[])
+            await asyncio.sleep(max(0.0, total - first))
+            yield SimpleNamespace(text="answer", usage_metadata="usage", candidates=[])
+        return _stream()
+
+    async def generate_content(self, model, contents, config):
+        self.calls.append(model)
+        _, total, error = self.behaviour[model]
+        await asyncio.sleep(total)
+        if error:
+            raise error
+        return SimpleNamespace(text=f"{model} answer")
+
+
+def _run(behaviour, **kwargs):
+    models = StubModels(behaviour)
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    params = dict(model="primary", contents=[], config={}, deadline=1.0,
+                  fallback_model="fallback", hedge_delay=0.1)
+    params.update(kwargs)
+    return asyncio.run(hedging.hedged_generate(client, **params)), models.calls
+
+
+def test_fast_primary_is_not_hedged():
+    result, calls = _run({"primary": (0.01, 0.05, None), "fallback": (0, 0.01, None)})
+    assert (result.model, result.hedged, calls) == ("primary", False, ["primary"])
+    assert result.response.text == "primary answer"
+    assert result.response.usage_metadata == "usage"
+
+
+def test_slow_first_token_hedges_to_fallback():
+    result, calls = _run({"primary": (0.5, 0.6, None), "fallback": (0, 0.05, None)})
+    assert (result.model, result.hedged, calls) == ("fallback", True, ["primary", "fallback"])
+
+
+def test_primary_error_goes_straight_to_fallback():
+    result, _ = _run({"primary": (0.01, 0.01, RuntimeError("503")), "fallback": (0, 0.01, None)})
+    assert result.model == "fallback"
+
+
+def test_deadline_bounds_the_turn():
+    with pytest.raises(hedging.DeadlineExceeded):
+        _run({"primary": (1.0, 2.0, None), "fallback": (0, 1.0, None)}, deadline=0.2)
+
+
+def test_without_fallback_errors_propagate():
+    with pytest.raises(RuntimeError):
+        _run({"primary": (0.01, 0.01, RuntimeError("503"))}, fallback_model=None)
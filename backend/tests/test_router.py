@@ -0,0 +1,68 @@
+"""
+Tests for worker_chat's local query router.
+
+router.py has no app imports, so it is loaded straight from the worker
+source tree (see test_rule_index.py).
+"""
+import importlib.util
+from pathlib import Path
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "chat" / "router.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_router", _PATH)
+router = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(router)
+
+INTRO = "Hi! I'm the assistant of ACME. How can I help?"
+
+
+def test_bare_greetings_get_the_intro_message():
+    for query in ("Hello!", "hi there", "Grüezi", "Bonjour", "Guten Tag"):
+        assert router.route_query(query, INTRO)[0] == router.ROUTE_CANNED, query
+
+
+def test_greeting_without_intro_falls_back_to_smalltalk():
+    assert router.route_query("hello", "")[0] == router.ROUTE_SMALLTALK
+
+
+def test_thanks_and_goodbyes_are_smalltalk():
+    for query in ("Thank you very much!", "Vielen Dank", "merci beaucoup", "cheers, bye", "Ça va ?"):
+        assert router.route_query(query, INTRO)[0] == router.ROUTE_SMALLTALK, query
+
+
+def test_any_content_word_keeps_the_rag_path():
+    for query in ("Hello, what are your prices?", "thanks, and the opening hours?", "who are you"):
+        assert router.route_query(query, INTRO)[0] == router.ROUTE_RAG, query
+
+
+def test_long_messages_are_always_rag():
+    query = "hello hello hello thanks thanks thanks bye"
+    assert router.route_query(query, INTRO) == (router.ROUTE_RAG, "long")
+
+
+def test_answer_and_question_words_keep_the_rag_path():
+    for query in ("yes", "No.", "ok, how?", "how is it?", "is it?", "ja", "oui", "sì"):
+        assert router.route_query(query, INTRO)[0] == router.ROUTE_RAG, query
+
+
+def test_reply_to_an_assistant_question_is_rag():
+    history = [
+        {"type": "ai", "content": INTRO},
+        {"type": "human", "content": "What do you offer?"},
+        {"type": "ai", "content": "We have three plans. Shall I explain the pricing tiers?"},
+    ]
+    for query in ("thanks", "great", "hi"):
+        assert router.route_query(query, INTRO, history) == (router.ROUTE_RAG, "follow-up"), query
+
+
+def test_mid_conversation_greeting_is_smalltalk_not_the_intro():
+    history = [
+        {"type": "ai", "content": INTRO},
+        {"type": "human", "content": "What are your opening hours?"},
+        {"type": "ai", "content": "We are open Monday to Friday, 8:00 to 18:00."},
+    ]
+    assert router.route_query("hi", INTRO, history)[0] == router.ROUTE_SMALLTALK
+    # The intro message alone does not count as an assistant turn
+    assert router.route_query("hi", INTRO, history[:1])[0] == router.ROUTE_CANNED
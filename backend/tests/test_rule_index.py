@@ -0,0 +1,59 @@
+"""
+Tests for worker_chat's fine-tune rule relevance index.
+
+rule_index.py has no app imports, so it is loaded straight from the worker
+source tree (the API's `app` package is the one on sys.path during tests).
+"""
+import importlib.util
+from pathlib import Path
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "chat" / "rule_index.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_rule_index", _PATH)
+rule_index = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(rule_index)
+
+
+def _rules(n):
+    rules = [
+        {"id": i, "trigger": f"filler topic number {i}", "instruction": f"do {i}"}
+        for i in range(n)
+    ]
+    rules.append({"id": 100, "trigger": "opening hours", "instruction": "mention holidays"})
+    rules.append({"id": 101, "trigger": "pricing", "instruction": "link the price list"})
+    return rules
+
+
+def test_small_rule_sets_are_injected_whole():
+    rules = _rules(3)
+    assert rule_index.RuleIndex(rules).select("anything", top_k=8) == rules
+
+
+def test_selects_relevant_rules_only():
+    selected = rule_index.RuleIndex(_rules(20)).select("What are your opening hours?", top_k=3)
+    assert [r["id"] for r in selected] == [100]
+
+
+def test_trigram_matching_tolerates_inflection_and_accents():
+    rules = _rules(20) + [{"id": 102, "trigger": "Öffnungszeiten", "instruction": "x"}]
+    selected = rule_index.RuleIndex(rules).select("Wann sind die oeffnungszeit?", top_k=3)
+    assert 102 in [r["id"] for r in selected]
+
+
+def test_always_on_rules_are_always_included():
+    rules = _rules(20)
+    rules.append({"id": 200, "trigger": "tone", "instruction": "be formal", "always_on": True})
+    selected = rule_index.RuleIndex(rules).select("pricing please", top_k=2)
+    ids = [r["id"] for r in selected]
+    assert 200 in ids and 101 in ids
+
+
+def test_index_is_rebuilt_only_when_rules_change():
+    rules = _rules(20)
+    first = rule_index.get_rule_index("tenant-a", rules)
+    assert rule_index.get_rule_index("tenant-a", list(rules)) is first
+
+    changed = rules + [{"id": 300, "trigger": "new", "instruction": "rule"}]
+    assert rule_index.get_rule_index("tenant-a", changed) is not first
@@ -0,0 +1,71 @@
+"""
+Tests for worker_chat's single-flight coalescing of identical chat turns.
+
+The locks run on fakeredis (pip install "fakeredis[lua]"). single_flight.py
+is loaded straight from the worker source tree (see test_rule_index.py).
+"""
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "chat" / "single_flight.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_single_flight", _PATH)
+single_flight = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(single_flight)
+
+TENANT = "tenant-1"
+DIGEST = "digest-1"
+RESULT = {"answer": "We open at 8.", "citations": [], "model": "m", "input_tokens": 1, "output_tokens": 2}
+
+
+@pytest.fixture(autouse=True)
+def r(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(single_flight, "get_redis", lambda: client)
+    monkeypatch.setattr(single_flight, "_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(single_flight, "_STOP_CHECK_INTERVAL", 0.0)
+    return client
+
+
+def test_only_one_leader_and_publish_hands_over_the_result():
+    token = single_flight.acquire(TENANT, DIGEST)
+    assert token
+    assert single_flight.acquire(TENANT, DIGEST) is None
+
+    single_flight.publish(TENANT, DIGEST, token, RESULT)
+    assert single_flight.wait_for_result(TENANT, DIGEST, timeout=1) == RESULT
+    assert single_flight.acquire(TENANT, DIGEST)      # lock released with the result
+
+
+def test_follower_attaches_to_a_running_leader():
+    token = single_flight.acquire(TENANT, DIGEST)
+    leader = threading.Timer(0.1, single_flight.publish, (TENANT, DIGEST, token, RESULT))
+    leader.start()
+    try:
+        assert single_flight.wait_for_result(TENANT, DIGEST, timeout=5) == RESULT
+    finally:
+        leader.join()
+
+
+def test_follower_falls_through_when_the_leader_is_gone():
+    token = single_flight.acquire(TENANT, DIGEST)
+    single_flight.release(TENANT, DIGEST, token)
+    started = time.monotonic()
+    assert single_flight.wait_for_result(TENANT, DIGEST, timeout=5) is None
+    assert time.monotonic() - started < 1
+
+
+def test_follower_stops_waiting_when_its_visitor_left():
+    single_flight.acquire(TENANT, DIGEST)               # leader never finishes
+    started = time.monotonic()
+    assert single_flight.wait_for_result(TENANT, DIGEST, timeout=5, should_stop=lambda: True) is None
+    assert time.monotonic() - started < 1
@@ -0,0 +1,31 @@
+"""
+Tests for the crawl job endpoints' helpers in app/tenants/sources.py.
+"""
+import pytest
+
+from app.tenants.sources import _archived_tasks, _page, _task_cursor
+
+
+def test_archived_tasks_resolve_parents_and_page_by_position():
+    entries = [
+        ["https://acme.test/", "COMPLETED", 0, None],
+        ["https://acme.test/a", "FAILED", 1, 0],
+        ["https://acme.test/b", "COMPLETED", 1, 0],
+    ]
+    tasks = _archived_tasks(entries)
+    assert [t["id"] for t in tasks] == [1, 2, 3]
+    assert tasks[0]["parent_url"] is None
+    assert tasks[2]["parent_url"] == "https://acme.test/"
+
+    page, next_cursor = _page(tasks, 2)
+    assert [t["url"] for t in page] == ["https://acme.test/", "https://acme.test/a"]
+    assert next_cursor == 2
+
+
+def test_task_cursors_name_their_source():
+    assert _task_cursor(None) == (None, None)
+    assert _task_cursor("t:4521") == ("t", 4521)
+    assert _task_cursor("a:200") == ("a", 200)
+    for bad in ("4521", "x:1", "a:", "t:-1"):
+        with pytest.raises(ValueError):
+            _task_cursor(bad)
@@ -0,0 +1,103 @@
+"""
+Tests for the write-coalescing tenant_sources status writer.
+
+The queue runs on fakeredis's Lua engine (pip install "fakeredis[lua]");
+two StatusWriter instances sharing one client stand in for two worker
+processes.
+"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.database import status_writer as sw  # noqa: E402
+
+
+@pytest.fixture
+def r(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(sw, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    written = []
+    monkeypatch.setattr(sw, "_write", lambda rows: written.append(rows) or len(rows))
+    return written
+
+
+def _writer():
+    # Long interval: the drain thread never fires during a test
+    return sw.StatusWriter(flush_ms=60000)
+
+
+def test_updates_from_several_processes_drain_in_one_rpc(r, batches):
+    first, second = _writer(), _writer()
+
+    first.update(9, status="PROCESSING")
+    second.update(3, status="PROCESSING")
+    first.update(9, status="COMPLETED", gemini_document_name="doc-9")
+    second.update(3, status="ERROR", status_code=None)
+
+    assert second.flush() == 2
+    assert batches == [[
+        {"id": 3, "status": "ERROR", "status_code": None},
+        {"id": 9, "status": "COMPLETED", "gemini_document_name": "doc-9"},
+    ]]
+    assert first.flush() == 0
+    assert not r.exists(sw._PENDING_KEY, sw._INFLIGHT_KEY)
+
+
+def test_large_batches_are_split_by_max_rows(r, batches):
+    writer = sw.StatusWriter(flush_ms=60000, max_rows=2)
+    for source_id in range(5):
+        writer.update(source_id, status="COMPLETED")
+    assert writer.flush() == 5
+    assert [len(rows) for rows in batches] == [2, 2, 1]
+
+
+def test_failed_flush_is_retried_under_newer_values(r, monkeypatch):
+    def fail(rows):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(sw, "_write", fail)
+    writer = _writer()
+    writer.update(5, status="PROCESSING", status_code=200)
+    assert writer.flush() == 0
+    assert not r.exists(sw._INFLIGHT_KEY)
+
+    batches = []
+    monkeypatch.setattr(sw, "_write", lambda rows: batches.append(rows) or len(rows))
+    writer.update(5, status="COMPLETED")
+    assert writer.flush() == 1
+    assert batches == [[{"id": 5, "status": "COMPLETED", "status_code": 200}]]
+
+
+def test_batch_left_by_a_crashed_drain_is_written_before_newer_updates(r, batches):
+    writer = _writer()
+    writer.update(5, status="PROCESSING")
+    r.eval(sw._TAKE_SCRIPT, 2, sw._PENDING_KEY, sw._INFLIGHT_KEY)   # drainer died here
+    writer.update(5, status="COMPLETED")
+
+    assert writer.flush() == 1
+    assert writer.flush() == 1
+    assert batches == [[{"id": 5, "status": "PROCESSING"}], [{"id": 5, "status": "COMPLETED"}]]
+
+
+def test_only_one_process_drains_per_interval(r):
+    first, second = _writer(), _writer()
+    assert first._due()
+    assert not second._due()
+    assert not first._due()
+
+
+def test_update_writes_directly_when_redis_is_down(monkeypatch, batches):
+    def down():
+        raise ConnectionError("redis unavailable")
+
+    monkeypatch.setattr(sw, "get_redis", down)
+    writer = _writer()
+    writer.update(7, status="ERROR")
+    assert batches == [[{"id": 7, "status": "ERROR"}]]
+    assert writer._thread is None
@@ -0,0 +1,120 @@
+"""
+Tests for the tenant ownership cache in app/tenants/context.py.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.tenants import context
+
+USER = "user-1"
+TENANT = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeTenants:
+    """supabase.table('tenants') returning the rows of owned (user_id, tenant_id) pairs."""
+
+    def __init__(self):
+        self.owned = {(USER, TENANT): {"id": TENANT, "gemini_file_store_name": "stores/acme"}}
+        self.queries = 0
+        self.error = None
+
+    def table(self, name):
+        assert name == "tenants"
+        return _Query(self)
+
+
+class _Query:
+    def __init__(self, db):
+        self.db, self.filters = db, {}
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.db.queries += 1
+        if self.db.error:
+            raise self.db.error
+        row = self.db.owned.get((self.filters["user_id"], self.filters["id"]))
+        data = [{c.strip(): row[c.strip()] for c in self.columns.split(",")}] if row else []
+        return SimpleNamespace(data=data)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeTenants()
+    monkeypatch.setattr(context, "supabase", fake)
+    monkeypatch.setattr(context, "_owner_cache", {})
+    return fake
+
+
+def test_only_positive_ownership_is_cached(app, db):
+    with app.app_context():
+        assert context.is_tenant_owner(USER, TENANT)
+        assert context.is_tenant_owner(USER, TENANT)
+        assert db.queries == 1
+
+        assert not context.is_tenant_owner("intruder", TENANT)
+        assert not context.is_tenant_owner("intruder", TENANT)
+        assert db.queries == 3
+
+
+def test_a_lost_tenant_drops_the_cached_entry(app, db):
+    with app.app_context():
+        context.load_owned_tenant(USER, TENANT, "id, gemini_file_store_name")
+        assert (USER, TENANT) in context._owner_cache
+
+        del db.owned[(USER, TENANT)]                  # deleted by another API process
+    with app.app_context():
+        assert context.load_owned_tenant(USER, TENANT, "id") is None
+        assert (USER, TENANT) not in context._owner_cache
+
+
+def test_rows_with_columns_are_always_read_fresh(app, db):
+    context._remember(USER, TENANT)
+    with app.app_context():
+        tenant = context.load_owned_tenant(USER, TENANT, "id, gemini_file_store_name")
+        assert tenant["gemini_file_store_name"] == "stores/acme"
+    db.owned[(USER, TENANT)]["gemini_file_store_name"] = "stores/rebuilt"
+    with app.app_context():
+        tenant = context.load_owned_tenant(USER, TENANT, "id, gemini_file_store_name")
+        assert tenant["gemini_file_store_name"] == "stores/rebuilt"
+    assert db.queries == 2
+
+
+def test_the_row_is_reused_within_a_request(app, db):
+    with app.app_context():
+        first = context.load_owned_tenant(USER, TENANT, "id, gemini_file_store_name")
+        assert context.load_owned_tenant(USER, TENANT) is first
+        assert context.load_owned_tenant(USER, TENANT, "gemini_file_store_name") is first
+        assert db.queries == 1
+
+
+def _view():
+    @context.owned_tenant()
+    def view(current_user, tenant_id):
+        return "ok", 200
+    return view
+
+
+def test_owned_tenant_404s_for_someone_elses_tenant(app, db):
+    with app.test_request_context():
+        assert _view()(SimpleNamespace(id=USER), TENANT) == ("ok", 200)
+    with app.test_request_context():
+        _, status = _view()(SimpleNamespace(id="intruder"), TENANT)
+        assert status == 404
+
+
+def test_owned_tenant_500s_when_the_lookup_fails(app, db):
+    db.error = RuntimeError("supabase down")
+    with app.test_request_context():
+        _, status = _view()(SimpleNamespace(id=USER), TENANT)
+        assert status == 500
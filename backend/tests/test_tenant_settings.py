@@ -0,0 +1,40 @@
+"""
+Tests for the tenant settings validation in app/tenants/routes.py.
+"""
+from app.tenants.routes import _merge_latency_profile
+
+STORED = {"name": "fast", "model": "m-fast", "fallback_model": "m-lite", "hedge_delay_seconds": 1}
+
+
+def test_settings_round_trip_keeps_the_ops_only_keys():
+    # Settings.vue sends back the stored profile, ops keys included
+    submitted = {**STORED, "max_output_tokens": 300}
+    profile, error = _merge_latency_profile(submitted, STORED)
+    assert error is None
+    assert profile == {**STORED, "max_output_tokens": 300}
+
+
+def test_clients_cannot_set_ops_only_keys():
+    submitted = {"name": "balanced", "model": "m-pro", "fallback_model": None, "hedge_delay_seconds": 30}
+    profile, error = _merge_latency_profile(submitted, {"name": "balanced"})
+    assert error is None
+    assert profile == {"name": "balanced"}
+
+
+def test_tunable_keys_are_still_validated():
+    _, error = _merge_latency_profile({"name": "fast", "retrieval_top_k": 50}, STORED)
+    assert "retrieval_top_k" in error
+    _, error = _merge_latency_profile({"name": "fast", "temperature": 1}, STORED)
+    assert "Unknown latency_profile key" in error
+
+
+def test_timeouts_are_capped_at_the_turn_deadline(monkeypatch):
+    from app.tenants import routes
+    monkeypatch.setitem(routes.LATENCY_PROFILE_LIMITS, "timeout_seconds", (5, 60))
+
+    _, error = _merge_latency_profile({"name": "thorough", "timeout_seconds": 61}, {})
+    assert error is None  # a stored 120 from before the cap comes back clamped
+    profile, _ = _merge_latency_profile({"name": "thorough", "timeout_seconds": 120}, {})
+    assert profile["timeout_seconds"] == 60
+    _, error = _merge_latency_profile({"name": "thorough", "timeout_seconds": 2}, {})
+    assert "timeout_seconds" in error
@@ -0,0 +1,139 @@
+"""
+Tests for worker_chat's write-behind drain of chat_logs rows and debits.
+
+The stream runs on fakeredis (consumer group, XAUTOCLAIM); apply_chat_writes()
+is stubbed with an in-memory ledger that keeps the migration's rules:
+write_id is applied at most once, and new debits are summed per user.
+write_behind.py is loaded straight from the worker source tree (see
+test_rule_index.py).
+"""
+import importlib.util
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+_PATH = (
+    Path(__file__).parent.parent
+    / "services" / "worker_chat" / "app" / "chat" / "write_behind.py"
+)
+_spec = importlib.util.spec_from_file_location("worker_chat_write_behind", _PATH)
+write_behind = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(write_behind)
+
+USER_A = "00000000-0000-0000-0000-00000000000a"
+USER_B = "00000000-0000-0000-0000-00000000000b"
+TENANT = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeLedger:
+    """apply_chat_writes() over dicts. fail: "before" or "after" the commit."""
+
+    def __init__(self):
+        self.logs = {}
+        self.debits = {}
+        self.balances = {USER_A: 10.0, USER_B: 10.0}
+        self.calls = 0
+        self.fail = None
+
+    def rpc(self, name, params):
+        assert name == "apply_chat_writes"
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self._apply(params["p_rows"])))
+
+    def _apply(self, rows):
+        self.calls += 1
+        rows = json.loads(json.dumps(rows))
+        if self.fail == "before":
+            raise RuntimeError("connection reset")
+        totals = {}
+        for row in rows:
+            if row["user_id"] and (row["amount"] or 0) > 0 and row["write_id"] not in self.debits:
+                self.debits[row["write_id"]] = row["amount"]
+                totals[row["user_id"]] = totals.get(row["user_id"], 0.0) + row["amount"]
+        for user_id, total in totals.items():
+            self.balances[user_id] -= total
+        inserted = 0
+        for row in rows:
+            if row["write_id"] not in self.logs:
+                self.logs[row["write_id"]] = row["log"]
+                inserted += 1
+        if self.fail == "after":
+            raise TimeoutError("read timeout")  # committed, but the drainer never heard back
+        return inserted
+
+
+@pytest.fixture
+def r(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(write_behind, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    fake = FakeLedger()
+    monkeypatch.setattr(write_behind, "supabase", fake)
+    return fake
+
+
+def _turn(r, user_id, cost, message="hello"):
+    write_behind.record_turn(
+        {"tenant_id": TENANT, "user_message": message, "ai_message": "hi", "cost_chf": cost}, user_id, cost
+    )
+
+
+def _pending(r):
+    return r.xpending(write_behind.CHAT_WRITE_STREAM, write_behind.CHAT_WRITE_GROUP)["pending"]
+
+
+def test_mixed_users_in_one_batch_are_debited_per_user(r, ledger):
+    _turn(r, USER_A, 0.10)
+    _turn(r, USER_B, 0.20)
+    _turn(r, USER_A, 0.30)
+    _turn(r, USER_B, 0.0)            # free turn: logged, no debit
+    _turn(r, "not-a-uuid", 0.50)     # bad owner id: logged, no debit
+
+    assert write_behind.drain_chat_writes() == 5
+    assert ledger.calls == 1
+    assert ledger.balances[USER_A] == pytest.approx(9.60)
+    assert ledger.balances[USER_B] == pytest.approx(9.80)
+    assert len(ledger.debits) == 3
+    assert len(ledger.logs) == 5
+    assert r.xlen(write_behind.CHAT_WRITE_STREAM) == 0
+    assert _pending(r) == 0
+
+
+def test_failed_rpc_leaves_the_entry_pending_for_reclaim(r, ledger, monkeypatch):
+    monkeypatch.setattr(write_behind, "CHAT_WRITE_CLAIM_IDLE_MS", 0)
+    _turn(r, USER_A, 0.10)
+
+    ledger.fail = "before"
+    assert write_behind.drain_chat_writes() == 0
+    assert _pending(r) == 1
+    assert ledger.logs == {}
+
+    ledger.fail = None
+    assert write_behind.drain_chat_writes() == 1
+    assert _pending(r) == 0
+    assert ledger.balances[USER_A] == pytest.approx(9.90)
+
+
+def test_redelivered_entry_is_not_applied_twice(r, ledger, monkeypatch):
+    monkeypatch.setattr(write_behind, "CHAT_WRITE_CLAIM_IDLE_MS", 0)
+    _turn(r, USER_A, 0.10)
+
+    # The RPC committed but the drainer never acknowledged the entry
+    ledger.fail = "after"
+    write_behind.drain_chat_writes()
+    assert _pending(r) == 1
+
+    ledger.fail = None
+    assert write_behind.drain_chat_writes() == 0     # reclaimed and replayed: nothing new
+    assert ledger.calls == 2
+    assert len(ledger.logs) == 1
+    assert ledger.balances[USER_A] == pytest.approx(9.90)
+    assert _pending(r) == 0
+    assert r.xlen(write_behind.CHAT_WRITE_STREAM) == 0
@@ -0,0 +1,54 @@
+import { supabase } from '../supabase';
+
+// Crawl progress snapshots of one tenant, pushed by the API gateway as
+// server-sent events (backend api/app/gateway/progress.py) — at most a few per
+// second per job, however many tasks change. EventSource cannot send the
+// Authorization header, so the stream is read with fetch. Reconnects after
+// RETRY_MS when the stream ends or fails.
+const RETRY_MS = 3000;
+
+export function useCrawlEvents(onSnapshot) {
+  const baseURL = import.meta.env.VITE_API_BASE_URL || '/api';
+  let controller = null;
+  let retryTimer = null;
+
+  const close = () => {
+    clearTimeout(retryTimer);
+    if (controller) controller.abort();
+    controller = null;
+  };
+
+  const connect = async (tenantId) => {
+    close();
+    const ctrl = new AbortController();
+    controller = ctrl;
+    try {
+      const { data: { session } } = await supabase.auth.getSession();
+      const response = await fetch(`${baseURL}/tenants/${tenantId}/crawling_jobs/events`, {
+        headers: { Authorization: `Bearer ${session?.access_token}`, Accept: 'text/event-stream' },
+        signal: ctrl.signal,
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          const data = block.split('\n').filter(l => l.startsWith('data: ')).map(l => l.slice(6)).join('\n');
+          if (data) onSnapshot(JSON.parse(data));
+        }
+      }
+    } catch {
+      if (ctrl.signal.aborted) return;
+    }
+    if (controller === ctrl) retryTimer = setTimeout(() => connect(tenantId), RETRY_MS);
+  };
+
+  return { connect, close };
+}
@@ -19,6 +19,11 @@ export default defineConfig(({ mode }) => {
     },
     server: {
       proxy: {
+        // Dashboard streams served by the async gateway (as nginx routes them in prod)
+        '^/api/(chat/[0-9a-f-]{36}/export|tenants/[0-9a-f-]{36}/crawling_jobs/events)(\\?|$)': {
+          target: 'http://gateway:8000',
+          changeOrigin: true,
+        },
         // Forward /api/* to Flask — same origin, no CORS needed in local dev
         '/api': {
           target: 'http://backend:5000',
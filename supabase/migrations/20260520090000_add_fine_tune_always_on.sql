@@ -0,0 +1,7 @@
+-- Migration: add always_on flag to tenant_fine_tune
+-- Fine-tune rules are no longer injected wholesale into every chat prompt.
+-- worker_chat selects the top-k rules whose trigger matches the turn; rules
+-- flagged always_on skip relevance scoring and are injected on every turn.
+
+ALTER TABLE public.tenant_fine_tune
+  ADD COLUMN IF NOT EXISTS always_on BOOLEAN NOT NULL DEFAULT false;
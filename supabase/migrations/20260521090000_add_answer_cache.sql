@@ -0,0 +1,39 @@
+-- Migration: opt-in answer cache for repeated first-turn chat questions
+--   tenants.answer_cache_enabled — per-tenant opt-in (default off)
+--   tenants.knowledge_version    — "store version" component of the cache key;
+--                                  bumped whenever indexed knowledge changes
+--   chat_logs.cache_hit          — true when the answer was served from cache
+--   chat_logs.latency_ms         — end-to-end worker time for the turn, so hit
+--                                  rate and latency savings can be measured
+
+ALTER TABLE public.tenants
+  ADD COLUMN IF NOT EXISTS answer_cache_enabled BOOLEAN NOT NULL DEFAULT false,
+  ADD COLUMN IF NOT EXISTS knowledge_version BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS cache_hit BOOLEAN NOT NULL DEFAULT false,
+  ADD COLUMN IF NOT EXISTS latency_ms INTEGER;
+
+-- ---------------------------------------------------------------------------
+-- Bump knowledge_version when a source finishes indexing or is removed.
+-- Intermediate transitions (QUEUED → PROCESSING) do not change what the
+-- model can retrieve, so they are ignored to keep tenants-row writes low.
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.bump_knowledge_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    UPDATE public.tenants SET knowledge_version = knowledge_version + 1 WHERE id = OLD.tenant_id;
+    RETURN OLD;
+  END IF;
+
+  IF NEW.status = 'COMPLETED' AND OLD.status IS DISTINCT FROM 'COMPLETED' THEN
+    UPDATE public.tenants SET knowledge_version = knowledge_version + 1 WHERE id = NEW.tenant_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_tenant_sources_knowledge_version
+  AFTER UPDATE OF status OR DELETE ON public.tenant_sources
+  FOR EACH ROW EXECUTE FUNCTION public.bump_knowledge_version();
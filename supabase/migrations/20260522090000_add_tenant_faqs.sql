@@ -0,0 +1,32 @@
+-- ============================================================================
+-- Curated FAQ fast-path: tenant_faqs table + chat_logs.faq_id
+-- ============================================================================
+-- Canonical question/answer pairs matched locally by the API before a chat
+-- turn is sent to Gemini. A match returns the stored answer verbatim.
+
+CREATE TABLE public.tenant_faqs (
+  id         SERIAL PRIMARY KEY,
+  tenant_id  UUID NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+  question   TEXT NOT NULL,
+  answer     TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_tenant_faqs_tenant_id ON public.tenant_faqs(tenant_id);
+
+ALTER TABLE public.tenant_faqs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to manage FAQs for their tenants"
+ON public.tenant_faqs FOR ALL
+USING (
+  auth.uid() = (
+    SELECT user_id FROM public.tenants WHERE id = tenant_id
+  )
+);
+
+-- Which FAQ answered a turn (NULL for LLM / cache answers).
+-- Match rate = rows with faq_id / all rows; latency_ms shows the time saved.
+-- No foreign key: FAQs are replaced wholesale on save, and the match history
+-- must survive that.
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS faq_id INTEGER;
@@ -0,0 +1,8 @@
+-- Migration: single-flight coalescing of identical in-flight chat turns
+--   chat_logs.coalesced — true when the turn reused the answer of a concurrent
+--                         identical turn instead of calling the model itself.
+--                         Such rows still carry the leader's token counts and
+--                         cost, so usage and billing reports are unchanged.
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS coalesced BOOLEAN NOT NULL DEFAULT false;
@@ -0,0 +1,10 @@
+-- Migration: record the generation path chosen for each chat turn
+--   chat_logs.route — rag | smalltalk | canned | faq
+--                     (see worker_chat/app/chat/router.py). Token and latency
+--                     savings per route can be compared directly, e.g.
+--
+--   SELECT route, count(*), avg(latency_ms), avg(input_tokens + output_tokens)
+--   FROM chat_logs WHERE tenant_id = $1 GROUP BY route;
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS route TEXT NOT NULL DEFAULT 'rag';
@@ -0,0 +1,48 @@
+-- Migration: per-tenant latency profiles for chat generation
+--   tenants.latency_profile   — {"name": "fast"|"balanced"|"thorough", ...overrides}
+--                               resolved by worker_chat/app/chat/latency_profiles.py
+--   chat_logs.latency_profile — profile name a turn ran with
+--   chat_latency_stats()      — p50/p95 latency and token averages per profile
+
+ALTER TABLE public.tenants
+  ADD COLUMN IF NOT EXISTS latency_profile JSONB NOT NULL DEFAULT '{"name": "balanced"}'::jsonb;
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS latency_profile TEXT;
+
+-- Only turns that actually called the model are measured: FAQ, canned,
+-- cached and coalesced answers would skew the percentiles towards zero.
+CREATE OR REPLACE FUNCTION public.chat_latency_stats(
+    p_tenant_id UUID,
+    p_start_time TIMESTAMPTZ
+)
+RETURNS TABLE(
+    latency_profile TEXT,
+    route TEXT,
+    turns BIGINT,
+    p50_ms DOUBLE PRECISION,
+    p95_ms DOUBLE PRECISION,
+    avg_input_tokens DOUBLE PRECISION,
+    avg_output_tokens DOUBLE PRECISION
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        COALESCE(cl.latency_profile, 'balanced') AS latency_profile,
+        cl.route,
+        COUNT(*)::BIGINT AS turns,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY cl.latency_ms) AS p50_ms,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY cl.latency_ms) AS p95_ms,
+        AVG(cl.input_tokens)::DOUBLE PRECISION AS avg_input_tokens,
+        AVG(cl.output_tokens)::DOUBLE PRECISION AS avg_output_tokens
+    FROM chat_logs cl
+    WHERE cl.tenant_id = p_tenant_id
+      AND cl.created_at >= p_start_time
+      AND cl.latency_ms IS NOT NULL
+      AND cl.route IN ('rag', 'smalltalk')
+      AND NOT cl.cache_hit
+      AND NOT cl.coalesced
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- Migration: deadline-aware chat with a hedged fallback model
+--   chat_logs.hedged — true when the primary model's first token was late
+--                      (or it failed) and a fallback request was raced against
+--                      it. model_used holds whichever model answered.
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS hedged BOOLEAN NOT NULL DEFAULT false;
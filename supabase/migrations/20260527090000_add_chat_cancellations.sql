@@ -0,0 +1,40 @@
+-- ============================================================================
+-- Cancellation of abandoned chat turns
+-- ============================================================================
+--   chat_logs.queue_ms   — time a completed turn spent in the chat queue
+--   chat_cancellations   — one row per turn dropped because the visitor left
+--                          (explicit cancel or expired poll heartbeat)
+--       stage     'queued'     dropped before any work was done
+--                 'generating' in-flight Gemini request aborted
+--       wasted_ms generation time spent before the abort
+--
+-- Capacity lost to unread answers:
+--   SELECT stage, count(*), sum(wasted_ms) FROM chat_cancellations
+--   WHERE tenant_id = $1 AND created_at > now() - interval '7 days' GROUP BY stage;
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS queue_ms INTEGER;
+
+CREATE TABLE public.chat_cancellations (
+  id              BIGSERIAL PRIMARY KEY,
+  tenant_id       UUID NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+  conversation_id UUID,
+  task_id         TEXT,
+  stage           TEXT NOT NULL CHECK (stage IN ('queued', 'generating')),
+  queue_ms        INTEGER,
+  wasted_ms       INTEGER NOT NULL DEFAULT 0,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_chat_cancellations_tenant_created
+  ON public.chat_cancellations(tenant_id, created_at);
+
+ALTER TABLE public.chat_cancellations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read cancellations for their tenants"
+ON public.chat_cancellations FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT user_id FROM public.tenants WHERE id = tenant_id
+  )
+);
@@ -0,0 +1,73 @@
+-- ============================================================================
+-- Write-behind for chat_logs inserts and billing debits
+-- ============================================================================
+-- worker_chat appends each finished turn to a Redis stream and returns the
+-- answer immediately; a drainer task flushes batches through
+-- apply_chat_writes(). Every turn carries a write_id, so a batch that is
+-- replayed after a crash (written to the DB, but not yet acknowledged on the
+-- stream) changes nothing the second time:
+--
+--   chat_logs.write_id      UNIQUE — a log row is inserted at most once
+--   billing_debits.write_id PK     — a debit is applied at most once
+--
+-- Debits that are new in a batch are summed per user and applied with one
+-- balance UPDATE per user, in the same transaction as the log inserts.
+
+ALTER TABLE public.chat_logs
+  ADD COLUMN IF NOT EXISTS write_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_logs_write_id
+  ON public.chat_logs(write_id) WHERE write_id IS NOT NULL;
+
+CREATE TABLE public.billing_debits (
+  write_id   TEXT PRIMARY KEY,
+  user_id    UUID NOT NULL,
+  amount_chf DECIMAL(10, 6) NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_billing_debits_created_at ON public.billing_debits(created_at);
+
+-- Service-role only: no policies, RLS denies everyone else
+ALTER TABLE public.billing_debits ENABLE ROW LEVEL SECURITY;
+
+-- p_rows: [{"write_id", "user_id", "amount", "log": {chat_logs columns}}, ...]
+-- Returns the number of chat_logs rows actually inserted.
+CREATE OR REPLACE FUNCTION public.apply_chat_writes(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inserted INTEGER;
+BEGIN
+    WITH new_debits AS (
+        INSERT INTO billing_debits (write_id, user_id, amount_chf)
+        SELECT r->>'write_id', (r->>'user_id')::UUID, (r->>'amount')::DECIMAL
+        FROM jsonb_array_elements(p_rows) r
+        WHERE r->>'user_id' IS NOT NULL
+          AND COALESCE((r->>'amount')::DECIMAL, 0) > 0
+        ON CONFLICT (write_id) DO NOTHING
+        RETURNING user_id, amount_chf
+    )
+    UPDATE user_billing ub
+    SET balance_chf = ub.balance_chf - d.total,
+        updated_at = NOW()
+    FROM (SELECT user_id, SUM(amount_chf) AS total FROM new_debits GROUP BY user_id) d
+    WHERE ub.user_id = d.user_id;
+
+    INSERT INTO chat_logs (
+        write_id, tenant_id, conversation_id, user_message, ai_message, model_used,
+        input_tokens, output_tokens, cost_chf, latency_ms, queue_ms, cache_hit,
+        coalesced, hedged, route, latency_profile, created_at
+    )
+    SELECT
+        r->>'write_id', l.tenant_id, l.conversation_id, l.user_message, COALESCE(l.ai_message, ''),
+        l.model_used, l.input_tokens, l.output_tokens, l.cost_chf, l.latency_ms, l.queue_ms,
+        COALESCE(l.cache_hit, false), COALESCE(l.coalesced, false), COALESCE(l.hedged, false),
+        COALESCE(l.route, 'rag'), l.latency_profile, COALESCE(l.created_at, NOW())
+    FROM jsonb_array_elements(p_rows) r
+    CROSS JOIN LATERAL jsonb_populate_record(NULL::chat_logs, r->'log') l
+    ON CONFLICT (write_id) WHERE write_id IS NOT NULL DO NOTHING;
+
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,120 @@
+-- ============================================================================
+-- Conversation summaries for the dashboard's conversation list
+-- ============================================================================
+-- get_conversations used to read every chat_logs row of a tenant and
+-- aggregate them in Python — slower with every turn, and silently truncated
+-- at the PostgREST row limit. conversations keeps one row per conversation,
+-- maintained by a statement-level trigger on chat_logs inserts (a write-behind
+-- batch from apply_chat_writes() is folded in with one upsert), and
+-- list_conversations() pages through it with a keyset cursor:
+--
+--   SELECT * FROM list_conversations($tenant, 50);                    -- first page
+--   SELECT * FROM list_conversations($tenant, 50, $last_active, $id); -- next page
+--
+-- Summaries only ever grow: they outlive chat_logs rows that are archived
+-- or deleted later.
+
+CREATE TABLE public.conversations (
+  tenant_id       UUID NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+  conversation_id UUID NOT NULL,
+  first_message   TEXT,
+  started_at      TIMESTAMPTZ NOT NULL,
+  last_active     TIMESTAMPTZ NOT NULL,
+  message_count   INTEGER NOT NULL DEFAULT 0,
+  total_cost      DECIMAL(12, 6) NOT NULL DEFAULT 0,
+  PRIMARY KEY (tenant_id, conversation_id)
+);
+
+-- Scanned backwards for the newest-first keyset in list_conversations()
+CREATE INDEX idx_conversations_tenant_last_active
+  ON public.conversations(tenant_id, last_active, conversation_id);
+
+ALTER TABLE public.conversations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read conversations for their tenants"
+ON public.conversations FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT user_id FROM public.tenants WHERE id = tenant_id
+  )
+);
+
+-- Folds one statement's new chat_logs rows into the summaries. Rows are
+-- upserted in key order so concurrent batches lock them in the same order.
+CREATE OR REPLACE FUNCTION public.summarize_chat_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO conversations AS c (
+        tenant_id, conversation_id, first_message, started_at, last_active, message_count, total_cost
+    )
+    SELECT
+        n.tenant_id,
+        n.conversation_id,
+        (array_agg(n.user_message ORDER BY n.created_at, n.id) FILTER (WHERE n.user_message <> ''))[1],
+        MIN(n.created_at),
+        MAX(n.created_at),
+        COUNT(*),
+        COALESCE(SUM(n.cost_chf), 0)
+    FROM new_rows n
+    GROUP BY n.tenant_id, n.conversation_id
+    ORDER BY n.tenant_id, n.conversation_id
+    ON CONFLICT (tenant_id, conversation_id) DO UPDATE SET
+        first_message = CASE
+            WHEN c.first_message IS NULL OR EXCLUDED.started_at < c.started_at
+                THEN COALESCE(EXCLUDED.first_message, c.first_message)
+            ELSE c.first_message
+        END,
+        started_at    = LEAST(c.started_at, EXCLUDED.started_at),
+        last_active   = GREATEST(c.last_active, EXCLUDED.last_active),
+        message_count = c.message_count + EXCLUDED.message_count,
+        total_cost    = c.total_cost + EXCLUDED.total_cost;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chat_logs_summarize
+AFTER INSERT ON public.chat_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.summarize_chat_logs();
+
+-- Backfill from the existing history
+INSERT INTO public.conversations (
+    tenant_id, conversation_id, first_message, started_at, last_active, message_count, total_cost
+)
+SELECT
+    tenant_id,
+    conversation_id,
+    (array_agg(user_message ORDER BY created_at, id) FILTER (WHERE user_message <> ''))[1],
+    MIN(created_at),
+    MAX(created_at),
+    COUNT(*),
+    COALESCE(SUM(cost_chf), 0)
+FROM public.chat_logs
+GROUP BY tenant_id, conversation_id
+ON CONFLICT (tenant_id, conversation_id) DO NOTHING;
+
+-- Newest first. Pass the last row of a page as (p_before_active, p_before_id)
+-- to get the next one; the row comparison walks the index without OFFSET.
+CREATE OR REPLACE FUNCTION public.list_conversations(
+    p_tenant_id UUID,
+    p_limit INTEGER DEFAULT 50,
+    p_before_active TIMESTAMPTZ DEFAULT NULL,
+    p_before_id UUID DEFAULT NULL
+)
+RETURNS TABLE(
+    conversation_id UUID,
+    first_message TEXT,
+    last_active TIMESTAMPTZ,
+    message_count INTEGER,
+    total_cost DOUBLE PRECISION
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT c.conversation_id, c.first_message, c.last_active, c.message_count, c.total_cost::DOUBLE PRECISION
+    FROM conversations c
+    WHERE c.tenant_id = p_tenant_id
+      AND (p_before_active IS NULL OR (c.last_active, c.conversation_id) < (p_before_active, p_before_id))
+    ORDER BY c.last_active DESC, c.conversation_id DESC
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,169 @@
+-- ============================================================================
+-- Pre-aggregated chat analytics
+-- ============================================================================
+-- analytics_time_buckets() used to bucket raw chat_logs rows on every
+-- dashboard load — minute buckets over a week scanned every turn of that
+-- week. chat_stats_rollups keeps per-tenant counters at three granularities,
+-- folded in by a statement-level trigger on chat_logs inserts (one upsert per
+-- tenant and bucket for a whole write-behind batch):
+--
+--   granularity  bucket                         kept
+--   'minute'     date_trunc('minute', ts)       CHAT_STATS_MINUTE_DAYS (beat prune)
+--   'hour'       date_trunc('hour', ts)         forever
+--   'day'        date_trunc('day', ts)          forever
+--
+-- The counters are updated in the inserting transaction, so there is no
+-- not-yet-rolled-up tail: a query reads the rollups only, and its cost
+-- depends on the number of buckets, not on the number of turns.
+-- Latency is stored as sum/count/max (percentiles do not add up — the
+-- per-profile percentiles stay in chat_latency_stats()).
+
+CREATE TABLE public.chat_stats_rollups (
+  tenant_id      UUID NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+  granularity    TEXT NOT NULL CHECK (granularity IN ('minute', 'hour', 'day')),
+  bucket         TIMESTAMPTZ NOT NULL,
+  turns          INTEGER NOT NULL DEFAULT 0,
+  input_tokens   BIGINT NOT NULL DEFAULT 0,
+  output_tokens  BIGINT NOT NULL DEFAULT 0,
+  cost_chf       DECIMAL(14, 6) NOT NULL DEFAULT 0,
+  latency_ms_sum BIGINT NOT NULL DEFAULT 0,
+  latency_count  INTEGER NOT NULL DEFAULT 0,
+  latency_ms_max INTEGER,
+  PRIMARY KEY (tenant_id, granularity, bucket)
+);
+
+ALTER TABLE public.chat_stats_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read chat stats for their tenants"
+ON public.chat_stats_rollups FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT user_id FROM public.tenants WHERE id = tenant_id
+  )
+);
+
+-- Rows are upserted in key order so concurrent batches lock them in the same order.
+CREATE OR REPLACE FUNCTION public.rollup_chat_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO chat_stats_rollups AS r (
+        tenant_id, granularity, bucket, turns, input_tokens, output_tokens,
+        cost_chf, latency_ms_sum, latency_count, latency_ms_max
+    )
+    SELECT
+        n.tenant_id,
+        g.granularity,
+        date_trunc(g.granularity, n.created_at),
+        COUNT(*),
+        COALESCE(SUM(n.input_tokens), 0),
+        COALESCE(SUM(n.output_tokens), 0),
+        COALESCE(SUM(n.cost_chf), 0),
+        COALESCE(SUM(n.latency_ms), 0),
+        COUNT(n.latency_ms),
+        MAX(n.latency_ms)
+    FROM new_rows n
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (tenant_id, granularity, bucket) DO UPDATE SET
+        turns          = r.turns + EXCLUDED.turns,
+        input_tokens   = r.input_tokens + EXCLUDED.input_tokens,
+        output_tokens  = r.output_tokens + EXCLUDED.output_tokens,
+        cost_chf       = r.cost_chf + EXCLUDED.cost_chf,
+        latency_ms_sum = r.latency_ms_sum + EXCLUDED.latency_ms_sum,
+        latency_count  = r.latency_count + EXCLUDED.latency_count,
+        latency_ms_max = GREATEST(r.latency_ms_max, EXCLUDED.latency_ms_max);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chat_logs_rollup
+AFTER INSERT ON public.chat_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.rollup_chat_logs();
+
+-- Backfill from the existing history
+INSERT INTO public.chat_stats_rollups (
+    tenant_id, granularity, bucket, turns, input_tokens, output_tokens,
+    cost_chf, latency_ms_sum, latency_count, latency_ms_max
+)
+SELECT
+    cl.tenant_id,
+    g.granularity,
+    date_trunc(g.granularity, cl.created_at),
+    COUNT(*),
+    COALESCE(SUM(cl.input_tokens), 0),
+    COALESCE(SUM(cl.output_tokens), 0),
+    COALESCE(SUM(cl.cost_chf), 0),
+    COALESCE(SUM(cl.latency_ms), 0),
+    COUNT(cl.latency_ms),
+    MAX(cl.latency_ms)
+FROM public.chat_logs cl
+CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+WHERE g.granularity <> 'minute' OR cl.created_at >= now() - interval '14 days'
+GROUP BY 1, 2, 3
+ON CONFLICT (tenant_id, granularity, bucket) DO NOTHING;
+
+-- Same name and first two columns as before, now read from the rollups.
+-- p_interval: 'minute', '5 minutes', '1 hour', '1 day' (5-minute buckets are
+-- binned from the minute rollup). The first bucket is whole, so it may count
+-- turns from just before p_start_time.
+DROP FUNCTION IF EXISTS public.analytics_time_buckets(UUID, TIMESTAMPTZ, TEXT);
+
+CREATE OR REPLACE FUNCTION public.analytics_time_buckets(
+    p_tenant_id UUID,
+    p_start_time TIMESTAMPTZ,
+    p_interval TEXT DEFAULT '1 hour'
+)
+RETURNS TABLE(
+    time_bucket TIMESTAMPTZ,
+    message_count BIGINT,
+    input_tokens BIGINT,
+    output_tokens BIGINT,
+    cost_chf DOUBLE PRECISION,
+    avg_latency_ms DOUBLE PRECISION,
+    max_latency_ms INTEGER
+) AS $$
+DECLARE
+    v_granularity TEXT := CASE p_interval
+        WHEN 'minute' THEN 'minute'
+        WHEN '5 minutes' THEN 'minute'
+        WHEN '1 day' THEN 'day'
+        ELSE 'hour'
+    END;
+BEGIN
+    RETURN QUERY
+    SELECT
+        CASE WHEN p_interval = '5 minutes'
+            THEN date_bin('5 minutes', r.bucket, TIMESTAMPTZ '2000-01-01')
+            ELSE r.bucket
+        END AS time_bucket,
+        SUM(r.turns)::BIGINT,
+        SUM(r.input_tokens)::BIGINT,
+        SUM(r.output_tokens)::BIGINT,
+        SUM(r.cost_chf)::DOUBLE PRECISION,
+        (SUM(r.latency_ms_sum)::DOUBLE PRECISION / NULLIF(SUM(r.latency_count), 0)),
+        MAX(r.latency_ms_max)
+    FROM chat_stats_rollups r
+    WHERE r.tenant_id = p_tenant_id
+      AND r.granularity = v_granularity
+      AND r.bucket >= date_trunc(v_granularity, p_start_time)
+    GROUP BY 1
+    ORDER BY 1;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Called daily by beat (maintenance_tasks.prune_chat_stats_task).
+-- Returns the number of minute buckets removed.
+CREATE OR REPLACE FUNCTION public.prune_chat_stats(p_minute_days INTEGER DEFAULT 14)
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM chat_stats_rollups
+    WHERE granularity = 'minute'
+      AND bucket < now() - make_interval(days => p_minute_days);
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
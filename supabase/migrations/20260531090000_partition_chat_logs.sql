@@ -0,0 +1,352 @@
+-- ============================================================================
+-- Monthly partitions for chat_logs, with cold archive of old months
+-- ============================================================================
+-- chat_logs grew with every turn and kept all message text forever, so its
+-- indexes deepened with history. It is now range-partitioned by created_at,
+-- one partition per month:
+--
+--   chat_logs_y2026m05   [2026-05-01, 2026-06-01)
+--   chat_logs_default    anything outside the monthly ranges
+--
+-- ensure_chat_logs_partitions() keeps the next months created (beat, daily).
+-- Months older than CHAT_LOGS_HOT_MONTHS are exported by worker_fast to
+-- zstd JSONL files on the data volume (shared/database/chat_archive.py),
+-- recorded in chat_logs_archives and their partition dropped. The API reads
+-- archived conversations from those files; restore_chat_logs_task brings a
+-- month back into the table on demand (rows restored from an archive do not
+-- count again in conversations or chat_stats_rollups).
+--
+-- write_id stays idempotent: unique indexes of a partitioned table must
+-- contain the partition key, and a replayed write-behind entry carries the
+-- same created_at, so (write_id, created_at) is as strict as write_id was.
+
+-- 1. New partitioned table with the same columns -------------------------
+
+ALTER TABLE public.chat_logs RENAME TO chat_logs_legacy;
+
+CREATE TABLE public.chat_logs (LIKE public.chat_logs_legacy INCLUDING DEFAULTS)
+  PARTITION BY RANGE (created_at);
+
+-- The identity sequence stays with the legacy table; continue after its ids
+CREATE SEQUENCE public.chat_logs_partitioned_id_seq AS BIGINT OWNED BY public.chat_logs.id;
+SELECT setval(
+  'public.chat_logs_partitioned_id_seq',
+  COALESCE((SELECT MAX(id) FROM public.chat_logs_legacy), 0) + 1,
+  false
+);
+ALTER TABLE public.chat_logs
+  ALTER COLUMN id SET DEFAULT nextval('public.chat_logs_partitioned_id_seq');
+
+-- Partitions are plain tables in public: RLS without policies keeps them
+-- closed to the API roles, reads go through the parent's policies.
+CREATE OR REPLACE FUNCTION public.create_chat_logs_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::DATE;
+    v_name  TEXT := 'chat_logs_y' || to_char(v_start, 'YYYY') || 'm' || to_char(v_start, 'MM');
+BEGIN
+    IF to_regclass('public.' || v_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF public.chat_logs FOR VALUES FROM (%L) TO (%L)',
+            v_name,
+            to_char(v_start, 'YYYY-MM-DD') || ' 00:00:00+00',
+            to_char(v_start + INTERVAL '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+        );
+        EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', v_name);
+    END IF;
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The current month and p_months_ahead after it
+CREATE OR REPLACE FUNCTION public.ensure_chat_logs_partitions(p_months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE;
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        v_month := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => i))::DATE;
+        PERFORM create_chat_logs_partition(v_month);
+    END LOOP;
+    RETURN p_months_ahead + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.create_chat_logs_partition(m::DATE)
+FROM generate_series(
+  date_trunc('month', COALESCE((SELECT MIN(created_at) FROM public.chat_logs_legacy), now()) AT TIME ZONE 'UTC'),
+  date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+  INTERVAL '1 month'
+) AS m;
+
+CREATE TABLE public.chat_logs_default PARTITION OF public.chat_logs DEFAULT;
+ALTER TABLE public.chat_logs_default ENABLE ROW LEVEL SECURITY;
+
+-- 2. Move the rows (before any trigger exists, so nothing is counted twice)
+
+INSERT INTO public.chat_logs SELECT * FROM public.chat_logs_legacy;
+DROP TABLE public.chat_logs_legacy;
+
+-- 3. Keys, indexes, policies and triggers on the parent --------------------
+
+ALTER TABLE public.chat_logs ADD PRIMARY KEY (id, created_at);
+ALTER TABLE public.chat_logs
+  ADD CONSTRAINT chat_logs_tenant_id_fkey
+  FOREIGN KEY (tenant_id) REFERENCES public.tenants(id) ON DELETE CASCADE;
+
+CREATE INDEX idx_chat_logs_tenant_conversation ON public.chat_logs(tenant_id, conversation_id, created_at);
+CREATE UNIQUE INDEX idx_chat_logs_write_id
+  ON public.chat_logs(write_id, created_at) WHERE write_id IS NOT NULL;
+
+ALTER TABLE public.chat_logs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow tenant owner to read their own logs"
+ON public.chat_logs FOR SELECT
+TO authenticated
+USING (
+  EXISTS (
+    SELECT 1 FROM public.tenants
+    WHERE tenants.id = chat_logs.tenant_id
+    AND tenants.user_id = auth.uid()
+  )
+);
+
+CREATE POLICY "chat_logs_shared_public_read"
+  ON public.chat_logs FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM public.shared_conversations sc
+      WHERE sc.conversation_id = chat_logs.conversation_id
+        AND sc.expires_at > now()
+    )
+  );
+
+-- Summaries and rollups skip rows restored from an archive: they were
+-- counted when first inserted and are still there.
+CREATE OR REPLACE FUNCTION public.summarize_chat_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('app.chat_logs_restore', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO conversations AS c (
+        tenant_id, conversation_id, first_message, started_at, last_active, message_count, total_cost
+    )
+    SELECT
+        n.tenant_id,
+        n.conversation_id,
+        (array_agg(n.user_message ORDER BY n.created_at, n.id) FILTER (WHERE n.user_message <> ''))[1],
+        MIN(n.created_at),
+        MAX(n.created_at),
+        COUNT(*),
+        COALESCE(SUM(n.cost_chf), 0)
+    FROM new_rows n
+    GROUP BY n.tenant_id, n.conversation_id
+    ORDER BY n.tenant_id, n.conversation_id
+    ON CONFLICT (tenant_id, conversation_id) DO UPDATE SET
+        first_message = CASE
+            WHEN c.first_message IS NULL OR EXCLUDED.started_at < c.started_at
+                THEN COALESCE(EXCLUDED.first_message, c.first_message)
+            ELSE c.first_message
+        END,
+        started_at    = LEAST(c.started_at, EXCLUDED.started_at),
+        last_active   = GREATEST(c.last_active, EXCLUDED.last_active),
+        message_count = c.message_count + EXCLUDED.message_count,
+        total_cost    = c.total_cost + EXCLUDED.total_cost;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.rollup_chat_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('app.chat_logs_restore', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO chat_stats_rollups AS r (
+        tenant_id, granularity, bucket, turns, input_tokens, output_tokens,
+        cost_chf, latency_ms_sum, latency_count, latency_ms_max
+    )
+    SELECT
+        n.tenant_id,
+        g.granularity,
+        date_trunc(g.granularity, n.created_at),
+        COUNT(*),
+        COALESCE(SUM(n.input_tokens), 0),
+        COALESCE(SUM(n.output_tokens), 0),
+        COALESCE(SUM(n.cost_chf), 0),
+        COALESCE(SUM(n.latency_ms), 0),
+        COUNT(n.latency_ms),
+        MAX(n.latency_ms)
+    FROM new_rows n
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT (tenant_id, granularity, bucket) DO UPDATE SET
+        turns          = r.turns + EXCLUDED.turns,
+        input_tokens   = r.input_tokens + EXCLUDED.input_tokens,
+        output_tokens  = r.output_tokens + EXCLUDED.output_tokens,
+        cost_chf       = r.cost_chf + EXCLUDED.cost_chf,
+        latency_ms_sum = r.latency_ms_sum + EXCLUDED.latency_ms_sum,
+        latency_count  = r.latency_count + EXCLUDED.latency_count,
+        latency_ms_max = GREATEST(r.latency_ms_max, EXCLUDED.latency_ms_max);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chat_logs_summarize
+AFTER INSERT ON public.chat_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.summarize_chat_logs();
+
+CREATE TRIGGER trg_chat_logs_rollup
+AFTER INSERT ON public.chat_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.rollup_chat_logs();
+
+-- Same as before, with the partition-aware write_id conflict target
+CREATE OR REPLACE FUNCTION public.apply_chat_writes(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inserted INTEGER;
+BEGIN
+    WITH new_debits AS (
+        INSERT INTO billing_debits (write_id, user_id, amount_chf)
+        SELECT r->>'write_id', (r->>'user_id')::UUID, (r->>'amount')::DECIMAL
+        FROM jsonb_array_elements(p_rows) r
+        WHERE r->>'user_id' IS NOT NULL
+          AND COALESCE((r->>'amount')::DECIMAL, 0) > 0
+        ON CONFLICT (write_id) DO NOTHING
+        RETURNING user_id, amount_chf
+    )
+    UPDATE user_billing ub
+    SET balance_chf = ub.balance_chf - d.total,
+        updated_at = NOW()
+    FROM (SELECT user_id, SUM(amount_chf) AS total FROM new_debits GROUP BY user_id) d
+    WHERE ub.user_id = d.user_id;
+
+    INSERT INTO chat_logs (
+        write_id, tenant_id, conversation_id, user_message, ai_message, model_used,
+        input_tokens, output_tokens, cost_chf, latency_ms, queue_ms, cache_hit,
+        coalesced, hedged, route, latency_profile, created_at
+    )
+    SELECT
+        r->>'write_id', l.tenant_id, l.conversation_id, l.user_message, COALESCE(l.ai_message, ''),
+        l.model_used, l.input_tokens, l.output_tokens, l.cost_chf, l.latency_ms, l.queue_ms,
+        COALESCE(l.cache_hit, false), COALESCE(l.coalesced, false), COALESCE(l.hedged, false),
+        COALESCE(l.route, 'rag'), l.latency_profile, COALESCE(l.created_at, NOW())
+    FROM jsonb_array_elements(p_rows) r
+    CROSS JOIN LATERAL jsonb_populate_record(NULL::chat_logs, r->'log') l
+    ON CONFLICT (write_id, created_at) WHERE write_id IS NOT NULL DO NOTHING;
+
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4. Archive catalog and lifecycle functions ------------------------------
+--   restored_at    NULL while the month lives only in its archive files
+--   restored_until a restored month is not archived again before this
+
+CREATE TABLE public.chat_logs_archives (
+  month          DATE PRIMARY KEY,
+  row_count      BIGINT NOT NULL,
+  archived_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  restored_at    TIMESTAMPTZ,
+  restored_until TIMESTAMPTZ
+);
+
+-- Service-role only: no policies, RLS denies everyone else
+ALTER TABLE public.chat_logs_archives ENABLE ROW LEVEL SECURITY;
+
+-- Monthly partitions that ended more than p_hot_months months ago
+CREATE OR REPLACE FUNCTION public.chat_logs_archive_candidates(p_hot_months INTEGER DEFAULT 6)
+RETURNS TABLE(month DATE, row_count BIGINT) AS $$
+DECLARE
+    v_partition RECORD;
+    v_count BIGINT;
+BEGIN
+    FOR v_partition IN
+        SELECT to_date(substr(c.relname, 12, 4) || substr(c.relname, 17, 2), 'YYYYMM') AS m, c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.chat_logs'::regclass
+          AND c.relname ~ '^chat_logs_y[0-9]{4}m[0-9]{2}$'
+        ORDER BY 1
+    LOOP
+        CONTINUE WHEN v_partition.m >= (date_trunc('month', now() AT TIME ZONE 'UTC')
+                                        - make_interval(months => p_hot_months))::DATE;
+        CONTINUE WHEN EXISTS (
+            SELECT 1 FROM chat_logs_archives a
+            WHERE a.month = v_partition.m AND a.restored_until > now()
+        );
+        EXECUTE format('SELECT count(*) FROM public.%I', v_partition.relname) INTO v_count;
+        month := v_partition.m;
+        row_count := v_count;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Called once the month's files are written: drops the partition only if
+-- it still holds exactly the rows that were exported.
+CREATE OR REPLACE FUNCTION public.finish_chat_logs_archive(p_month DATE, p_row_count BIGINT)
+RETURNS VOID AS $$
+DECLARE
+    v_name TEXT := 'chat_logs_y' || to_char(p_month, 'YYYY') || 'm' || to_char(p_month, 'MM');
+    v_count BIGINT;
+BEGIN
+    EXECUTE format('SELECT count(*) FROM public.%I', v_name) INTO v_count;
+    IF v_count <> p_row_count THEN
+        RAISE EXCEPTION 'chat_logs % changed during archive: % rows exported, % present',
+            p_month, p_row_count, v_count;
+    END IF;
+
+    INSERT INTO chat_logs_archives (month, row_count)
+    VALUES (p_month, p_row_count)
+    ON CONFLICT (month) DO UPDATE SET
+        row_count = EXCLUDED.row_count,
+        archived_at = now(),
+        restored_at = NULL,
+        restored_until = NULL;
+
+    EXECUTE format('DROP TABLE public.%I', v_name);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recreates an archived month's partition and holds it out of the archive
+-- for p_hold_days; rows follow through restore_chat_logs_rows().
+CREATE OR REPLACE FUNCTION public.begin_chat_logs_restore(p_month DATE, p_hold_days INTEGER DEFAULT 7)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM create_chat_logs_partition(p_month);
+    UPDATE chat_logs_archives
+    SET restored_until = now() + make_interval(days => p_hold_days)
+    WHERE month = p_month;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_rows: archived chat_logs rows as JSON. Idempotent on (id, created_at).
+CREATE OR REPLACE FUNCTION public.restore_chat_logs_rows(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inserted INTEGER;
+BEGIN
+    PERFORM set_config('app.chat_logs_restore', 'on', true);
+    INSERT INTO chat_logs
+    SELECT * FROM jsonb_populate_recordset(NULL::chat_logs, p_rows)
+    ON CONFLICT DO NOTHING;
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    PERFORM set_config('app.chat_logs_restore', 'off', true);
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.finish_chat_logs_restore(p_month DATE)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE chat_logs_archives SET restored_at = now() WHERE month = p_month;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,46 @@
+-- ============================================================================
+-- Keyset reads of chat_logs in (created_at, id) order per tenant
+-- ============================================================================
+-- Used by the streaming export (api/app/chat/export.py) and by the archiver,
+-- which now writes each tenant's month file in the same order so an export
+-- can resume from any (created_at, id) — in the table or in the archive.
+--
+--   SELECT * FROM chat_logs_page($tenant, $from, $to, NULL, NULL, 1000);          -- first page
+--   SELECT * FROM chat_logs_page($tenant, $from, $to, $created_at, $id, 1000);    -- next page
+
+CREATE INDEX IF NOT EXISTS idx_chat_logs_tenant_created
+  ON public.chat_logs(tenant_id, created_at, id);
+
+CREATE OR REPLACE FUNCTION public.chat_logs_page(
+    p_tenant_id UUID,
+    p_from TIMESTAMPTZ DEFAULT NULL,
+    p_to TIMESTAMPTZ DEFAULT NULL,
+    p_after_created TIMESTAMPTZ DEFAULT NULL,
+    p_after_id BIGINT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 1000
+)
+RETURNS SETOF public.chat_logs AS $$
+BEGIN
+    RETURN QUERY
+    SELECT *
+    FROM chat_logs cl
+    WHERE cl.tenant_id = p_tenant_id
+      AND (p_from IS NULL OR cl.created_at >= p_from)
+      AND (p_to IS NULL OR cl.created_at < p_to)
+      AND (p_after_created IS NULL OR (cl.created_at, cl.id) > (p_after_created, p_after_id))
+    ORDER BY cl.created_at, cl.id
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Tenants with rows in one monthly partition (archiver)
+CREATE OR REPLACE FUNCTION public.chat_logs_month_tenants(p_month DATE)
+RETURNS TABLE(tenant_id UUID) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT DISTINCT cl.tenant_id
+    FROM chat_logs cl
+    WHERE cl.created_at >= p_month::TIMESTAMP AT TIME ZONE 'UTC'
+      AND cl.created_at < (p_month + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,151 @@
+-- ============================================================================
+-- Crawl job linkage and status counts for tenant_sources
+-- ============================================================================
+-- get_crawling_jobs used to load every crawling_tasks row of every job plus
+-- every tenant_sources row of the tenant and join them by URL in Python,
+-- silently truncated at 10,000 rows; get_tenant and get_sources returned all
+-- sources. Now:
+--
+--   tenant_sources.job_id       set by the crawler for the pages and file
+--                               links it finds (backfilled below by URL)
+--   tenant_source_counts        per tenant, job, type, status and status code,
+--                               maintained by statement-level triggers
+--
+-- so the listing endpoints page through sources and jobs with a keyset cursor
+-- and read their counts from a handful of summary rows.
+
+ALTER TABLE public.tenant_sources
+  ADD COLUMN IF NOT EXISTS job_id BIGINT REFERENCES public.crawling_jobs(id) ON DELETE SET NULL;
+
+-- Newest first, optionally filtered by status, type or job
+CREATE INDEX IF NOT EXISTS idx_tenant_sources_tenant_id
+  ON public.tenant_sources(tenant_id, id);
+CREATE INDEX IF NOT EXISTS idx_tenant_sources_tenant_status
+  ON public.tenant_sources(tenant_id, status, id);
+CREATE INDEX IF NOT EXISTS idx_tenant_sources_tenant_type
+  ON public.tenant_sources(tenant_id, source_type, id);
+CREATE INDEX IF NOT EXISTS idx_tenant_sources_job
+  ON public.tenant_sources(job_id, id) WHERE job_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_crawling_jobs_tenant_id
+  ON public.crawling_jobs(tenant_id, id);
+
+-- A page crawled by several jobs belongs to the newest of them
+UPDATE public.tenant_sources s
+SET job_id = m.job_id
+FROM (
+    SELECT DISTINCT ON (j.tenant_id, t.url) j.tenant_id, t.url, j.id AS job_id
+    FROM public.crawling_tasks t
+    JOIN public.crawling_jobs j ON j.id = t.job_id
+    ORDER BY j.tenant_id, t.url, j.id DESC
+) m
+WHERE s.job_id IS NULL
+  AND s.source_type = 'URL'
+  AND s.tenant_id = m.tenant_id
+  AND s.source_location = m.url;
+
+-- job_key 0: not from a crawl job. status_code 0: none recorded.
+CREATE TABLE public.tenant_source_counts (
+  tenant_id   UUID NOT NULL REFERENCES public.tenants(id) ON DELETE CASCADE,
+  job_key     BIGINT NOT NULL DEFAULT 0,
+  source_type public.source_type NOT NULL,
+  status      public.source_status NOT NULL,
+  status_code INTEGER NOT NULL DEFAULT 0,
+  n           INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (tenant_id, job_key, source_type, status, status_code)
+);
+
+ALTER TABLE public.tenant_source_counts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read source counts for their tenants"
+ON public.tenant_source_counts FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT user_id FROM public.tenants WHERE id = tenant_id
+  )
+);
+
+INSERT INTO public.tenant_source_counts (tenant_id, job_key, source_type, status, status_code, n)
+SELECT tenant_id, COALESCE(job_id, 0), source_type, status, COALESCE(status_code, 0), COUNT(*)
+FROM public.tenant_sources
+GROUP BY 1, 2, 3, 4, 5;
+
+-- Folds one statement's inserted, updated or deleted rows into the counts.
+-- Transition tables cannot be shared between events, hence three triggers on
+-- one function. Rows are upserted in key order so concurrent statements lock
+-- them in the same order; rows of a tenant being deleted are skipped (its
+-- counts go with it by cascade).
+CREATE OR REPLACE FUNCTION public.count_tenant_sources()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO tenant_source_counts AS c (tenant_id, job_key, source_type, status, status_code, n)
+        SELECT tenant_id, COALESCE(job_id, 0), source_type, status, COALESCE(status_code, 0), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (tenant_id, job_key, source_type, status, status_code)
+        DO UPDATE SET n = c.n + EXCLUDED.n;
+
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO tenant_source_counts AS c (tenant_id, job_key, source_type, status, status_code, n)
+        SELECT tenant_id, job_key, source_type, status, status_code, SUM(d)
+        FROM (
+            SELECT tenant_id, COALESCE(job_id, 0) AS job_key, source_type, status,
+                   COALESCE(status_code, 0) AS status_code, 1 AS d
+            FROM new_rows
+            UNION ALL
+            SELECT tenant_id, COALESCE(job_id, 0), source_type, status, COALESCE(status_code, 0), -1
+            FROM old_rows
+        ) delta
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING SUM(d) <> 0
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (tenant_id, job_key, source_type, status, status_code)
+        DO UPDATE SET n = c.n + EXCLUDED.n;
+
+    ELSE
+        UPDATE tenant_source_counts c
+        SET n = c.n - o.n
+        FROM (
+            SELECT tenant_id, COALESCE(job_id, 0) AS job_key, source_type, status,
+                   COALESCE(status_code, 0) AS status_code, COUNT(*) AS n
+            FROM old_rows
+            GROUP BY 1, 2, 3, 4, 5
+        ) o
+        WHERE c.tenant_id = o.tenant_id AND c.job_key = o.job_key AND c.source_type = o.source_type
+          AND c.status = o.status AND c.status_code = o.status_code;
+
+        DELETE FROM tenant_source_counts c
+        WHERE c.n <= 0
+          AND c.tenant_id IN (SELECT DISTINCT tenant_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_tenant_sources_count_insert
+AFTER INSERT ON public.tenant_sources
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_tenant_sources();
+
+CREATE TRIGGER trg_tenant_sources_count_update
+AFTER UPDATE ON public.tenant_sources
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_tenant_sources();
+
+CREATE TRIGGER trg_tenant_sources_count_delete
+AFTER DELETE ON public.tenant_sources
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_tenant_sources();
+
+-- Per-status totals of a tenant's sources (the dashboard header)
+CREATE OR REPLACE FUNCTION public.tenant_source_totals(p_tenant_id UUID)
+RETURNS TABLE(source_type public.source_type, status public.source_status, n BIGINT) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT c.source_type, c.status, SUM(c.n)::BIGINT
+    FROM tenant_source_counts c
+    WHERE c.tenant_id = p_tenant_id AND c.n > 0
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql STABLE;
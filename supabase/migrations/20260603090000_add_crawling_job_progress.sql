@@ -0,0 +1,152 @@
+-- ============================================================================
+-- Per-job crawl progress counters
+-- ============================================================================
+-- get_crawling_job_progress used to download up to 10,000 crawling_tasks
+-- status strings and count them in Python on every poll, under-reporting
+-- larger crawls. crawling_job_progress keeps one row per job with a counter
+-- per status, maintained by statement-level triggers on crawling_tasks
+-- (one upsert per job for a whole insert or update statement).
+--
+-- version goes up with every statement that changes a counter; the endpoint
+-- uses it as its ETag, so an unchanged poll is answered with a 304.
+
+CREATE TABLE public.crawling_job_progress (
+  job_id      BIGINT PRIMARY KEY REFERENCES public.crawling_jobs(id) ON DELETE CASCADE,
+  pending     INTEGER NOT NULL DEFAULT 0,
+  in_progress INTEGER NOT NULL DEFAULT 0,
+  completed   INTEGER NOT NULL DEFAULT 0,
+  failed      INTEGER NOT NULL DEFAULT 0,
+  version     BIGINT NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.crawling_job_progress ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read crawl progress for their tenants"
+ON public.crawling_job_progress FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT t.user_id
+    FROM public.crawling_jobs j
+    JOIN public.tenants t ON t.id = j.tenant_id
+    WHERE j.id = job_id
+  )
+);
+
+INSERT INTO public.crawling_job_progress (job_id, pending, in_progress, completed, failed, version)
+SELECT
+    j.id,
+    COUNT(t.id) FILTER (WHERE t.status = 'PENDING'),
+    COUNT(t.id) FILTER (WHERE t.status = 'IN_PROGRESS'),
+    COUNT(t.id) FILTER (WHERE t.status = 'COMPLETED'),
+    COUNT(t.id) FILTER (WHERE t.status = 'FAILED'),
+    1
+FROM public.crawling_jobs j
+LEFT JOIN public.crawling_tasks t ON t.job_id = j.id
+GROUP BY j.id;
+
+-- New jobs start with a zero row, so progress is one lookup from the start
+CREATE OR REPLACE FUNCTION public.init_crawling_job_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO crawling_job_progress (job_id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_crawling_jobs_progress
+AFTER INSERT ON public.crawling_jobs
+FOR EACH ROW EXECUTE FUNCTION public.init_crawling_job_progress();
+
+-- Folds one statement's task rows into the counters: +1 for each new
+-- (job, status), -1 for each old one. Jobs are upserted in id order so
+-- concurrent statements lock them in the same order. Deletes only update:
+-- the rows of a job being deleted are already gone by cascade.
+CREATE OR REPLACE FUNCTION public.count_crawling_tasks()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE crawling_job_progress p
+        SET pending     = p.pending - o.pending,
+            in_progress = p.in_progress - o.in_progress,
+            completed   = p.completed - o.completed,
+            failed      = p.failed - o.failed,
+            version     = p.version + 1,
+            updated_at  = now()
+        FROM (
+            SELECT job_id,
+                   COUNT(*) FILTER (WHERE status = 'PENDING') AS pending,
+                   COUNT(*) FILTER (WHERE status = 'IN_PROGRESS') AS in_progress,
+                   COUNT(*) FILTER (WHERE status = 'COMPLETED') AS completed,
+                   COUNT(*) FILTER (WHERE status = 'FAILED') AS failed
+            FROM old_rows
+            GROUP BY job_id
+        ) o
+        WHERE p.job_id = o.job_id;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO crawling_job_progress AS p (job_id, pending, in_progress, completed, failed, version)
+        SELECT job_id,
+               COUNT(*) FILTER (WHERE status = 'PENDING'),
+               COUNT(*) FILTER (WHERE status = 'IN_PROGRESS'),
+               COUNT(*) FILTER (WHERE status = 'COMPLETED'),
+               COUNT(*) FILTER (WHERE status = 'FAILED'),
+               1
+        FROM new_rows
+        GROUP BY job_id
+        ORDER BY job_id
+        ON CONFLICT (job_id) DO UPDATE SET
+            pending     = p.pending + EXCLUDED.pending,
+            in_progress = p.in_progress + EXCLUDED.in_progress,
+            completed   = p.completed + EXCLUDED.completed,
+            failed      = p.failed + EXCLUDED.failed,
+            version     = p.version + 1,
+            updated_at  = now();
+        RETURN NULL;
+    END IF;
+
+    -- UPDATE: jobs whose counters did not change (no status change) are left alone
+    INSERT INTO crawling_job_progress AS p (job_id, pending, in_progress, completed, failed, version)
+    SELECT job_id, pending, in_progress, completed, failed, 1
+    FROM (
+        SELECT job_id,
+               COALESCE(SUM(d) FILTER (WHERE status = 'PENDING'), 0) AS pending,
+               COALESCE(SUM(d) FILTER (WHERE status = 'IN_PROGRESS'), 0) AS in_progress,
+               COALESCE(SUM(d) FILTER (WHERE status = 'COMPLETED'), 0) AS completed,
+               COALESCE(SUM(d) FILTER (WHERE status = 'FAILED'), 0) AS failed
+        FROM (
+            SELECT job_id, status, 1 AS d FROM new_rows
+            UNION ALL
+            SELECT job_id, status, -1 FROM old_rows
+        ) delta
+        GROUP BY job_id
+    ) per_job
+    WHERE pending <> 0 OR in_progress <> 0 OR completed <> 0 OR failed <> 0
+    ORDER BY job_id
+    ON CONFLICT (job_id) DO UPDATE SET
+        pending     = p.pending + EXCLUDED.pending,
+        in_progress = p.in_progress + EXCLUDED.in_progress,
+        completed   = p.completed + EXCLUDED.completed,
+        failed      = p.failed + EXCLUDED.failed,
+        version     = p.version + 1,
+        updated_at  = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_crawling_tasks_progress_insert
+AFTER INSERT ON public.crawling_tasks
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_crawling_tasks();
+
+CREATE TRIGGER trg_crawling_tasks_progress_update
+AFTER UPDATE ON public.crawling_tasks
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_crawling_tasks();
+
+CREATE TRIGGER trg_crawling_tasks_progress_delete
+AFTER DELETE ON public.crawling_tasks
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.count_crawling_tasks();
@@ -0,0 +1,61 @@
+-- ============================================================================
+-- Crawl progress snapshots instead of per-row Realtime events
+-- ============================================================================
+-- 20260512000000_enable_realtime_crawl_tables.sql published every
+-- crawling_jobs and crawling_tasks row change to every open dashboard — a
+-- 3000-page crawl meant thousands of events per client, each task row changing
+-- two or three times. The API gateway now polls crawl_progress_snapshot() once
+-- per tenant and pushes throttled per-job snapshots over SSE
+-- (api/app/gateway/progress.py), so the tables leave the publication.
+--
+-- One row per job that is running, or that changed since p_since, with its
+-- task counters (crawling_job_progress) and source counts (tenant_source_counts).
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_publication_tables
+               WHERE pubname = 'supabase_realtime' AND tablename = 'crawling_tasks') THEN
+        ALTER PUBLICATION supabase_realtime DROP TABLE public.crawling_tasks;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_publication_tables
+               WHERE pubname = 'supabase_realtime' AND tablename = 'crawling_jobs') THEN
+        ALTER PUBLICATION supabase_realtime DROP TABLE public.crawling_jobs;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_crawling_jobs_tenant_updated
+  ON public.crawling_jobs(tenant_id, updated_at);
+
+CREATE OR REPLACE FUNCTION public.crawl_progress_snapshot(p_tenant_id UUID, p_since TIMESTAMPTZ)
+RETURNS TABLE(
+    job_id BIGINT,
+    status public.crawling_status,
+    pending INTEGER,
+    in_progress INTEGER,
+    completed INTEGER,
+    failed INTEGER,
+    version BIGINT,
+    sources_completed BIGINT,
+    sources_error BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        j.id,
+        j.status,
+        COALESCE(p.pending, 0),
+        COALESCE(p.in_progress, 0),
+        COALESCE(p.completed, 0),
+        COALESCE(p.failed, 0),
+        COALESCE(p.version, 0),
+        COALESCE((SELECT SUM(c.n) FROM tenant_source_counts c
+                  WHERE c.tenant_id = p_tenant_id AND c.job_key = j.id AND c.status = 'COMPLETED'), 0)::BIGINT,
+        COALESCE((SELECT SUM(c.n) FROM tenant_source_counts c
+                  WHERE c.tenant_id = p_tenant_id AND c.job_key = j.id AND c.status = 'ERROR'), 0)::BIGINT
+    FROM crawling_jobs j
+    LEFT JOIN crawling_job_progress p ON p.job_id = j.id
+    WHERE j.tenant_id = p_tenant_id
+      AND (j.status IN ('PENDING', 'IN_PROGRESS') OR j.updated_at >= p_since OR p.updated_at >= p_since)
+    ORDER BY j.id;
+END;
+$$ LANGUAGE plpgsql STABLE;
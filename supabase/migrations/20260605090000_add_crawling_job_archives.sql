@@ -0,0 +1,122 @@
+-- ============================================================================
+-- Compact finished crawl jobs out of crawling_tasks
+-- ============================================================================
+-- crawling_tasks kept a row per URL of every job ever run, so its job_id and
+-- status indexes — and every dedup, scheduler and progress query on them —
+-- grew with the crawl history. Once a job has been finished for a while,
+-- compact_crawling_job() folds its task rows into one crawling_job_archives
+-- row and deletes them; the hot table only holds live jobs.
+--
+-- tasks is a JSON array with one [url, status, depth, parent] entry per task,
+-- in task order; parent is the index of the parent URL's entry (null for the
+-- start URL). The column is lz4-compressed in TOAST.
+--
+-- crawling_job_progress keeps its counters — they describe the job, not the
+-- rows still in the hot table.
+
+CREATE TABLE public.crawling_job_archives (
+  job_id       BIGINT PRIMARY KEY REFERENCES public.crawling_jobs(id) ON DELETE CASCADE,
+  task_count   INTEGER NOT NULL,
+  tasks        JSONB NOT NULL,
+  compacted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.crawling_job_archives ALTER COLUMN tasks SET COMPRESSION lz4;
+
+ALTER TABLE public.crawling_job_archives ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow users to read crawl archives for their tenants"
+ON public.crawling_job_archives FOR SELECT
+USING (
+  auth.uid() = (
+    SELECT t.user_id
+    FROM public.crawling_jobs j
+    JOIN public.tenants t ON t.id = j.tenant_id
+    WHERE j.id = job_id
+  )
+);
+
+-- Finished jobs, idle for p_idle_minutes, that still have task rows
+CREATE OR REPLACE FUNCTION public.crawl_compaction_candidates(p_idle_minutes INTEGER, p_limit INTEGER)
+RETURNS TABLE(job_id BIGINT) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT j.id
+    FROM crawling_jobs j
+    LEFT JOIN crawling_job_progress p ON p.job_id = j.id
+    WHERE j.status IN ('COMPLETED', 'FAILED')
+      AND j.updated_at < now() - make_interval(mins => p_idle_minutes)
+      AND COALESCE(p.updated_at, j.updated_at) < now() - make_interval(mins => p_idle_minutes)
+      AND EXISTS (SELECT 1 FROM crawling_tasks t WHERE t.job_id = j.id)
+    ORDER BY j.id
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Moves a finished job's task rows into its archive row and returns the
+-- archived task count (0 if the job is running or has no task rows left).
+-- Rows that arrive after a compaction — a worker finishing late — are merged
+-- into the archive by the next one.
+CREATE OR REPLACE FUNCTION public.compact_crawling_job(p_job_id BIGINT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_progress crawling_job_progress%ROWTYPE;
+    v_archived INTEGER;
+BEGIN
+    PERFORM 1 FROM crawling_jobs WHERE id = p_job_id AND status IN ('COMPLETED', 'FAILED') FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+    SELECT * INTO v_progress FROM crawling_job_progress WHERE job_id = p_job_id FOR UPDATE;
+
+    WITH moved AS (
+        DELETE FROM crawling_tasks WHERE job_id = p_job_id
+        RETURNING id, url, status::TEXT AS status, depth, parent_url
+    ),
+    archived AS (
+        SELECT e.n, e.entry
+        FROM crawling_job_archives a, jsonb_array_elements(a.tasks) WITH ORDINALITY AS e(entry, n)
+        WHERE a.job_id = p_job_id
+    ),
+    merged AS (
+        SELECT a.n AS ord, a.entry->>0 AS url, a.entry->>1 AS status, (a.entry->>2)::INTEGER AS depth,
+               parent.entry->>0 AS parent_url
+        FROM archived a
+        LEFT JOIN archived parent ON parent.n = (a.entry->>3)::BIGINT + 1
+        UNION ALL
+        SELECT (SELECT COUNT(*) FROM archived) + ROW_NUMBER() OVER (ORDER BY m.id),
+               m.url, m.status, m.depth, m.parent_url
+        FROM moved m
+    ),
+    numbered AS (
+        SELECT ROW_NUMBER() OVER (ORDER BY ord) - 1 AS idx, url, status, depth, parent_url FROM merged
+    ),
+    first_index AS (
+        SELECT url, MIN(idx) AS idx FROM numbered GROUP BY url
+    )
+    INSERT INTO crawling_job_archives AS a (job_id, task_count, tasks)
+    SELECT p_job_id, COUNT(*),
+           jsonb_agg(jsonb_build_array(n.url, n.status, n.depth, f.idx) ORDER BY n.idx)
+    FROM numbered n
+    LEFT JOIN first_index f ON f.url = n.parent_url
+    HAVING (SELECT COUNT(*) FROM moved) > 0
+    ON CONFLICT (job_id) DO UPDATE SET
+        task_count   = EXCLUDED.task_count,
+        tasks        = EXCLUDED.tasks,
+        compacted_at = now()
+    RETURNING a.task_count INTO v_archived;
+
+    IF v_archived IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- The delete trigger has just subtracted the moved rows; put the counters back
+    IF v_progress.job_id IS NOT NULL THEN
+        UPDATE crawling_job_progress
+        SET pending = v_progress.pending, in_progress = v_progress.in_progress,
+            completed = v_progress.completed, failed = v_progress.failed
+        WHERE job_id = p_job_id;
+    END IF;
+    RETURN v_archived;
+END;
+$$ LANGUAGE plpgsql;
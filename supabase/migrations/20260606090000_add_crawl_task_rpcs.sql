@@ -0,0 +1,147 @@
+-- ============================================================================
+-- Crawl task lifecycle in two round trips
+-- ============================================================================
+-- process_single_url_task made 8–12 sequential PostgREST calls per page: load
+-- the task and job, mark it IN_PROGRESS, read the tenant's crawl_mode, insert
+-- and update its source, look up already-queued links in chunks of 50, insert
+-- the new ones, mark the task COMPLETED and count the job's outstanding tasks.
+-- A page is now two calls:
+--
+--   claim_crawling_task(task)      IN_PROGRESS + everything the crawl needs
+--   complete_crawling_task(task, source, children)
+--                                  source upsert, child insert deduplicated by
+--                                  the (job_id, url) key, task status, and the
+--                                  job's completion from its progress counters
+--   fail_crawling_task(task, source)
+--                                  the same with status FAILED and no children
+
+-- Duplicates could slip past the old chunked lookup; keep each URL's first task
+DELETE FROM public.crawling_tasks t
+USING public.crawling_tasks d
+WHERE d.job_id = t.job_id AND d.url = t.url AND d.id < t.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_crawling_tasks_job_url
+  ON public.crawling_tasks(job_id, url);
+-- Covered by the unique index's leading column
+DROP INDEX IF EXISTS public.idx_crawling_tasks_job_id;
+
+CREATE INDEX IF NOT EXISTS idx_tenant_sources_job_location
+  ON public.tenant_sources(job_id, source_location) WHERE job_id IS NOT NULL;
+
+-- Marks a queued (or redelivered) task IN_PROGRESS and returns it with its
+-- job's settings. No row: the task is gone, finished or cancelled.
+CREATE OR REPLACE FUNCTION public.claim_crawling_task(p_task_id BIGINT)
+RETURNS TABLE(
+    task_id BIGINT,
+    job_id BIGINT,
+    tenant_id UUID,
+    url TEXT,
+    depth INTEGER,
+    parent_url TEXT,
+    start_url TEXT,
+    max_depth INTEGER,
+    excluded_urls TEXT[],
+    crawl_mode TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE crawling_tasks t
+        SET status = 'IN_PROGRESS'
+        WHERE t.id = p_task_id AND t.status IN ('PENDING', 'IN_PROGRESS')
+        RETURNING t.id, t.job_id, t.url, t.depth, t.parent_url
+    )
+    SELECT c.id, c.job_id, j.tenant_id, c.url, c.depth, c.parent_url,
+           j.start_url, j.max_depth, COALESCE(j.excluded_urls, '{}'),
+           COALESCE(tn.crawl_mode::TEXT, 'playwright_llm')
+    FROM claimed c
+    JOIN crawling_jobs j ON j.id = c.job_id
+    JOIN tenants tn ON tn.id = j.tenant_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Finishes a claimed task with p_status. p_source, when given, is the page's
+-- tenant_sources row ({status, status_code, gemini_document_name}) — updated
+-- in place if this job already has one for the URL. p_children are queued
+-- one level deeper unless the job was cancelled; URLs the job already has
+-- are skipped. Returns {job_id, source_id, children: [{id, url}], job_completed}.
+CREATE OR REPLACE FUNCTION public.complete_crawling_task(
+    p_task_id BIGINT,
+    p_source JSONB DEFAULT NULL,
+    p_children TEXT[] DEFAULT '{}',
+    p_status public.crawling_status DEFAULT 'COMPLETED'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_task crawling_tasks%ROWTYPE;
+    v_job crawling_jobs%ROWTYPE;
+    v_source_id BIGINT;
+    v_children JSONB := '[]';
+    v_outstanding INTEGER;
+    v_completed BOOLEAN := FALSE;
+BEGIN
+    SELECT * INTO v_task FROM crawling_tasks WHERE id = p_task_id;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('job_id', NULL, 'source_id', NULL, 'children', v_children, 'job_completed', FALSE);
+    END IF;
+    SELECT * INTO v_job FROM crawling_jobs WHERE id = v_task.job_id;
+
+    IF p_source IS NOT NULL THEN
+        UPDATE tenant_sources
+        SET status = (p_source->>'status')::public.source_status,
+            status_code = (p_source->>'status_code')::INTEGER,
+            gemini_document_name = COALESCE(p_source->>'gemini_document_name', gemini_document_name)
+        WHERE id = (
+            SELECT s.id FROM tenant_sources s
+            WHERE s.job_id = v_job.id AND s.source_location = v_task.url AND s.source_type = 'URL'
+            ORDER BY s.id
+            LIMIT 1
+        )
+        RETURNING id INTO v_source_id;
+
+        IF v_source_id IS NULL THEN
+            INSERT INTO tenant_sources (tenant_id, source_type, job_id, source_location, status, status_code, gemini_document_name)
+            VALUES (v_job.tenant_id, 'URL', v_job.id, v_task.url,
+                    (p_source->>'status')::public.source_status,
+                    (p_source->>'status_code')::INTEGER,
+                    p_source->>'gemini_document_name')
+            RETURNING id INTO v_source_id;
+        END IF;
+    END IF;
+
+    IF p_status = 'COMPLETED' AND v_job.status = 'IN_PROGRESS' AND COALESCE(array_length(p_children, 1), 0) > 0 THEN
+        WITH inserted AS (
+            INSERT INTO crawling_tasks (job_id, url, depth, status, parent_url)
+            SELECT v_job.id, child, v_task.depth + 1, 'PENDING', v_task.url
+            FROM unnest(p_children) AS child
+            ORDER BY child
+            ON CONFLICT (job_id, url) DO NOTHING
+            RETURNING id, url
+        )
+        SELECT COALESCE(jsonb_agg(jsonb_build_object('id', id, 'url', url) ORDER BY id), '[]')
+        INTO v_children
+        FROM inserted;
+    END IF;
+
+    UPDATE crawling_tasks SET status = p_status WHERE id = p_task_id;
+
+    -- The counters already include the update above; concurrent finishers
+    -- queue on the job's progress row, so the last one sees zero
+    SELECT pending + in_progress INTO v_outstanding
+    FROM crawling_job_progress
+    WHERE job_id = v_job.id;
+
+    IF COALESCE(v_outstanding, 0) = 0 THEN
+        UPDATE crawling_jobs SET status = 'COMPLETED'
+        WHERE id = v_job.id AND status = 'IN_PROGRESS';
+        v_completed := FOUND;
+    END IF;
+
+    RETURN jsonb_build_object('job_id', v_job.id, 'source_id', v_source_id, 'children', v_children, 'job_completed', v_completed);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.fail_crawling_task(p_task_id BIGINT, p_source JSONB DEFAULT NULL)
+RETURNS JSONB AS $$
+    SELECT public.complete_crawling_task(p_task_id, p_source, '{}', 'FAILED');
+$$ LANGUAGE sql;
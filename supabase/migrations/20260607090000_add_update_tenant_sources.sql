@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Batched tenant_sources field updates
+-- ============================================================================
+-- The ingestion workers wrote every source transition as its own single-row
+-- PostgREST update — PROCESSING, then status_code, token counts, COMPLETED —
+-- each one a round trip plus a tenant_source_counts trigger run. Their
+-- StatusWriter (app/database/status_writer.py) now merges the fields per
+-- source in memory and flushes them here, many sources per statement.
+--
+-- p_rows: [{"id": 17, "status": "COMPLETED", "gemini_document_name": "..."}, ...]
+-- A column missing from a row keeps its value; a JSON null sets it to NULL.
+-- Returns the number of rows updated.
+
+CREATE OR REPLACE FUNCTION public.update_tenant_sources(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE tenant_sources s
+    SET status               = CASE WHEN r ? 'status' THEN (r->>'status')::public.source_status ELSE s.status END,
+        status_code          = CASE WHEN r ? 'status_code' THEN (r->>'status_code')::INTEGER ELSE s.status_code END,
+        gemini_document_name = CASE WHEN r ? 'gemini_document_name' THEN r->>'gemini_document_name' ELSE s.gemini_document_name END,
+        chunk_count          = CASE WHEN r ? 'chunk_count' THEN (r->>'chunk_count')::INTEGER ELSE s.chunk_count END,
+        input_tokens         = CASE WHEN r ? 'input_tokens' THEN (r->>'input_tokens')::INTEGER ELSE s.input_tokens END,
+        output_tokens        = CASE WHEN r ? 'output_tokens' THEN (r->>'output_tokens')::INTEGER ELSE s.output_tokens END,
+        cost_chf             = CASE WHEN r ? 'cost_chf' THEN (r->>'cost_chf')::DECIMAL(10, 6) ELSE s.cost_chf END,
+        readme               = CASE WHEN r ? 'readme' THEN r->>'readme' ELSE s.readme END
+    FROM jsonb_array_elements(p_rows) AS r
+    WHERE s.id = (r->>'id')::INTEGER;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
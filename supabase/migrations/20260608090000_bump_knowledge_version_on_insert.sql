@@ -0,0 +1,27 @@
+-- ============================================================================
+-- Bump knowledge_version for sources inserted already COMPLETED
+-- ============================================================================
+-- trg_tenant_sources_knowledge_version (answer cache migration) only fires on
+-- UPDATE OF status and DELETE. Since complete_crawling_task() inserts a
+-- crawled page's tenant_sources row as COMPLETED in one step, a crawl never
+-- bumped tenants.knowledge_version and cached answers outlived new pages.
+-- One statement-level trigger covers the inserts: one tenants update per
+-- tenant that gained completed sources, whatever the batch size.
+
+CREATE OR REPLACE FUNCTION public.bump_knowledge_version_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.tenants t
+    SET knowledge_version = t.knowledge_version + 1
+    FROM (
+        SELECT DISTINCT tenant_id FROM new_rows WHERE status = 'COMPLETED' ORDER BY tenant_id
+    ) n
+    WHERE t.id = n.tenant_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_tenant_sources_knowledge_version_insert
+AFTER INSERT ON public.tenant_sources
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.bump_knowledge_version_on_insert();